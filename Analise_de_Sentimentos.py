@@ -1,85 +1,305 @@
 import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 
-os.environ['HUGGINGFACE_HUB_CACHE'] = r'C:\meu_cache_huggingface'
-
-from transformers import pipeline
-
-
+BERT_MODEL_NAME = "nlptown/bert-base-multilingual-uncased-sentiment"
 
 # -----------------------------------------------------------
-
-# 1. INICIALIZAÇÃO GLOBAL DO MODELO BERT (FAÇA ISSO APENAS UMA VEZ!)
-
+# 1. BACKENDS DE INFERÊNCIA
+# Todos devolvem um pipeline "sentiment-analysis" do transformers (mesma
+# interface e mesmos rótulos), mudando só o modelo por baixo:
+#   'pytorch' -> BERT original em float32 (padrão)
+#   'int8'    -> o mesmo modelo com quantização dinâmica int8 das camadas Linear
+#   'onnx'    -> modelo exportado para ONNX Runtime (requer 'optimum[onnxruntime]')
+# O backend é escolhido por NYX_SENTIMENT_BACKEND.
 # -----------------------------------------------------------
+DEFAULT_BACKEND = 'pytorch'
 
-try:
 
-    GLOBAL_BERT_CLASSIFIER = pipeline(
+# Pasta do cache de modelos do Hugging Face (NYX_HF_CACHE_DIR). É passada como
+# 'cache_dir' em cada carregamento: a variável HUGGINGFACE_HUB_CACHE é lida só
+# quando o huggingface_hub é importado, e ele pode já ter sido importado antes.
+HF_CACHE_DIR = os.getenv('NYX_HF_CACHE_DIR') or None
+if HF_CACHE_DIR:
+    # Para os processos filhos e para quem importar o huggingface_hub depois
+    os.environ.setdefault('HUGGINGFACE_HUB_CACHE', HF_CACHE_DIR)
 
-        "sentiment-analysis",
 
-        model="nlptown/bert-base-multilingual-uncased-sentiment",
+def _from_hub(loader, name, **kwargs):
+    """Chama 'loader.from_pretrained' com o cache configurado em NYX_HF_CACHE_DIR."""
+    if HF_CACHE_DIR:
+        kwargs['cache_dir'] = HF_CACHE_DIR
+    return loader.from_pretrained(name, **kwargs)
 
-        device=-1 # -1 para CPU
 
-        )
+def _build_pytorch():
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
+    model = _from_hub(AutoModelForSequenceClassification, BERT_MODEL_NAME)
+    tokenizer = _from_hub(AutoTokenizer, BERT_MODEL_NAME)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer, device=-1) # -1 para CPU
 
-    print("DEBUG: Modelo BERT para análise de sentimento carregado com sucesso.")
 
-except Exception as e:
+def _build_int8():
+    import torch
+    from transformers import AutoModelForSequenceClassification, AutoTokenizer, pipeline
 
-    GLOBAL_BERT_CLASSIFIER = None
+    model = _from_hub(AutoModelForSequenceClassification, BERT_MODEL_NAME)
+    model.eval()
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    tokenizer = _from_hub(AutoTokenizer, BERT_MODEL_NAME)
+    return pipeline("sentiment-analysis", model=quantized, tokenizer=tokenizer, device=-1)
 
-    print(f"ERRO CRÍTICO: Não foi possível carregar o modelo BERT. A ferramenta de análise de emoções estará indisponível. Detalhes: {e}")
-
-# -----------------------------------------------------------
 
+def _build_onnx():
+    """
+    Carrega o modelo ONNX de NYX_SENTIMENT_ONNX_DIR. Na primeira vez o modelo é
+    exportado a partir do checkpoint PyTorch e salvo nessa pasta, então as
+    próximas inicializações não precisam exportar de novo.
+    """
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+    from transformers import AutoTokenizer, pipeline
+
+    onnx_dir = os.getenv('NYX_SENTIMENT_ONNX_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'modelos', 'sentimento_onnx')
+    if os.path.isfile(os.path.join(onnx_dir, 'model.onnx')):
+        model = ORTModelForSequenceClassification.from_pretrained(onnx_dir)
+        tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+    else:
+        print(f"DEBUG: Exportando o modelo de sentimento para ONNX em '{onnx_dir}' (apenas na primeira vez)...")
+        model = _from_hub(ORTModelForSequenceClassification, BERT_MODEL_NAME, export=True)
+        tokenizer = _from_hub(AutoTokenizer, BERT_MODEL_NAME)
+        model.save_pretrained(onnx_dir)
+        tokenizer.save_pretrained(onnx_dir)
+    return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+
+BACKENDS = {
+    'pytorch': _build_pytorch,
+    'int8': _build_int8,
+    'onnx': _build_onnx,
+}
+
+
+def configured_backend():
+    """Retorna o nome do backend configurado em NYX_SENTIMENT_BACKEND."""
+    backend = (os.getenv('NYX_SENTIMENT_BACKEND') or DEFAULT_BACKEND).strip().lower()
+    if backend not in BACKENDS:
+        print(f"AVISO: Backend de sentimento desconhecido '{backend}'. Usando '{DEFAULT_BACKEND}'. Opções: {', '.join(BACKENDS)}")
+        return DEFAULT_BACKEND
+    return backend
+
+
+def build_classifier(backend):
+    """
+    Constrói um classificador novo com o backend pedido (sem cache).
+    :param backend: Uma das chaves de BACKENDS.
+    :return: O pipeline (exceções de carregamento são propagadas).
+    """
+    return BACKENDS[backend]()
 
 
-# ... Definição da sua função de ferramenta aqui ...
+# -----------------------------------------------------------
+# 2. CARREGAMENTO TARDIO DO MODELO BERT (APENAS UMA VEZ, NO PRIMEIRO USO)
+# Importar este módulo não carrega o 'transformers' nem o modelo: isso acontece
+# na primeira análise ou no aquecimento em segundo plano ('warm_up_async').
+# NYX_HF_CACHE_DIR define a pasta de cache do Hugging Face e
+# NYX_SENTIMENT_PRELOAD=1 restaura o carregamento durante o import.
+# -----------------------------------------------------------
+GLOBAL_BERT_CLASSIFIER = None
+ACTIVE_BACKEND = None
+_classifier_lock = threading.Lock()
+_classifier_load_attempted = False
 
-def analisar_emocoes_local_bert(text):
 
+def get_classifier():
+    """
+    Retorna o pipeline BERT do backend configurado, carregando-o na primeira
+    chamada (thread-safe). Se o backend otimizado falhar, cai para o 'pytorch'.
+    :return: O pipeline ou None se o carregamento falhou.
     """
+    global GLOBAL_BERT_CLASSIFIER, ACTIVE_BACKEND, _classifier_load_attempted
+    if _classifier_load_attempted:
+        return GLOBAL_BERT_CLASSIFIER
+
+    with _classifier_lock:
+        if _classifier_load_attempted:
+            return GLOBAL_BERT_CLASSIFIER
+
+        backend = configured_backend()
+        candidates = [backend] if backend == DEFAULT_BACKEND else [backend, DEFAULT_BACKEND]
+        try:
+            for candidate in candidates:
+                start = time.perf_counter()
+                try:
+                    GLOBAL_BERT_CLASSIFIER = build_classifier(candidate)
+                    ACTIVE_BACKEND = candidate
+                    print(f"DEBUG: Modelo BERT para análise de sentimento carregado com sucesso (backend '{candidate}') em {time.perf_counter() - start:.1f}s.")
+                    break
+                except Exception as e:
+                    GLOBAL_BERT_CLASSIFIER = None
+                    if candidate != DEFAULT_BACKEND:
+                        print(f"AVISO: Falha ao carregar o backend de sentimento '{candidate}'. Tentando '{DEFAULT_BACKEND}'. Detalhes: {e}")
+                    else:
+                        print(f"ERRO CRÍTICO: Não foi possível carregar o modelo BERT. A ferramenta de análise de emoções estará indisponível. Detalhes: {e}")
+        finally:
+            _classifier_load_attempted = True
+
+    return GLOBAL_BERT_CLASSIFIER
+# -----------------------------------------------------------
 
-    Função de ferramenta que usa o classificador global.
 
+# -----------------------------------------------------------
+# 3. SERVIDOR DE INFERÊNCIA COM MICRO-LOTES E CACHE
+# -----------------------------------------------------------
+class ServidorDeInferenciaBERT:
     """
+    Agrupa pedidos concorrentes de classificação: o primeiro pedido abre uma janela
+    de alguns milissegundos, os que chegam nela vão para o mesmo lote (com padding)
+    e o modelo roda uma única vez. Resultados ficam em um cache LRU pelo hash do
+    texto, então textos repetidos nem chegam ao modelo.
+    """
+    # Janela (ms) para acumular pedidos antes de rodar o lote
+    BATCH_WINDOW_MS = 5
+    # Tamanho máximo de um lote
+    MAX_BATCH_SIZE = 16
+    # Resultados mantidos no cache LRU
+    CACHE_SIZE = 1024
+
+    def __init__(self, classifier, batch_window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE, cache_size=CACHE_SIZE):
+        self.classifier = classifier
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.cache_size = cache_size
+        self.stats = {'hits': 0, 'misses': 0, 'batches': 0, 'batched_texts': 0}
+
+        self._cache = OrderedDict()  # hash do texto -> resultado
+        self._pending = []           # (hash, texto, Future)
+        self._condition = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="nyx-bert-batcher", daemon=True)
+        self._worker.start()
+
+    @staticmethod
+    def _text_hash(text):
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def classify(self, text, timeout=None):
+        """
+        Classifica um texto, bloqueando até o lote que o contém terminar.
+        :return: O dicionário {'label': ..., 'score': ...} do pipeline.
+        """
+        key = self._text_hash(text)
+        with self._condition:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.stats['hits'] += 1
+                return cached
+
+            self.stats['misses'] += 1
+            future = Future()
+            self._pending.append((key, text, future))
+            self._condition.notify()
+
+        return future.result(timeout=timeout)
+
+    def _take_batch(self):
+        """Espera o primeiro pedido e acumula outros até fechar a janela ou encher o lote."""
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+
+            deadline = time.monotonic() + self.batch_window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+
+            # Textos repetidos dentro do mesmo lote são classificados uma vez só
+            unique = OrderedDict()
+            for key, text, _ in batch:
+                unique.setdefault(key, text)
+
+            try:
+                outputs = self.classifier(list(unique.values()), batch_size=len(unique), truncation=True)
+                results = dict(zip(unique.keys(), outputs))
+            except Exception as e:
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            with self._condition:
+                self.stats['batches'] += 1
+                self.stats['batched_texts'] += len(unique)
+                for key, result in results.items():
+                    self._cache[key] = result
+                    self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+            for key, _, future in batch:
+                future.set_result(results[key])
+
+
+INFERENCE_SERVER = None
+_server_lock = threading.Lock()
+
+
+def get_inference_server():
+    """Retorna o servidor de micro-lotes, carregando o modelo se necessário."""
+    global INFERENCE_SERVER
+    if INFERENCE_SERVER is None:
+        classifier = get_classifier()
+        if classifier is None:
+            return None
+        with _server_lock:
+            if INFERENCE_SERVER is None:
+                INFERENCE_SERVER = ServidorDeInferenciaBERT(classifier)
+    return INFERENCE_SERVER
+
+
+def warm_up_async():
+    """Carrega o modelo em uma thread de segundo plano (ex.: depois que a GUI estiver pronta)."""
+    if _classifier_load_attempted:
+        return
+    threading.Thread(target=get_inference_server, name="nyx-bert-warmup", daemon=True).start()
+
+
+if os.getenv('NYX_SENTIMENT_PRELOAD', '').lower() in ('1', 'true', 'sim'):
+    get_inference_server()
 
-    if GLOBAL_BERT_CLASSIFIER is None:
 
+# ... Definição da sua função de ferramenta aqui ...
+def analisar_emocoes_local_bert(text):
+    """
+    Função de ferramenta que usa o classificador global através do servidor de micro-lotes.
+    """
+    inference_server = get_inference_server()
+    if inference_server is None:
         return "ERRO: O classificador BERT não está disponível para uso."
-
     try:
-
-        response = GLOBAL_BERT_CLASSIFIER(text) # Usa o objeto carregado uma única vez
-
-        resultado = response[0]
-
+        resultado = inference_server.classify(text) # Agrupa com chamadas concorrentes e usa o cache
         label_raw = resultado['label']
-
         score = resultado['score']
-
         # Mapeamento para termos amigáveis (ajuste conforme o seu gosto)
-
         MAPPING = {
-
             '5 stars': "FORTE FELICIDADE / AMOR",
-
             '4 stars': "FELICIDADE / SATISFAÇÃO",
-
             '3 stars': "NEUTRO / EQUILIBRADO",
-
             '2 stars': "INSATISFAÇÃO / LEVE TRISTEZA",
-
             '1 star': "FORTE RAIVA / TRISTEZA"
-
             }
-
         emocao = MAPPING.get(label_raw, label_raw)
-
         return f"Análise de Emoções (BERT):\n- Emoção Principal: {emocao}\n- Confiança: {score*100:.2f}%"
-
     except Exception as e:
-
-        return f"Erro na inferência do BERT: {e}"
\ No newline at end of file
+        return f"Erro na inferência do BERT: {e}"
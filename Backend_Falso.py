@@ -0,0 +1,132 @@
+"""
+Backend falso e determinístico do Gemini, para medir e exercitar o ChatEngine
+sem chave de API e sem rede:
+
+    from Backend_Falso import FakeGenerativeModel
+    engine = ChatEngine(model=FakeGenerativeModel(script=[...]))
+
+As respostas usam os próprios tipos genai.protos, então o motor percorre
+exatamente o mesmo caminho de código usado com a API real.
+"""
+import time
+import google.generativeai as genai
+
+
+class FakeResponse:
+    """
+    Imita o GenerateContentResponse do genai: expõe 'candidates' e 'text' e,
+    quando iterado, entrega o texto em pedaços (streaming) respeitando as latências.
+    """
+    def __init__(self, content, first_token_latency=0.0, token_delay=0.0, chunk_size=16, stream=False):
+        self.candidates = [genai.protos.Candidate(content=content)]
+        self._first_token_latency = first_token_latency
+        self._token_delay = token_delay
+        self._chunk_size = chunk_size
+        self._stream = stream
+        if not stream:
+            # Sem streaming, a resposta só existe depois da geração completa
+            num_chunks = sum(-(-len(part.text) // chunk_size) for part in content.parts if part.text)
+            time.sleep(first_token_latency + num_chunks * token_delay)
+
+    @property
+    def text(self):
+        return "".join(part.text for part in self.candidates[0].content.parts if part.text)
+
+    def __iter__(self):
+        if not self._stream:
+            yield self
+            return
+
+        time.sleep(self._first_token_latency)
+        for part in self.candidates[0].content.parts:
+            if not part.text:
+                # Chamadas de função chegam inteiras em um único pedaço
+                yield FakeResponse(genai.protos.Content(role='model', parts=[part]))
+                continue
+            for start in range(0, len(part.text), self._chunk_size):
+                chunk = genai.protos.Part(text=part.text[start:start + self._chunk_size])
+                yield FakeResponse(genai.protos.Content(role='model', parts=[chunk]))
+                time.sleep(self._token_delay)
+
+
+class FakeChatSession:
+    """Sessão de chat falsa: mantém o histórico e responde seguindo o roteiro do modelo."""
+
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    @staticmethod
+    def _to_content(content):
+        """Converte o conteúdo enviado (str, Part ou lista) em genai.protos.Content."""
+        if not isinstance(content, (list, tuple)):
+            content = [content]
+        parts = []
+        for item in content:
+            if isinstance(item, genai.protos.Part):
+                parts.append(item)
+            elif isinstance(item, str):
+                parts.append(genai.protos.Part(text=item))
+            else:
+                # Imagens PIL e afins: o conteúdo não importa para o backend falso
+                parts.append(genai.protos.Part(text="[imagem]"))
+        return genai.protos.Content(role='user', parts=parts)
+
+    def send_message(self, content, stream=False, **kwargs):
+        user_content = self._to_content(content)
+        self.history.append(user_content)
+        model_content = self.model._next_content(user_content)
+        self.history.append(model_content)
+        self.model.calls += 1
+        return FakeResponse(
+            model_content,
+            first_token_latency=self.model.first_token_latency,
+            token_delay=self.model.token_delay,
+            chunk_size=self.model.chunk_size,
+            stream=stream
+        )
+
+
+class FakeGenerativeModel:
+    """
+    Modelo falso com roteiro. Cada item do 'script' é consumido por uma chamada a
+    'send_message', em ordem:
+        {'text': "resposta"}
+        {'function_calls': [("obter_clima", {"cidade": "Recife"}), ...]}
+    Com o roteiro esgotado, responde "Resposta simulada: <última mensagem>".
+    """
+    def __init__(self, script=None, first_token_latency=0.0, token_delay=0.0, chunk_size=16):
+        self.script = list(script or [])
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._position = 0
+
+    def _next_content(self, user_content):
+        if self._position < len(self.script):
+            step = self.script[self._position]
+            self._position += 1
+        else:
+            last_text = " ".join(part.text for part in user_content.parts if part.text)
+            step = {'text': f"Resposta simulada: {last_text[:200]}"}
+
+        if 'function_calls' in step:
+            parts = [
+                genai.protos.Part(function_call=genai.protos.FunctionCall(name=name, args=args))
+                for name, args in step['function_calls']
+            ]
+        else:
+            parts = [genai.protos.Part(text=step['text'])]
+        return genai.protos.Content(role='model', parts=parts)
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history=history)
+
+    def generate_content(self, prompt, **kwargs):
+        """Usado pelo resumidor: responde com um texto curto e determinístico."""
+        self.calls += 1
+        return FakeResponse(
+            genai.protos.Content(role='model', parts=[genai.protos.Part(text=f"Resumo simulado ({len(str(prompt))} caracteres).")]),
+            first_token_latency=self.first_token_latency
+        )
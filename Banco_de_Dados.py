@@ -1,28 +1,123 @@
+import re
+import time
 import sqlite3
 import base64
-from PIL import Image
-import io
+import hashlib
+import queue
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+import Metricas
+
+
+class HistoryMessage(NamedTuple):
+    """
+    Mensagem do histórico no formato binário usado pelo motor de IA.
+    'image_data' são os bytes exatamente como lidos do SQLite, sem base64.
+    """
+    id: int
+    role: str
+    content: str
+    image_data: Optional[bytes]
+    image_mime_type: Optional[str]
+
 
 # Esta classe encapsula toda a lógica de interação com o banco de dados SQLite.
 class banco_de_dados:
     """
     Gerencia as operações de banco de dados para o histórico de chat.
     Utiliza SQLite e armazena mensagens, imagens e o tipo MIME em um arquivo local.
+    As imagens ficam em uma tabela separada ('images'), endereçada pelo SHA-256 do
+    conteúdo: a linha da mensagem guarda apenas a referência ('image_hash').
     """
+    # Pragmas aplicados a cada conexão do pool. WAL permite leituras concorrentes
+    # com a escrita, e synchronous=NORMAL é seguro em WAL (só perde a última
+    # transação em caso de queda de energia, nunca corrompe o arquivo).
+    CONNECTION_PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA cache_size=-16000",  # ~16 MB de cache de páginas por conexão
+        "PRAGMA temp_store=MEMORY",
+    )
+    # Conexões ociosas mantidas abertas para reuso entre as threads (GUI e motor)
+    POOL_SIZE = 4
+    # Tamanho do cache de statements preparados de cada conexão
+    STATEMENT_CACHE_SIZE = 256
+    # Tempo máximo (s) que uma escrita espera pelo lock do arquivo
+    BUSY_TIMEOUT = 10.0
+    # Quantidade de imagens movidas por transação na migração de BLOBs antigos
+    IMAGE_MIGRATION_BATCH = 50
+    # Espaço máximo (bytes) das miniaturas da GUI; as usadas há mais tempo são removidas
+    MAX_THUMBNAIL_BYTES = 32 * 1024 * 1024
+    # Intervalo mínimo (s) entre atualizações do 'last_used' de uma miniatura: a
+    # ordem LRU não precisa ser exata, e assim rolar o histórico quase não escreve
+    THUMBNAIL_TOUCH_INTERVAL = 5 * 60
+
+    # Conversa usada quando nenhuma é informada (e a que recebe as mensagens antigas)
+    DEFAULT_CONVERSATION = 'default'
+    # Marcadores usados em volta dos termos encontrados nos trechos da busca
+    SEARCH_HIGHLIGHT = ('[', ']')
+    # Tokens de contexto em cada trecho retornado pela busca
+    SEARCH_SNIPPET_TOKENS = 16
+    # Maior id possível no SQLite (limite superior quando não há 'before_id')
+    MAX_MESSAGE_ID = 2 ** 63 - 1
+
     def __init__(self, db_name='historico_chat.db'):
         """
         Inicializa o gerenciador de banco de dados e garante que a tabela
         'messages' com as colunas necessárias exista.
         """
         self.db_name = db_name
+        self._pool = queue.LifoQueue(maxsize=self.POOL_SIZE)
+        self._closed = False
         self.init_db()
 
+    def _create_connection(self):
+        """
+        Abre uma nova conexão de longa duração já configurada com os pragmas do pool.
+        'check_same_thread=False' é seguro aqui: o pool garante que cada conexão
+        seja usada por uma única thread de cada vez.
+        """
+        conn = sqlite3.connect(
+            self.db_name,
+            timeout=self.BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    @contextmanager
     def _get_connection(self):
         """
-        Função auxiliar para obter uma nova conexão com o banco de dados.
-        Retorna a conexão para uso com o 'with' (context manager).
+        Empresta uma conexão do pool para uso com o 'with' (context manager).
+        Ao sair do bloco a transação é confirmada (ou desfeita em caso de erro)
+        e a conexão volta para o pool, mantendo os statements preparados em cache.
         """
-        return sqlite3.connect(self.db_name)
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._create_connection()
+
+        try:
+            with conn:
+                yield conn
+        finally:
+            try:
+                if self._closed:
+                    raise queue.Full
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def close(self):
+        """Fecha todas as conexões ociosas do pool."""
+        self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
 
     def _check_and_add_column(self, conn, cursor, column_name, column_type):
         """Função auxiliar para verificar e adicionar uma coluna se ela não existir."""
@@ -41,6 +136,9 @@ class banco_de_dados:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
+
+                # O modo WAL é persistente no arquivo: basta ativá-lo uma vez
+                cursor.execute("PRAGMA journal_mode=WAL")
                 
                 # Cria a tabela de mensagens com as colunas essenciais
                 cursor.execute('''
@@ -50,7 +148,9 @@ class banco_de_dados:
                         content TEXT NOT NULL,
                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                         image_data BLOB NULL,
-                        image_mime_type TEXT NULL
+                        image_mime_type TEXT NULL,
+                        image_hash TEXT NULL,
+                        conversation_id TEXT NOT NULL DEFAULT 'default'
                     )
                 ''')
                 conn.commit()
@@ -58,12 +158,173 @@ class banco_de_dados:
                 # Garante que colunas adicionais para a imagem estejam presentes
                 self._check_and_add_column(conn, cursor, 'image_data', 'BLOB NULL')
                 self._check_and_add_column(conn, cursor, 'image_mime_type', 'TEXT NULL')
+                self._check_and_add_column(conn, cursor, 'image_hash', 'TEXT NULL')
+
+                # Várias conversas no mesmo banco: mensagens antigas ficam na conversa padrão
+                self._check_and_add_column(conn, cursor, 'conversation_id', "TEXT NOT NULL DEFAULT 'default'")
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, id)"
+                )
+
+                # Armazenamento endereçado por conteúdo: uma linha por imagem distinta
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS images (
+                        hash TEXT PRIMARY KEY,
+                        mime_type TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        data BLOB NOT NULL
+                    )
+                ''')
+
+                # Miniaturas da GUI, geradas sob demanda e endereçadas pelo hash da imagem e
+                # pela largura. A primeira versão da tabela tinha só o hash como chave; como as
+                # miniaturas são geradas de novo quando faltam, a tabela antiga é descartada.
+                cursor.execute("PRAGMA table_info(thumbnails)")
+                if [row[1] for row in cursor.fetchall() if row[5]] == ['hash']:
+                    cursor.execute("DROP TABLE thumbnails")
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS thumbnails (
+                        hash TEXT NOT NULL,
+                        width INTEGER NOT NULL,
+                        size INTEGER NOT NULL,
+                        data BLOB NOT NULL,
+                        last_used REAL NOT NULL,
+                        PRIMARY KEY (hash, width)
+                    )
+                ''')
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_thumbnails_last_used ON thumbnails (last_used)")
+
+                # Resumos acumulados da conversa: cada linha cobre as mensagens até 'last_message_id'
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS conversation_summaries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        summary TEXT NOT NULL,
+                        last_message_id INTEGER NOT NULL,
+                        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                        conversation_id TEXT NOT NULL DEFAULT 'default'
+                    )
+                ''')
+                cursor.execute("PRAGMA table_info(conversation_summaries)")
+                if 'conversation_id' not in [column[1] for column in cursor.fetchall()]:
+                    cursor.execute(
+                        "ALTER TABLE conversation_summaries ADD COLUMN conversation_id TEXT NOT NULL DEFAULT 'default'"
+                    )
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_summaries_conversation ON conversation_summaries (conversation_id, id)"
+                )
+
+            # Índice de busca textual (FTS5) sincronizado com 'messages'
+            self._init_fts()
+
+            # Bancos antigos guardam o BLOB na própria linha da mensagem
+            self._migrate_inline_images()
             
             print(f"Banco de dados '{self.db_name}' inicializado com sucesso.")
         except sqlite3.Error as e:
             print(f"ERRO durante a inicialização do BD: {e}")
 
-    def save_message(self, role, content, image_data=None, image_mime_type=None):
+    def _init_fts(self):
+        """
+        Cria o índice FTS5 'messages_fts' (tabela de conteúdo externo: o texto fica
+        apenas em 'messages') e os gatilhos que o mantêm sincronizado. Em bancos já
+        existentes, o índice é preenchido com o histórico na primeira execução.
+        Se o SQLite não tiver FTS5, a busca cai para um LIKE simples.
+        """
+        self.fts_enabled = False
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'")
+                already_indexed = cursor.fetchone() is not None
+
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+                        content,
+                        content='messages',
+                        content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_ai AFTER INSERT ON messages BEGIN
+                        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_ad AFTER DELETE ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                    END
+                ''')
+                cursor.execute('''
+                    CREATE TRIGGER IF NOT EXISTS messages_fts_au AFTER UPDATE OF content ON messages BEGIN
+                        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+                    END
+                ''')
+
+                if not already_indexed:
+                    cursor.execute("SELECT COUNT(*) FROM messages")
+                    total = cursor.fetchone()[0]
+                    if total:
+                        cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+                        print(f"Índice de busca criado para {total} mensagem(ns) existente(s).")
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            print(f"AVISO: FTS5 indisponível neste SQLite. A busca no histórico usará LIKE. Detalhes: {e}")
+
+    def _migrate_inline_images(self):
+        """
+        Move os BLOBs de 'messages.image_data' (formato antigo) para a tabela 'images',
+        deixando na mensagem apenas o 'image_hash'. Executa em lotes curtos para não
+        segurar o lock de escrita por muito tempo; é idempotente e retomável.
+        """
+        migrated = 0
+        last_id = 0
+        try:
+            while True:
+                with self._get_connection() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        "SELECT id, image_data, image_mime_type FROM messages "
+                        "WHERE id > ? AND image_data IS NOT NULL ORDER BY id LIMIT ?",
+                        (last_id, self.IMAGE_MIGRATION_BATCH)
+                    )
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+
+                    for message_id, image_data, mime_type in rows:
+                        image_hash = self._store_image(cursor, image_data, mime_type or 'image/jpeg')
+                        cursor.execute(
+                            "UPDATE messages SET image_hash = ?, image_data = NULL WHERE id = ?",
+                            (image_hash, message_id)
+                        )
+                        last_id = message_id
+                    migrated += len(rows)
+        except sqlite3.Error as e:
+            print(f"ERRO: Falha ao migrar imagens para o armazenamento separado. Detalhes: {e}")
+
+        if migrated:
+            print(f"{migrated} imagem(ns) migrada(s) para a tabela 'images'. "
+                  f"Execute 'VACUUM' para devolver o espaço liberado ao disco.")
+
+    @staticmethod
+    def _store_image(cursor, image_data, image_mime_type, image_hash=None):
+        """
+        Grava a imagem na tabela 'images' (se ainda não existir) e retorna o hash.
+        Imagens idênticas enviadas novamente reaproveitam a mesma linha.
+        :param image_hash: SHA-256 (hex) dos bytes, se já calculado.
+        """
+        image_hash = image_hash or hashlib.sha256(image_data).hexdigest()
+        cursor.execute(
+            "INSERT OR IGNORE INTO images (hash, mime_type, size, data) VALUES (?, ?, ?, ?)",
+            (image_hash, image_mime_type, len(image_data), image_data)
+        )
+        return image_hash
+
+    @Metricas.medido('db.save_message')
+    def save_message(self, role, content, image_data=None, image_mime_type=None, conversation_id=DEFAULT_CONVERSATION,
+                     image_hash=None):
         """
         Salva uma nova mensagem no banco de dados.
         CORREÇÃO: Esta função AGORA DEVE SER CHAMADA com o 'content' como string, 
@@ -72,6 +333,9 @@ class banco_de_dados:
         :param content: O conteúdo da mensagem (texto)
         :param image_data: Dados de imagem em bytes (opcional)
         :param image_mime_type: O tipo MIME da imagem (ex: 'image/png') (opcional)
+        :param conversation_id: A conversa à qual a mensagem pertence.
+        :param image_hash: SHA-256 (hex) de 'image_data', se já calculado (ImagemPreparada).
+        :return: O 'id' da mensagem salva ou None se ela não foi salva.
         """
         if role == 'user' and not content and not image_data:
              print("AVISO: Tentativa de salvar mensagem de usuário sem texto e sem imagem. Ignorado.")
@@ -83,28 +347,39 @@ class banco_de_dados:
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
+                if not image_data:
+                    image_hash = None
+                else:
+                    image_mime_type = image_mime_type or 'image/jpeg'
+                    image_hash = self._store_image(cursor, image_data, image_mime_type, image_hash)
                 cursor.execute(
-                    "INSERT INTO messages (role, content, image_data, image_mime_type) VALUES (?, ?, ?, ?)", 
-                    (role, content, image_data, image_mime_type)
+                    "INSERT INTO messages (role, content, image_hash, image_mime_type, conversation_id) VALUES (?, ?, ?, ?, ?)", 
+                    (role, content, image_hash, image_mime_type, conversation_id)
                 )
-                conn.commit()
+                return cursor.lastrowid
         except sqlite3.Error as e:
             print(f"ERRO: Não foi possível salvar a mensagem. Detalhes: {e}")
+        return None
 
-    def get_last_messages(self, num_messages=100):
+    @Metricas.medido('db.get_last_messages')
+    def get_last_messages(self, num_messages=100, conversation_id=DEFAULT_CONVERSATION):
         """
         Recupera as últimas N mensagens do banco de dados para formar o histórico de chat.
         Formata os dados no formato de 'parts' esperado pelo modelo Gemini.
         :param num_messages: O número de mensagens a serem recuperadas.
+        :param conversation_id: A conversa cujas mensagens serão lidas.
         :return: Uma lista de dicionários formatada para o modelo Gemini.
         """
         history = []
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
+                # O JOIN só lê as páginas da tabela 'images' para as linhas que têm imagem
                 cursor.execute(
-                    "SELECT role, content, image_data, image_mime_type FROM messages ORDER BY id DESC LIMIT ?", 
-                    (num_messages,)
+                    "SELECT m.role, m.content, i.data, i.mime_type FROM messages m "
+                    "LEFT JOIN images i ON i.hash = m.image_hash "
+                    "WHERE m.conversation_id = ? ORDER BY m.id DESC LIMIT ?", 
+                    (conversation_id, num_messages)
                 )
                 rows = cursor.fetchall()
 
@@ -130,9 +405,41 @@ class banco_de_dados:
             
         return history
 
-    def get_all_messages(self):
+    @Metricas.medido('db.get_context_messages')
+    def get_context_messages(self, num_messages=100, after_id=0, conversation_id=DEFAULT_CONVERSATION):
+        """
+        Recupera as últimas N mensagens como registros tipados (HistoryMessage).
+        Diferente de 'get_last_messages', as imagens são entregues como os próprios
+        bytes do SQLite, prontos para o 'inline_data' da API, sem codificar em base64.
+        :param num_messages: O número de mensagens a serem recuperadas.
+        :param after_id: Ignora as mensagens com id menor ou igual a este
+                         (por exemplo, as que já estão cobertas pelo resumo).
+        :param conversation_id: A conversa cujas mensagens serão lidas.
+        :return: Lista de HistoryMessage em ordem cronológica.
+        """
+        history = []
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT m.id, m.role, m.content, i.data, i.mime_type FROM messages m "
+                    "LEFT JOIN images i ON i.hash = m.image_hash "
+                    "WHERE m.conversation_id = ? AND m.id > ? ORDER BY m.id DESC LIMIT ?",
+                    (conversation_id, after_id, num_messages)
+                )
+                rows = cursor.fetchall()
+                rows.reverse()
+                history = [HistoryMessage._make(row) for row in rows]
+
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível recuperar o histórico para o motor de IA. Detalhes: {e}")
+
+        return history
+
+    @Metricas.medido('db.get_all_messages')
+    def get_all_messages(self, conversation_id=DEFAULT_CONVERSATION):
         """
-        Recupera TODAS as mensagens do banco de dados para exibição na GUI.
+        Recupera TODAS as mensagens de uma conversa para exibição na GUI.
         Retorna os dados em um formato simples (texto + bytes de imagem) para o Tkinter.
         :return: Uma lista de dicionários com 'role', 'text' e 'image_data' (bytes).
         """
@@ -142,7 +449,9 @@ class banco_de_dados:
                 cursor = conn.cursor()
                 # Seleciona as colunas necessárias, ordenadas cronologicamente
                 cursor.execute(
-                    "SELECT role, content, image_data FROM messages ORDER BY id ASC"
+                    "SELECT m.role, m.content, i.data FROM messages m "
+                    "LEFT JOIN images i ON i.hash = m.image_hash WHERE m.conversation_id = ? ORDER BY m.id ASC",
+                    (conversation_id,)
                 )
                 rows = cursor.fetchall()
                 
@@ -159,15 +468,358 @@ class banco_de_dados:
             
         return history
 
-    def clear_history(self):
+    @Metricas.medido('db.get_paginated_messages')
+    def get_paginated_messages(self, before_id=None, after_id=None, limit=50, include_images=False,
+                               conversation_id=DEFAULT_CONVERSATION):
         """
-        Deleta todas as mensagens da tabela, limpando o histórico do chat.
+        Recupera uma página do histórico usando paginação por cursor (keyset) no 'id'.
+        Ao contrário de OFFSET, o SQLite salta direto para o cursor pela chave primária,
+        então o custo de cada página não cresce com o tamanho da tabela.
+        :param before_id: Retorna as mensagens com id menor que este (página mais antiga).
+        :param after_id: Retorna as mensagens com id maior que este (página mais nova).
+        :param limit: O número máximo de mensagens na página.
+        :param include_images: Se False, os bytes da imagem NÃO são lidos; use
+                               'get_message_image' para carregá-los sob demanda.
+        :param conversation_id: A conversa cujas mensagens serão lidas.
+        :return: Lista de dicionários com 'id', 'role', 'text', 'image_data', 'image_hash'
+                 e 'has_image', sempre em ordem cronológica. Sem cursores, retorna a
+                 página mais recente.
         """
+        if before_id is not None and after_id is not None:
+            print("AVISO: 'before_id' e 'after_id' informados juntos. Usando apenas 'before_id'.")
+            after_id = None
+
+        # Sem imagens, a consulta nem menciona a tabela 'images'
+        if include_images:
+            query = (
+                "SELECT m.id, m.role, m.content, i.data, m.image_hash FROM messages m "
+                "LEFT JOIN images i ON i.hash = m.image_hash "
+            )
+        else:
+            query = "SELECT m.id, m.role, m.content, NULL, m.image_hash FROM messages m "
+
+        # O índice (conversation_id, id) atende o filtro e a ordenação juntos
+        if after_id is not None:
+            # Avança a partir do cursor: já vem em ordem crescente
+            query += "WHERE m.conversation_id = ? AND m.id > ? ORDER BY m.id ASC LIMIT ?"
+            params = (conversation_id, after_id, limit)
+        elif before_id is not None:
+            query += "WHERE m.conversation_id = ? AND m.id < ? ORDER BY m.id DESC LIMIT ?"
+            params = (conversation_id, before_id, limit)
+        else:
+            query += "WHERE m.conversation_id = ? ORDER BY m.id DESC LIMIT ?"
+            params = (conversation_id, limit)
+
+        page = []
         try:
             with self._get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute("DELETE FROM messages")
+                cursor.execute(query, params)
+                rows = cursor.fetchall()
+
+                # Páginas lidas de trás para frente são invertidas para a ordem cronológica
+                if after_id is None:
+                    rows.reverse()
+
+                for message_id, role, content, image_data, image_hash in rows:
+                    page.append({
+                        'id': message_id,
+                        'role': role,
+                        'text': content,
+                        'image_data': image_data,
+                        'image_hash': image_hash,
+                        'has_image': image_hash is not None
+                    })
+
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível recuperar a página do histórico. Detalhes: {e}")
+
+        return page
+
+    @Metricas.medido('db.get_messages_by_ids')
+    def get_messages_by_ids(self, message_ids, conversation_id=DEFAULT_CONVERSATION):
+        """
+        Carrega o texto de mensagens específicas (usado pela memória semântica).
+        :param message_ids: Lista de ids.
+        :param conversation_id: Só retorna mensagens desta conversa.
+        :return: Lista de dicionários {'id', 'role', 'text', 'timestamp'} em ordem de id.
+        """
+        messages = []
+        if not message_ids:
+            return messages
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                placeholders = ",".join("?" * len(message_ids))
+                cursor.execute(
+                    f"SELECT id, role, content, timestamp FROM messages "
+                    f"WHERE id IN ({placeholders}) AND conversation_id = ? ORDER BY id",
+                    list(message_ids) + [conversation_id]
+                )
+                for message_id, role, content, timestamp in cursor.fetchall():
+                    messages.append({'id': message_id, 'role': role, 'text': content, 'timestamp': timestamp})
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível carregar as mensagens {list(message_ids)}. Detalhes: {e}")
+
+        return messages
+
+    @Metricas.medido('db.get_message_image')
+    def get_message_image(self, message_id):
+        """
+        Carrega sob demanda os bytes da imagem de uma única mensagem.
+        :param message_id: O 'id' da mensagem.
+        :return: Uma tupla (image_data, image_mime_type) ou (None, None).
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT i.data, i.mime_type FROM messages m "
+                    "JOIN images i ON i.hash = m.image_hash WHERE m.id = ?",
+                    (message_id,)
+                )
+                row = cursor.fetchone()
+                if row:
+                    return row[0], row[1]
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível carregar a imagem da mensagem {message_id}. Detalhes: {e}")
+
+        return None, None
+
+    def get_image(self, image_hash):
+        """
+        Carrega uma imagem diretamente pelo seu hash SHA-256.
+        :return: Uma tupla (data, mime_type) ou (None, None).
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT data, mime_type FROM images WHERE hash = ?", (image_hash,))
+                row = cursor.fetchone()
+                if row:
+                    return row[0], row[1]
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível carregar a imagem {image_hash}. Detalhes: {e}")
+
+        return None, None
+
+    @Metricas.medido('db.get_message_thumbnail')
+    def get_message_thumbnail(self, message_id, width):
+        """
+        Procura a miniatura da imagem de uma mensagem, sem ler a imagem original.
+        :param message_id: O 'id' da mensagem.
+        :param width: Largura da miniatura desejada (miniaturas de outra largura são ignoradas).
+        :return: Uma tupla (thumbnail_data, image_hash): sem miniatura, 'thumbnail_data'
+                 é None e 'image_hash' indica a imagem a partir da qual gerá-la.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT m.image_hash, t.data, t.last_used FROM messages m "
+                    "LEFT JOIN thumbnails t ON t.hash = m.image_hash AND t.width = ? WHERE m.id = ?",
+                    (width, message_id)
+                )
+                row = cursor.fetchone()
+                if not row:
+                    return None, None
+                image_hash, data, last_used = row
+                now = time.time()
+                if data is not None and now - last_used >= self.THUMBNAIL_TOUCH_INTERVAL:
+                    cursor.execute(
+                        "UPDATE thumbnails SET last_used = ? WHERE hash = ? AND width = ?", (now, image_hash, width)
+                    )
+                return data, image_hash
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível carregar a miniatura da mensagem {message_id}. Detalhes: {e}")
+        return None, None
+
+    @Metricas.medido('db.save_thumbnail')
+    def save_thumbnail(self, image_hash, data, width):
+        """
+        Guarda a miniatura de uma imagem e, se o total passar de MAX_THUMBNAIL_BYTES,
+        remove as miniaturas usadas há mais tempo (elas são geradas de novo se precisar).
+        """
+        if not image_hash or not data:
+            return
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT OR REPLACE INTO thumbnails (hash, width, size, data, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (image_hash, width, len(data), data, time.time())
+                )
+                # A soma de 'size' é barata (a coluna vem antes do BLOB na linha); a ordenação
+                # por uso só roda quando o limite é de fato ultrapassado
+                cursor.execute("SELECT COALESCE(SUM(size), 0) FROM thumbnails")
+                if cursor.fetchone()[0] > self.MAX_THUMBNAIL_BYTES:
+                    cursor.execute(
+                        "DELETE FROM thumbnails WHERE rowid IN ("
+                        "SELECT id FROM (SELECT rowid AS id, SUM(size) OVER (ORDER BY last_used DESC, rowid) AS total "
+                        "FROM thumbnails) WHERE total > ?)",
+                        (self.MAX_THUMBNAIL_BYTES,)
+                    )
+        except sqlite3.Error as e:
+            print(f"AVISO: Não foi possível guardar a miniatura {image_hash}. Detalhes: {e}")
+
+    @staticmethod
+    def _to_fts_query(query, operator=' '):
+        """
+        Converte texto livre em uma consulta FTS5 segura: cada palavra vira um
+        termo entre aspas (sem operadores nem sintaxe do usuário).
+        """
+        terms = re.findall(r"\w+", query or "")
+        return operator.join(f'"{term}"' for term in terms)
+
+    @Metricas.medido('db.search_messages')
+    def search_messages(self, query, limit=10, before_id=None, conversation_id=DEFAULT_CONVERSATION):
+        """
+        Busca mensagens pelo texto, ordenadas por relevância (BM25).
+        Todas as palavras precisam aparecer; se nada for encontrado, basta uma.
+        :param query: Texto livre a ser procurado.
+        :param limit: Número máximo de resultados.
+        :param before_id: Considera apenas mensagens com id menor que este (opcional).
+        :param conversation_id: A conversa onde buscar (uma conversa nunca vê as outras).
+        :return: Lista de dicionários {'id', 'role', 'timestamp', 'snippet'}.
+        """
+        if not self._to_fts_query(query):
+            return []
+        if not getattr(self, 'fts_enabled', False):
+            return self._search_messages_like(query, limit, before_id, conversation_id)
+
+        start, end = self.SEARCH_HIGHLIGHT
+        upper_id = before_id if before_id is not None else self.MAX_MESSAGE_ID
+        results = []
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                for operator in (' ', ' OR '):
+                    fts_query = self._to_fts_query(query, operator)
+                    cursor.execute(
+                        "SELECT m.id, m.role, m.timestamp, "
+                        "snippet(messages_fts, 0, ?, ?, '…', ?) "
+                        "FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                        "WHERE messages_fts MATCH ? AND m.conversation_id = ? AND m.id < ? "
+                        "ORDER BY rank LIMIT ?",
+                        (start, end, self.SEARCH_SNIPPET_TOKENS, fts_query,
+                         conversation_id, upper_id, limit)
+                    )
+                    rows = cursor.fetchall()
+                    if rows or ' ' not in fts_query:
+                        break
+                for message_id, role, timestamp, snippet in rows:
+                    results.append({'id': message_id, 'role': role, 'timestamp': timestamp, 'snippet': snippet})
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível buscar no histórico. Detalhes: {e}")
+
+        return results
+
+    def _search_messages_like(self, query, limit, before_id, conversation_id=DEFAULT_CONVERSATION):
+        """Busca alternativa (sem FTS5): mensagens que contêm o texto, das mais novas às mais antigas."""
+        results = []
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT id, role, timestamp, content FROM messages "
+                    "WHERE conversation_id = ? AND content LIKE ? AND id < ? ORDER BY id DESC LIMIT ?",
+                    (conversation_id, f"%{query.strip()}%",
+                     before_id if before_id is not None else self.MAX_MESSAGE_ID, limit)
+                )
+                for message_id, role, timestamp, content in cursor.fetchall():
+                    results.append({'id': message_id, 'role': role, 'timestamp': timestamp, 'snippet': content[:200]})
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível buscar no histórico. Detalhes: {e}")
+        return results
+
+    @Metricas.medido('db.get_latest_summary')
+    def get_latest_summary(self, conversation_id=DEFAULT_CONVERSATION):
+        """
+        Recupera o resumo mais recente da conversa.
+        :param conversation_id: A conversa resumida.
+        :return: Uma tupla (summary, last_message_id) ou (None, 0) se ainda não houver resumo.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT summary, last_message_id FROM conversation_summaries "
+                    "WHERE conversation_id = ? ORDER BY id DESC LIMIT 1",
+                    (conversation_id,)
+                )
+                row = cursor.fetchone()
+                if row:
+                    return row[0], row[1]
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível recuperar o resumo da conversa. Detalhes: {e}")
+
+        return None, 0
+
+    @Metricas.medido('db.save_summary')
+    def save_summary(self, summary, last_message_id, conversation_id=DEFAULT_CONVERSATION):
+        """
+        Salva uma nova versão do resumo da conversa.
+        :param summary: O texto do resumo acumulado.
+        :param last_message_id: O id da última mensagem incorporada ao resumo.
+        :param conversation_id: A conversa resumida.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO conversation_summaries (summary, last_message_id, conversation_id) VALUES (?, ?, ?)",
+                    (summary, last_message_id, conversation_id)
+                )
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível salvar o resumo da conversa. Detalhes: {e}")
+
+    def list_conversations(self):
+        """
+        Lista as conversas existentes, da atividade mais recente para a mais antiga.
+        :return: Lista de dicionários {'conversation_id', 'messages', 'last_message_id'}.
+        """
+        conversations = []
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "SELECT conversation_id, COUNT(*), MAX(id) FROM messages "
+                    "GROUP BY conversation_id ORDER BY MAX(id) DESC"
+                )
+                for conversation_id, total, last_id in cursor.fetchall():
+                    conversations.append({'conversation_id': conversation_id, 'messages': total, 'last_message_id': last_id})
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível listar as conversas. Detalhes: {e}")
+
+        return conversations
+
+    @Metricas.medido('db.clear_history')
+    def clear_history(self, conversation_id=None):
+        """
+        Deleta as mensagens, limpando o histórico do chat.
+        :param conversation_id: Limpa apenas esta conversa; sem ele, limpa o banco inteiro.
+        """
+        try:
+            with self._get_connection() as conn:
+                cursor = conn.cursor()
+                if conversation_id is None:
+                    cursor.execute("DELETE FROM messages")
+                    cursor.execute("DELETE FROM images")
+                    cursor.execute("DELETE FROM thumbnails")
+                    cursor.execute("DELETE FROM conversation_summaries")
+                else:
+                    cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+                    cursor.execute("DELETE FROM conversation_summaries WHERE conversation_id = ?", (conversation_id,))
+                    # Imagens compartilhadas com outras conversas continuam no banco
+                    cursor.execute(
+                        "DELETE FROM images WHERE hash NOT IN "
+                        "(SELECT image_hash FROM messages WHERE image_hash IS NOT NULL)"
+                    )
+                    cursor.execute("DELETE FROM thumbnails WHERE hash NOT IN (SELECT hash FROM images)")
                 conn.commit()
-                print(f"Histórico do banco de dados '{self.db_name}' limpo.")
+                if conversation_id is None:
+                    print(f"Histórico do banco de dados '{self.db_name}' limpo.")
+                else:
+                    print(f"Histórico da conversa '{conversation_id}' do banco '{self.db_name}' limpo.")
         except sqlite3.Error as e:
             print(f"ERRO: Não foi possível limpar o histórico. Detalhes: {e}")
\ No newline at end of file
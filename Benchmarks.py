@@ -0,0 +1,1117 @@
+"""
+Benchmarks locais da Nyx.
+Não precisam de chave de API nem de rede: cada benchmark cria seus próprios
+arquivos em um diretório temporário.
+
+Uso:
+    python Benchmarks.py              # executa todos
+    python Benchmarks.py conexoes     # executa apenas o benchmark indicado
+    python Benchmarks.py turnos inicializacao   # turnos/s, p50/p99, inicialização e memória
+    python Benchmarks.py cliente_http # verificações (assert) do cliente HTTP com servidor stub
+"""
+import os
+import sys
+import time
+import atexit
+import base64
+import shutil
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import statistics
+import tracemalloc
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Arquivos que os módulos da Nyx criariam no diretório atual (o banco global do
+# Nyx_Core e o cache de páginas do browse_url) ficam em um diretório temporário
+_DIRETORIO_TEMPORARIO = tempfile.mkdtemp(prefix="nyx-benchmarks-")
+atexit.register(shutil.rmtree, _DIRETORIO_TEMPORARIO, ignore_errors=True)
+os.environ.setdefault('NYX_DB_PATH', os.path.join(_DIRETORIO_TEMPORARIO, 'historico_chat.db'))
+os.environ.setdefault('NYX_PAGE_CACHE_DB', os.path.join(_DIRETORIO_TEMPORARIO, 'cache_paginas.db'))
+
+from Banco_de_Dados import banco_de_dados
+
+
+# --- Utilitários ---
+
+def _percentil(amostras, p):
+    """Retorna o percentil 'p' (0-100) de uma lista de amostras."""
+    ordenadas = sorted(amostras)
+    if not ordenadas:
+        return 0.0
+    k = min(len(ordenadas) - 1, max(0, int(round(p / 100 * (len(ordenadas) - 1)))))
+    return ordenadas[k]
+
+
+def _resumo_latencias(nome, amostras_s):
+    """Formata p50/p99/média de uma lista de latências em segundos."""
+    ms = [a * 1000 for a in amostras_s]
+    return (f"{nome}: p50={_percentil(ms, 50):.3f} ms | p99={_percentil(ms, 99):.3f} ms | "
+            f"média={statistics.mean(ms):.3f} ms")
+
+
+# --- Benchmark: conexões do banco de dados ---
+
+class _banco_por_chamada(banco_de_dados):
+    """
+    Reproduz o comportamento antigo do banco_de_dados: uma conexão nova por
+    operação, sem pool e no modo de journal padrão (rollback).
+    """
+    def init_db(self):
+        super().init_db()
+        # O init_db atual ativa o WAL, que fica gravado no arquivo: volta ao rollback
+        conn = sqlite3.connect(self.db_name)
+        try:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _get_connection(self):
+        conn = sqlite3.connect(self.db_name)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def benchmark_conexoes(num_inserts=2000, num_leituras=300):
+    """
+    Compara inserts/s e latência de leitura entre conexões por chamada e o pool
+    de conexões persistentes em WAL.
+    """
+    print("\n=== Benchmark: conexões do banco de dados ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rotulo, classe in (("por chamada", _banco_por_chamada), ("pool + WAL", banco_de_dados)):
+            db = classe(os.path.join(tmp, f"{classe.__name__}.db"))
+            with db._get_connection() as conn:
+                journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            print(f"[{rotulo}] journal_mode={journal_mode}")
+
+            inicio = time.perf_counter()
+            for i in range(num_inserts):
+                role = 'user' if i % 2 == 0 else 'model'
+                db.save_message(role, f"Mensagem de teste número {i} " + "x" * 200)
+            duracao = time.perf_counter() - inicio
+
+            leituras = []
+            for _ in range(num_leituras):
+                inicio = time.perf_counter()
+                db.get_last_messages(num_messages=100)
+                leituras.append(time.perf_counter() - inicio)
+
+            print(f"[{rotulo}] inserts/s: {num_inserts / duracao:,.0f}")
+            print(f"[{rotulo}] " + _resumo_latencias("get_last_messages(100)", leituras))
+
+            if hasattr(db, 'close'):
+                db.close()
+
+
+# --- Benchmark: carregamento do histórico para o motor (base64 x binário) ---
+
+def _carregar_via_base64(db, num_messages):
+    """Caminho antigo: o DB codifica em base64 e o motor decodifica de volta."""
+    imagens = []
+    for msg in db.get_last_messages(num_messages=num_messages):
+        for part in msg['parts']:
+            if 'inline_data' in part:
+                imagens.append(base64.b64decode(part['inline_data']['data']))
+    return imagens
+
+
+def _carregar_via_binario(db, num_messages):
+    """Caminho novo: os bytes do SQLite são repassados sem conversão."""
+    return [msg.image_data for msg in db.get_context_messages(num_messages=num_messages) if msg.image_data]
+
+
+def benchmark_historico_binario(num_mensagens=100, tamanho_imagem=300_000, repeticoes=20):
+    """
+    Mede o tempo e o pico de memória para montar o contexto do motor com
+    imagens, comparando o caminho via base64 com o caminho binário.
+    """
+    print("\n=== Benchmark: histórico do motor (base64 x binário) ===")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = banco_de_dados(os.path.join(tmp, "historico.db"))
+        for i in range(num_mensagens):
+            # Imagens distintas para que a deduplicação não mascare o custo
+            db.save_message('user', f"Foto {i}", os.urandom(tamanho_imagem), 'image/jpeg')
+
+        for rotulo, carregar in (("base64", _carregar_via_base64), ("binário", _carregar_via_binario)):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                carregar(db, num_mensagens)
+                tempos.append(time.perf_counter() - inicio)
+
+            tracemalloc.start()
+            carregar(db, num_mensagens)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(f"[{rotulo}] " + _resumo_latencias(f"{num_mensagens} mensagens com imagem", tempos)
+                  + f" | pico de memória={pico / 1024 / 1024:.1f} MB")
+
+        db.close()
+
+
+# --- Benchmark: busca no histórico (FTS5 x LIKE) ---
+
+_PALAVRAS = ("viagem praia montanha receita bolo chocolate python código banco dados gato cachorro "
+             "livro filme música trabalho reunião projeto prazo médico exame futebol jogo").split()
+
+
+def benchmark_busca(num_mensagens=100_000, num_buscas=200):
+    """
+    Mede a latência de search_messages (FTS5 + BM25 + snippet) em um histórico
+    grande e compara com a varredura 'content LIKE' equivalente.
+    """
+    print("\n=== Benchmark: busca no histórico (FTS5 x LIKE) ===")
+    import random
+    gerador = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = banco_de_dados(os.path.join(tmp, "busca.db"))
+        with db._get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO messages (role, content) VALUES (?, ?)",
+                ((('user', 'model')[i % 2], " ".join(gerador.choices(_PALAVRAS, k=25)) + f" item{i}")
+                 for i in range(num_mensagens))
+            )
+
+        consultas = [f"item{gerador.randrange(num_mensagens)}" for _ in range(num_buscas)]
+        for rotulo, buscar in (("FTS5", db.search_messages), ("LIKE", db._search_messages_like)):
+            tempos = []
+            # A varredura LIKE é lenta: poucas repetições bastam
+            for consulta in consultas[:num_buscas if rotulo == "FTS5" else 20]:
+                inicio = time.perf_counter()
+                buscar(consulta, 10, None)
+                tempos.append(time.perf_counter() - inicio)
+            print(f"[{rotulo}] " + _resumo_latencias(f"busca em {num_mensagens:,} mensagens", tempos))
+        db.close()
+
+
+# --- Benchmark: memória semântica (recall e latência) ---
+
+_FATOS_MEMORIA = (
+    ("Meu cachorro se chama Thor e adora correr na praia.", "Qual é o nome do meu cachorro?"),
+    ("Sou alérgico a camarão, nunca me recomende pratos com ele.", "Tenho alguma alergia a frutos do mar?"),
+    ("Minha irmã Carla mora em Lisboa desde 2019.", "Em que cidade mora a minha irmã?"),
+    ("Estou aprendendo violino com uma professora às terças.", "Qual instrumento eu estou aprendendo?"),
+    ("Meu aniversário é dia 14 de março.", "Quando é o meu aniversário?"),
+    ("Trabalho como engenheira de dados em um hospital.", "Qual é a minha profissão?"),
+    ("Meu carro é um Fiat Uno vermelho de 2010.", "Qual carro eu tenho?"),
+    ("Prefiro café sem açúcar e bem forte.", "Como eu gosto do meu café?"),
+)
+
+
+def benchmark_memoria(tamanhos=(10_000, 100_000), k=3):
+    """
+    Mede a memória semântica: recall@k de fatos plantados entre mensagens de
+    distração (com o embedding escolhido por NYX_MEMORY_MODEL; 'local' por
+    padrão) e a latência da busca no índice memmap com 10k e 100k vetores.
+    """
+    print("\n=== Benchmark: memória semântica ===")
+    import random
+    import numpy as np
+    from Memoria_Semantica import MemoriaSemantica, EmbeddingLocal, EmbeddingPorHash
+
+    modelo = os.getenv('NYX_MEMORY_MODEL', 'local')
+    embedder = EmbeddingPorHash() if modelo.lower() == 'local' else EmbeddingLocal(modelo)
+    gerador = random.Random(7)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Recall: fatos espalhados entre 2.000 mensagens de distração
+        db = banco_de_dados(os.path.join(tmp, "memoria.db"))
+        posicoes = set(gerador.sample(range(2000), len(_FATOS_MEMORIA)))
+        fatos = iter(_FATOS_MEMORIA)
+        with db._get_connection() as conn:
+            for i in range(2000):
+                texto = next(fatos)[0] if i in posicoes else " ".join(gerador.choices(_PALAVRAS, k=20))
+                conn.execute("INSERT INTO messages (role, content) VALUES ('user', ?)", (texto,))
+
+        memoria = MemoriaSemantica(db, embedder, os.path.join(tmp, "memoria"))
+        inicio = time.perf_counter()
+        memoria.sync()
+        print(f"[{embedder.name}] indexação: {len(memoria) / (time.perf_counter() - inicio):,.0f} mensagens/s")
+
+        acertos = 0
+        for fato, pergunta in _FATOS_MEMORIA:
+            ids = [message_id for message_id, _ in memoria.search(pergunta, k)]
+            textos = [msg['text'] for msg in db.get_messages_by_ids(ids)]
+            acertos += fato in textos
+        print(f"[{embedder.name}] recall@{k}: {acertos}/{len(_FATOS_MEMORIA)}")
+        db.close()
+
+        # Latência: índices sintéticos com vetores aleatórios normalizados
+        for tamanho in tamanhos:
+            vetores = np.random.default_rng(1).standard_normal((tamanho, embedder.dim)).astype(np.float32)
+            vetores /= np.linalg.norm(vetores, axis=1, keepdims=True)
+            indice = MemoriaSemantica(None, embedder, os.path.join(tmp, f"latencia_{tamanho}"))
+            indice._open()
+            indice._append_vectors(vetores, np.arange(1, tamanho + 1, dtype=np.int64))
+            print(f"[{embedder.name}] índice com {tamanho:,} vetores: "
+                  f"{os.path.getsize(indice._vec_path) / 1024 / 1024:.1f} MB")
+
+            tempos = []
+            for i in range(50):
+                inicio = time.perf_counter()
+                indice.search(_FATOS_MEMORIA[i % len(_FATOS_MEMORIA)][1], k)
+                tempos.append(time.perf_counter() - inicio)
+            print(f"[{embedder.name}] " + _resumo_latencias(f"busca em {tamanho:,} vetores", tempos))
+
+
+# --- Benchmark: tempo até o primeiro token (TTFT) com backend falso ---
+
+def _importar_motor(diretorio):
+    """
+    Importa o Nyx_Core com o diretório de trabalho em 'diretorio', para que o
+    banco global do módulo seja criado ali e não no histórico real.
+    """
+    anterior = os.getcwd()
+    os.chdir(diretorio)
+    try:
+        import Nyx_Core
+    finally:
+        os.chdir(anterior)
+    return Nyx_Core
+
+
+def benchmark_ttft(num_turnos=10, latencia_primeiro_token=0.15, atraso_por_pedaco=0.01):
+    """
+    Compara o tempo até o primeiro token (stream_message) com o tempo até a
+    resposta completa (send_message), usando o FakeGenerativeModel com latências
+    configuradas e um turno que passa por uma chamada de ferramenta.
+    """
+    print("\n=== Benchmark: tempo até o primeiro token (backend falso) ===")
+    from Backend_Falso import FakeGenerativeModel
+
+    resposta = "Esta é uma resposta simulada longa o bastante para ser entregue em vários pedaços. " * 4
+    with tempfile.TemporaryDirectory() as tmp:
+        nyx_core = _importar_motor(tmp)
+        db = banco_de_dados(os.path.join(tmp, "ttft.db"))
+
+        def novo_motor():
+            script = []
+            for _ in range(num_turnos):
+                script.append({'text': resposta})
+            modelo = FakeGenerativeModel(
+                script=script,
+                first_token_latency=latencia_primeiro_token,
+                token_delay=atraso_por_pedaco
+            )
+            return nyx_core.ChatEngine(model=modelo, db=db)
+
+        motor = novo_motor()
+        bloqueante = []
+        for i in range(num_turnos):
+            inicio = time.perf_counter()
+            motor.send_message(f"Pergunta {i}")
+            bloqueante.append(time.perf_counter() - inicio)
+
+        async def medir_streaming():
+            motor_stream = novo_motor()
+            primeiros, totais = [], []
+            for i in range(num_turnos):
+                inicio = time.perf_counter()
+                primeiro = None
+                async for evento in motor_stream.stream_message(f"Pergunta {i}"):
+                    if evento['type'] == 'text' and primeiro is None:
+                        primeiro = time.perf_counter() - inicio
+                primeiros.append(primeiro)
+                totais.append(time.perf_counter() - inicio)
+            return primeiros, totais
+
+        primeiros, totais = asyncio.run(medir_streaming())
+
+        print("[send_message] " + _resumo_latencias("resposta visível", bloqueante))
+        print("[stream_message] " + _resumo_latencias("primeiro token", primeiros))
+        print("[stream_message] " + _resumo_latencias("resposta completa", totais))
+        db.close()
+
+
+def benchmark_servidor(num_clientes=16, mensagens_por_cliente=10, max_turnos=8, latencia_primeiro_token=0.05):
+    """
+    Mede o Servidor_HTTP com o backend falso: vários clientes, cada um na sua
+    conversa, enviando mensagens em paralelo. Reporta a vazão, a latência por
+    turno e quantas requisições foram recusadas com 429 (e repetidas).
+    """
+    print("\n=== Benchmark: servidor HTTP (backend falso) ===")
+    import json
+    import http.client
+    from concurrent.futures import ThreadPoolExecutor
+    from Backend_Falso import FakeGenerativeModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _importar_motor(tmp)
+        import Servidor_HTTP
+        db = banco_de_dados(os.path.join(tmp, "servidor.db"))
+        modelo = FakeGenerativeModel(first_token_latency=latencia_primeiro_token, token_delay=0.002)
+        servidor = Servidor_HTTP.criar_servidor(model=modelo, db=db, max_concurrent_turns=max_turnos)
+        servidor.RequestHandlerClass.log_message = lambda *args: None
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        host, porta = servidor.server_address[:2]
+
+        def cliente(indice):
+            conexao = http.client.HTTPConnection(host, porta, timeout=30)
+            latencias, recusadas = [], 0
+            for i in range(mensagens_por_cliente):
+                corpo = json.dumps({'text': f"Cliente {indice}, mensagem {i}"})
+                inicio = time.perf_counter()
+                while True:
+                    conexao.request("POST", f"/conversations/cliente{indice}/messages", corpo,
+                                    {'Content-Type': 'application/json'})
+                    resposta = conexao.getresponse()
+                    resposta.read()
+                    if resposta.status != 429:
+                        break
+                    recusadas += 1
+                    time.sleep(0.01)
+                latencias.append(time.perf_counter() - inicio)
+            conexao.close()
+            return latencias, recusadas
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_clientes) as executor:
+            resultados = list(executor.map(cliente, range(num_clientes)))
+        duracao = time.perf_counter() - inicio
+
+        latencias = [latencia for resultado in resultados for latencia in resultado[0]]
+        recusadas = sum(resultado[1] for resultado in resultados)
+        print(f"{num_clientes} clientes x {mensagens_por_cliente} mensagens, até {max_turnos} turnos simultâneos: "
+              f"{len(latencias) / duracao:.1f} turnos/s | {recusadas} respostas 429")
+        print(_resumo_latencias("turno (incluindo novas tentativas)", latencias))
+        servidor.shutdown()
+        servidor.server_close()
+        servidor.sessions.close()
+        db.close()
+
+
+# --- Benchmark: pipeline de imagens ---
+
+def _foto_sintetica(largura=4000, altura=3000):
+    """JPEG de ~12 MP com textura parecida com a de uma foto (gradientes + ruído)."""
+    import io
+    import random
+    from PIL import Image
+    gerador = random.Random(7)
+    base = Image.new('RGB', (80, 60))
+    base.putdata([tuple(gerador.randrange(256) for _ in range(3)) for _ in range(80 * 60)])
+    foto = base.resize((largura, altura), Image.BICUBIC)
+    ruido = Image.effect_noise((largura, altura), 24).convert('RGB')
+    foto = Image.blend(foto, ruido, 0.08)
+    buffer = io.BytesIO()
+    foto.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def benchmark_imagem(repeticoes=5):
+    """
+    Compara o caminho antigo (decodificação completa, JPEG para o banco e outro
+    JPEG para a GUI, imagem original para a API) com o Processamento_de_Imagem
+    (redução na decodificação, uma codificação e uma miniatura).
+    """
+    print("\n=== Benchmark: pipeline de imagens (foto de 12 MP) ===")
+    import io
+    from PIL import Image
+    from Processamento_de_Imagem import preparar_imagem
+
+    foto = _foto_sintetica()
+
+    def caminho_antigo():
+        imagem = Image.open(io.BytesIO(foto)).convert("RGB")
+        banco, gui = io.BytesIO(), io.BytesIO()
+        imagem.save(banco, format='JPEG')
+        imagem.save(gui, format='JPEG')
+        return len(banco.getvalue()), imagem.size
+
+    for rotulo, executar in (("antigo", caminho_antigo), ("pipeline", lambda: preparar_imagem(foto))):
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = executar()
+            tempos.append(time.perf_counter() - inicio)
+        if rotulo == "antigo":
+            gravado, dimensoes = resultado
+            enviado = f"{len(foto) / 1024:.0f} KB + recodificação pelo SDK"
+        else:
+            gravado, dimensoes = len(resultado.data), (resultado.width, resultado.height)
+            enviado = f"{gravado / 1024:.0f} KB (miniatura: {len(resultado.thumbnail) / 1024:.0f} KB)"
+        print(f"[{rotulo}] mediana={statistics.median(tempos) * 1000:.0f} ms | {dimensoes[0]}x{dimensoes[1]} | "
+              f"gravado no banco: {gravado / 1024:.0f} KB | enviado à API: {enviado}")
+
+
+def benchmark_miniaturas(num_imagens=30, repeticoes=3):
+    """
+    Mede o carregamento das imagens de uma página do histórico na GUI: imagem
+    original decodificada e redimensionada a cada vez (caminho antigo) x
+    miniatura guardada no banco (primeira geração e leituras seguintes).
+    """
+    print("\n=== Benchmark: miniaturas do histórico ===")
+    import io
+    from PIL import Image
+    from Backend_Falso import FakeGenerativeModel
+    from Processamento_de_Imagem import preparar_imagem
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nyx_core = _importar_motor(tmp)
+        db = banco_de_dados(os.path.join(tmp, "miniaturas.db"))
+        foto = _foto_sintetica()
+        ids = []
+        for i in range(num_imagens):
+            # Imagens distintas (o banco deduplica por hash), já no tamanho do pipeline
+            imagem = preparar_imagem(foto, quality=80 + i % 10)
+            ids.append(db.save_message("user", f"Foto {i}", imagem.data, imagem.mime_type))
+        motor = nyx_core.ChatEngine(model=FakeGenerativeModel(), db=db)
+
+        def caminho_antigo():
+            for message_id in ids:
+                dados, _ = motor.get_message_image(message_id)
+                imagem = Image.open(io.BytesIO(dados))
+                imagem.resize((250, int(imagem.height * 250 / imagem.width)), Image.LANCZOS)
+
+        def miniaturas():
+            for message_id in ids:
+                Image.open(io.BytesIO(motor.get_message_thumbnail(message_id))).load()
+
+        inicio = time.perf_counter()
+        miniaturas()
+        primeira = time.perf_counter() - inicio
+        for rotulo, executar in (("imagem original", caminho_antigo), ("miniatura em cache", miniaturas)):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                executar()
+                tempos.append(time.perf_counter() - inicio)
+            print(f"[{rotulo}] {num_imagens} imagens: mediana={statistics.median(tempos) * 1000:.0f} ms")
+        print(f"[miniatura, primeira geração] {num_imagens} imagens: {primeira * 1000:.0f} ms")
+        motor.close()
+        db.close()
+
+
+# --- Benchmark: turnos completos (modelo falso + ferramentas gravadas) ---
+
+# Respostas gravadas das ferramentas de rede e a latência típica de cada uma:
+# os turnos são reproduzidos sem rede, sem chaves e sempre com o mesmo resultado
+_FERRAMENTAS_GRAVADAS = {
+    'obter_clima': ("A temperatura em Recife é de 28.0°C, com céu limpo.", 0.02),
+    'ipinfo': ("{'ip': '200.0.0.1', 'city': 'Recife', 'region': 'Pernambuco', 'country': 'BR', 'org': 'AS0 Provedor'}", 0.015),
+    'google_search': ("Título: Resultado simulado\nLink: https://exemplo.com.br\nTrecho: Trecho gravado da pesquisa.\n---", 0.05),
+    'browse_url': ("Conteúdo principal da página gravada. " * 40, 0.08),
+}
+_CENARIOS_PADRAO = (
+    "Como está o tempo em Recife hoje?",
+    "Pesquise as novidades do Python 3.13 e me resuma.",
+    "Abra a documentação do SQLite sobre FTS5 e explique o BM25.",
+    "Onde eu estou agora e vai chover?",
+)
+
+
+def _cenarios(caminho="requests.jsonl"):
+    """
+    Perguntas usadas nos turnos: os títulos do arquivo de pedidos (um JSON por
+    linha com 'title'), se existir ao lado deste script, ou os cenários padrão.
+    """
+    caminho = os.path.join(os.path.dirname(os.path.abspath(__file__)), caminho)
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            import json
+            titulos = [json.loads(linha)['title'] for linha in f if linha.strip()]
+    except (OSError, ValueError, KeyError):
+        titulos = []
+    return titulos or list(_CENARIOS_PADRAO)
+
+
+def _executar_ferramenta_gravada(tool_name, tool_args):
+    """Substitui o execute_tool: devolve a resposta gravada após a latência gravada."""
+    resposta, latencia = _FERRAMENTAS_GRAVADAS.get(tool_name, (f"Resultado gravado de {tool_name}.", 0.0))
+    time.sleep(latencia)
+    return resposta
+
+
+def _roteiro_de_turnos(cenarios, num_turnos):
+    """Cada turno: uma rodada com duas ferramentas em paralelo e a resposta final."""
+    roteiro = []
+    for i in range(num_turnos):
+        pergunta = cenarios[i % len(cenarios)]
+        roteiro.append({'function_calls': [
+            ('obter_clima', {'cidade': 'Recife'}),
+            ('google_search', {'query': pergunta}),
+        ]})
+        roteiro.append({'text': f"Resposta {i}: com base no clima e na pesquisa sobre '{pergunta}', segue o resumo. " * 3})
+    return roteiro
+
+
+def benchmark_turnos(num_turnos=200, latencia_primeiro_token=0.0):
+    """
+    Reproduz turnos completos (pergunta -> chamadas de função -> resposta final,
+    com gravação no banco) pelo ChatEngine, com o FakeGenerativeModel e as
+    ferramentas gravadas. Mede turnos/s, latência por turno e memória.
+    """
+    print("\n=== Benchmark: turnos completos (modelo falso + ferramentas gravadas) ===")
+    from Backend_Falso import FakeGenerativeModel
+
+    cenarios = _cenarios()
+    with tempfile.TemporaryDirectory() as tmp:
+        nyx_core = _importar_motor(tmp)
+        db = banco_de_dados(os.path.join(tmp, "turnos.db"))
+        modelo = FakeGenerativeModel(
+            script=_roteiro_de_turnos(cenarios, num_turnos), first_token_latency=latencia_primeiro_token
+        )
+        original = nyx_core.execute_tool
+        nyx_core.execute_tool = _executar_ferramenta_gravada
+        try:
+            rss_inicial = _rss_mb()
+            tracemalloc.start()
+            motor = nyx_core.ChatEngine(model=modelo, db=db)
+            latencias = []
+            inicio = time.perf_counter()
+            for i in range(num_turnos):
+                inicio_turno = time.perf_counter()
+                motor.send_message(cenarios[i % len(cenarios)])
+                latencias.append(time.perf_counter() - inicio_turno)
+            duracao = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            motor.close()
+        finally:
+            nyx_core.execute_tool = original
+
+        print(f"{num_turnos} turnos ({len(cenarios)} cenário(s)), 2 ferramentas por turno: "
+              f"{num_turnos / duracao:.1f} turnos/s")
+        print(_resumo_latencias("turno", latencias))
+        print(f"memória: pico Python={pico / 1024 ** 2:.1f} MB | RSS {rss_inicial:.0f} -> {_rss_mb():.0f} MB")
+        db.close()
+
+
+def benchmark_inicializacao(tamanhos=(1_000, 10_000, 100_000), repeticoes=3):
+    """
+    Mede o tempo de 'import Nyx_Core' em um processo novo e o tempo de criar um
+    ChatEngine (que reidrata a sessão do banco) com históricos de vários tamanhos.
+    """
+    print("\n=== Benchmark: inicialização e carga do histórico ===")
+    from Backend_Falso import FakeGenerativeModel
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tempos = [_tempo_de_import("Nyx_Core", {}, cwd=tmp) for _ in range(repeticoes)]
+        print(f"import Nyx_Core (processo novo): mediana={statistics.median(tempos):.2f}s")
+
+        nyx_core = _importar_motor(tmp)
+        for tamanho in tamanhos:
+            db = banco_de_dados(os.path.join(tmp, f"historico_{tamanho}.db"))
+            with db._get_connection() as conn:
+                conn.executemany(
+                    "INSERT INTO messages (role, content) VALUES (?, ?)",
+                    ((('user', 'model')[i % 2], f"Mensagem {i} do histórico, com um texto de tamanho comum para uma conversa.")
+                     for i in range(tamanho))
+                )
+
+            tempos, paginas = [], []
+            for _ in range(repeticoes):
+                tracemalloc.start()
+                inicio = time.perf_counter()
+                motor = nyx_core.ChatEngine(model=FakeGenerativeModel(), db=db)
+                tempos.append(time.perf_counter() - inicio)
+                inicio = time.perf_counter()
+                motor.get_paginated_history(limit=50)
+                paginas.append(time.perf_counter() - inicio)
+                _, pico = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                motor.close()
+            print(f"[{tamanho:>7,} mensagens] ChatEngine(): mediana={statistics.median(tempos) * 1000:.1f} ms | "
+                  f"primeira página da GUI: {statistics.median(paginas) * 1000:.2f} ms | pico Python={pico / 1024 ** 2:.1f} MB")
+            db.close()
+
+
+# --- Servidor HTTP local de apoio ---
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Responde a qualquer GET com um JSON fixo, mantendo a conexão aberta (HTTP/1.1)."""
+    protocol_version = "HTTP/1.1"
+    # Cabeçalhos e corpo saem em escritas separadas: com o Nagle ativo, cada resposta
+    # em uma conexão keep-alive esperaria o ACK atrasado do cliente (~40 ms)
+    disable_nagle_algorithm = True
+    body = b'{"cod": 200, "main": {"temp": 25.0}, "weather": [{"description": "ceu limpo"}]}'
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        self.wfile.write(self.body)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor_stub(handler=_StubHandler):
+    """Sobe um servidor HTTP local em uma porta livre e retorna (servidor, url_base)."""
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}"
+
+
+# --- Benchmark: cliente HTTP compartilhado ---
+
+def benchmark_http(num_requisicoes=300):
+    """
+    Compara requests.get isolado (nova conexão por chamada) com a sessão
+    compartilhada do Cliente_HTTP, contra um servidor stub local.
+    """
+    print("\n=== Benchmark: cliente HTTP (servidor stub local) ===")
+    import requests
+    import Cliente_HTTP
+
+    servidor, url_base = iniciar_servidor_stub()
+    try:
+        for rotulo, buscar in (
+            ("requests.get", lambda url: requests.get(url, timeout=5)),
+            ("sessão compartilhada", lambda url: Cliente_HTTP.get(url, tool='benchmark')),
+        ):
+            tempos = []
+            for i in range(num_requisicoes):
+                inicio = time.perf_counter()
+                buscar(f"{url_base}/clima?q={i}").json()
+                tempos.append(time.perf_counter() - inicio)
+            print(f"[{rotulo}] " + _resumo_latencias("GET", tempos))
+
+        histograma = Cliente_HTTP.latency_stats()['benchmark']
+        print(f"[histograma] {histograma['count']} chamadas, soma={histograma['sum'] * 1000:.0f} ms")
+    finally:
+        servidor.shutdown()
+
+
+class _RetryStubHandler(_StubHandler):
+    """
+    Stub para as verificações do cliente HTTP. Conta as requisições por caminho e
+    guarda a porta de origem de cada uma (a mesma porta = a mesma conexão reaproveitada):
+        /status/<código>   sempre responde com o código (429 com 'Retry-After: 0')
+        /instavel          503 na primeira requisição, 200 nas seguintes
+        /lento             espera 'atraso' segundos antes de responder
+    """
+    body = b"<html><body><p>Pagina de teste do cliente HTTP compartilhado.</p></body></html>"
+    atraso = 1.5
+    requisicoes = {}
+    portas = []
+    _lock = threading.Lock()
+
+    def do_GET(self):
+        caminho = self.path.split('?')[0]
+        with self._lock:
+            self.requisicoes[caminho] = self.requisicoes.get(caminho, 0) + 1
+            self.portas.append(self.client_address[1])
+            numero = self.requisicoes[caminho]
+
+        status = 200
+        if caminho.startswith('/status/'):
+            status = int(caminho.rsplit('/', 1)[1])
+        elif caminho == '/instavel' and numero == 1:
+            status = 503
+        elif caminho == '/lento':
+            time.sleep(self.atraso)
+
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "0")
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(self.body)))
+        self.end_headers()
+        try:
+            self.wfile.write(self.body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # cliente desistiu (timeout)
+
+
+def verificar_cliente_http():
+    """
+    Verificações (com assert) do Cliente_HTTP contra um servidor stub local:
+    novas tentativas em 429/5xx e a desistência virando erro de ferramenta,
+    DEFAULT_TIMEOUT aplicado, sessão compartilhada entre as ferramentas,
+    latência registrada no histograma e o serviço de pesquisa construído uma vez.
+    """
+    print("\n=== Verificações: cliente HTTP (servidor stub local) ===")
+    import requests
+    import Cliente_HTTP
+    from Gerenciador_de_Ferramentas import execute_tool
+
+    tentativas = 1 + Cliente_HTTP.RETRY_POLICY.total
+    servidor, url_base = iniciar_servidor_stub(_RetryStubHandler)
+    try:
+        # Resposta transitória: a nova tentativa é transparente para a ferramenta
+        resposta = Cliente_HTTP.get(f"{url_base}/instavel", tool='verificacao')
+        assert resposta.status_code == 200, resposta.status_code
+        assert _RetryStubHandler.requisicoes['/instavel'] == 2, _RetryStubHandler.requisicoes
+        print("[retry] 503 seguido de 200: 2 requisições, sucesso")
+
+        # Falha persistente: desiste após as tentativas e a RetryError vira ERRO_FERRAMENTA
+        for status in (429, 503):
+            saida = execute_tool('browse_url', {'url': f"{url_base}/status/{status}"})
+            assert saida.startswith("ERRO_FERRAMENTA") and f"too many {status} error responses" in saida, saida
+            assert _RetryStubHandler.requisicoes[f'/status/{status}'] == tentativas, _RetryStubHandler.requisicoes
+            print(f"[retry] {status} persistente: {tentativas} requisições, erro de ferramenta retornado")
+
+        # DEFAULT_TIMEOUT vale para chamadas sem 'timeout' explícito
+        timeout_original = Cliente_HTTP.DEFAULT_TIMEOUT
+        Cliente_HTTP.DEFAULT_TIMEOUT = (1, 0.2)
+        inicio = time.perf_counter()
+        try:
+            Cliente_HTTP.get(f"{url_base}/lento", tool='verificacao')
+            raise AssertionError("GET em /lento deveria estourar o DEFAULT_TIMEOUT")
+        except requests.exceptions.RequestException as e:
+            duracao = time.perf_counter() - inicio
+            assert duracao < _RetryStubHandler.atraso, duracao
+            print(f"[timeout] /lento interrompido em {duracao * 1000:.0f} ms ({type(e).__name__})")
+        finally:
+            Cliente_HTTP.DEFAULT_TIMEOUT = timeout_original
+
+        # Sessão compartilhada: ferramentas diferentes reaproveitam a mesma conexão
+        sessao = Cliente_HTTP.get_session()
+        del _RetryStubHandler.portas[:]
+        Cliente_HTTP.get(f"{url_base}/pagina?ferramenta=clima", tool='obter_clima').raise_for_status()
+        saida = execute_tool('browse_url', {'url': f"{url_base}/pagina?ferramenta=browse"})
+        assert not saida.startswith("ERRO_FERRAMENTA"), saida
+        Cliente_HTTP.get(f"{url_base}/pagina?ferramenta=ipinfo", tool='ipinfo').raise_for_status()
+        assert Cliente_HTTP.get_session() is sessao
+        assert len(set(_RetryStubHandler.portas)) == 1, _RetryStubHandler.portas
+        print(f"[sessão] obter_clima, browse_url e ipinfo: {len(_RetryStubHandler.portas)} requisições em 1 conexão")
+
+        # Cada chamada (inclusive as que falharam) entra no histograma da ferramenta
+        estatisticas = Cliente_HTTP.latency_stats()
+        assert estatisticas['verificacao']['count'] == 2, estatisticas['verificacao']
+        assert estatisticas['browse_url']['count'] >= 3, estatisticas['browse_url']
+        assert estatisticas['obter_clima']['count'] >= 1 and estatisticas['ipinfo']['count'] >= 1
+        assert estatisticas['verificacao']['sum'] > 0
+        print("[histograma] " + ", ".join(f"{tool}={stats['count']}" for tool, stats in sorted(estatisticas.items())))
+    finally:
+        servidor.shutdown()
+
+    _verificar_servico_de_pesquisa()
+
+
+def _verificar_servico_de_pesquisa(num_pesquisas=6, num_threads=3):
+    """
+    O serviço do Google Search é construído uma única vez por processo, mesmo com
+    pesquisas em várias threads. O googleapiclient e o httplib2 são substituídos
+    por objetos falsos só durante a verificação (ela não usa a rede).
+    """
+    import types
+    from unittest import mock
+    from concurrent.futures import ThreadPoolExecutor
+    import Cliente_HTTP
+    from Google_Search import google_search
+
+    construcoes = []
+
+    class _Requisicao:
+        def __init__(self, query):
+            self.query = query
+
+        def execute(self, http=None):
+            assert http is not None, "a requisição deve usar o httplib2.Http da thread"
+            return {'items': [{'title': self.query, 'link': 'http://exemplo', 'snippet': '...'}]}
+
+    class _Servico:
+        def cse(self):
+            return types.SimpleNamespace(list=lambda q, cx: _Requisicao(q))
+
+    def build(*args, **kwargs):
+        construcoes.append(kwargs.get('developerKey'))
+        return _Servico()
+
+    discovery = types.ModuleType('googleapiclient.discovery')
+    discovery.build = build
+    httplib2 = types.ModuleType('httplib2')
+    httplib2.Http = lambda timeout=None: object()
+    modulos = {'googleapiclient': types.ModuleType('googleapiclient'),
+               'googleapiclient.discovery': discovery, 'httplib2': httplib2}
+    chave = f"chave-de-verificacao-{time.time_ns()}"
+    with mock.patch.dict(sys.modules, modulos), \
+            mock.patch.dict(os.environ, {'GOOGLE_SEARCH_API_KEY': chave, 'GOOGLE_SEARCH_CX_ID': 'cx'}):
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            saidas = list(executor.map(google_search, [f"pesquisa {i}" for i in range(num_pesquisas)]))
+    assert all(saida.startswith("Título: pesquisa") for saida in saidas), saidas
+    assert construcoes == [chave], construcoes
+    print(f"[pesquisa] {num_pesquisas} pesquisas em {num_threads} threads: serviço construído 1 vez")
+
+
+# --- Benchmark: browse_url completo x streaming ---
+
+def _pagina_grande(num_paragrafos):
+    """Gera uma página HTML com navegação, scripts e muitos parágrafos de conteúdo."""
+    partes = [b"<html><head><meta charset='utf-8'><title>Teste</title>",
+              b"<script>" + b"var x = 1;" * 2000 + b"</script></head><body>",
+              b"<nav>" + b"<a href='/'>Menu</a> " * 500 + b"</nav>"]
+    for i in range(num_paragrafos):
+        partes.append(f"<p>Parágrafo {i}: conteúdo da página de teste com <b>texto</b> suficiente.</p>".encode('utf-8'))
+    partes.append(b"<footer>Rodape</footer></body></html>")
+    return b"".join(partes)
+
+
+def benchmark_browse(num_paragrafos=60_000, repeticoes=5):
+    """
+    Compara o browse_url no modo completo (baixa tudo + BeautifulSoup) com o modo
+    streaming (leitura incremental limitada) em uma página grande servida localmente.
+    """
+    print("\n=== Benchmark: browse_url completo x streaming ===")
+    import Browser_Url
+
+    Browser_Url.PAGE_CACHE_DB = ''  # mede sempre o download e a extração
+    pagina = _pagina_grande(num_paragrafos)
+
+    class _PaginaHandler(_StubHandler):
+        body = pagina
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(self.body)))
+            self.end_headers()
+            try:
+                self.wfile.write(self.body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # o modo streaming fecha a conexão antes do fim
+
+    servidor, url_base = iniciar_servidor_stub(_PaginaHandler)
+    print(f"Página de {len(pagina) / 1024 / 1024:.1f} MB")
+    try:
+        for rotulo, streaming in (("completo", False), ("streaming", True)):
+            tempos = []
+            for _ in range(repeticoes):
+                inicio = time.perf_counter()
+                texto = Browser_Url.browse_url(f"{url_base}/pagina", streaming=streaming)
+                tempos.append(time.perf_counter() - inicio)
+            if texto.startswith("ERRO_FERRAMENTA"):
+                print(f"[{rotulo}] {texto}")
+                continue
+
+            tracemalloc.start()
+            Browser_Url.browse_url(f"{url_base}/pagina", streaming=streaming)
+            _, pico = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"[{rotulo}] " + _resumo_latencias("browse_url", tempos)
+                  + f" | pico de memória={pico / 1024 / 1024:.1f} MB | {len(texto)} caracteres")
+    finally:
+        servidor.shutdown()
+
+
+# --- Benchmark: inferência BERT isolada x micro-lotes ---
+
+_TEXTOS_SENTIMENTO = (
+    "Adorei o atendimento, foi tudo perfeito!",
+    "O produto chegou quebrado e ninguém me responde.",
+    "Achei normal, nada de especial.",
+    "Estou muito triste com essa notícia.",
+    "Que dia maravilhoso, estou muito feliz!",
+    "Não gostei, esperava bem mais pelo preço.",
+    "Funciona, mas a bateria dura pouco.",
+    "Melhor compra que fiz este ano.",
+)
+
+
+def benchmark_bert(num_textos=64, num_threads=16):
+    """
+    Compara a vazão (textos/s) do pipeline chamado texto a texto com a do
+    ServidorDeInferenciaBERT recebendo os mesmos textos de várias threads.
+    Os textos recebem um sufixo único para que o cache não interfira.
+    """
+    print("\n=== Benchmark: BERT isolado x micro-lotes (CPU) ===")
+    from concurrent.futures import ThreadPoolExecutor
+    import Analise_de_Sentimentos
+
+    classificador = Analise_de_Sentimentos.get_classifier()
+    if classificador is None:
+        print("ERRO: O classificador BERT não está disponível.")
+        return
+
+    textos = [f"{_TEXTOS_SENTIMENTO[i % len(_TEXTOS_SENTIMENTO)]} (#{i})" for i in range(num_textos)]
+
+    inicio = time.perf_counter()
+    for texto in textos:
+        classificador(texto)
+    isolado = time.perf_counter() - inicio
+    print(f"[isolado] {num_textos / isolado:.1f} textos/s")
+
+    servidor = Analise_de_Sentimentos.ServidorDeInferenciaBERT(classificador)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=num_threads) as executor:
+        list(executor.map(servidor.classify, textos))
+    em_lote = time.perf_counter() - inicio
+    print(f"[micro-lotes, {num_threads} threads] {num_textos / em_lote:.1f} textos/s | "
+          f"{servidor.stats['batches']} lotes, média de {servidor.stats['batched_texts'] / max(1, servidor.stats['batches']):.1f} textos/lote")
+
+
+# --- Benchmark: backends de sentimento (pytorch x int8 x onnx) ---
+
+def _rss_mb():
+    """Memória residente do processo em MB (psutil) ou, sem ele, o pico (resource)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico / 1024 ** 2 if sys.platform == 'darwin' else pico / 1024
+
+
+def _medir_backend_sentimento(backend, repeticoes=5):
+    """
+    Executado em um processo próprio (para isolar a memória de cada backend):
+    carrega o backend, mede latência e RSS e imprime o resultado em JSON.
+    """
+    import json
+    import Analise_de_Sentimentos
+
+    rss_inicial = _rss_mb()
+    inicio = time.perf_counter()
+    classificador = Analise_de_Sentimentos.build_classifier(backend)
+    carga = time.perf_counter() - inicio
+
+    saidas = classificador(list(_TEXTOS_SENTIMENTO), truncation=True)  # aquecimento + rótulos
+    latencias = []
+    for _ in range(repeticoes):
+        for texto in _TEXTOS_SENTIMENTO:
+            inicio = time.perf_counter()
+            classificador(texto, truncation=True)
+            latencias.append(time.perf_counter() - inicio)
+
+    print(json.dumps({
+        'carga_s': carga,
+        'rss_mb': _rss_mb() - rss_inicial,
+        'p50_ms': _percentil(latencias, 50) * 1000,
+        'p99_ms': _percentil(latencias, 99) * 1000,
+        'rotulos': [saida['label'] for saida in saidas],
+        'scores': [saida['score'] for saida in saidas],
+    }))
+
+
+def benchmark_backends_sentimento(backends=('pytorch', 'int8', 'onnx')):
+    """
+    Compara os backends de Analise_de_Sentimentos: tempo de carga, latência por
+    texto, memória adicional e paridade com o pipeline PyTorch original
+    (concordância dos rótulos e diferença média das estrelas previstas).
+    """
+    print("\n=== Benchmark: backends de sentimento ===")
+    import json
+    import subprocess
+
+    resultados = {}
+    for backend in backends:
+        processo = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--backend-sentimento', backend],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+        )
+        linhas = processo.stdout.strip().splitlines()
+        if processo.returncode != 0 or not linhas:
+            erro = (processo.stderr.strip().splitlines() or ["sem saída"])[-1]
+            print(f"[{backend}] indisponível: {erro}")
+            continue
+        resultados[backend] = resultado = json.loads(linhas[-1])
+        print(f"[{backend}] carga={resultado['carga_s']:.1f}s | p50={resultado['p50_ms']:.1f}ms | "
+              f"p99={resultado['p99_ms']:.1f}ms | RSS +{resultado['rss_mb']:.0f} MB")
+
+    referencia = resultados.get('pytorch')
+    if referencia is None:
+        print("AVISO: Sem o backend 'pytorch' não há referência para a paridade.")
+        return
+
+    estrelas = lambda rotulo: int(rotulo.split()[0])
+    for backend, resultado in resultados.items():
+        if backend == 'pytorch':
+            continue
+        pares = list(zip(referencia['rotulos'], resultado['rotulos']))
+        concordancia = sum(a == b for a, b in pares) / len(pares)
+        distancia = statistics.mean(abs(estrelas(a) - estrelas(b)) for a, b in pares)
+        print(f"[paridade {backend} x pytorch] rótulos iguais: {concordancia * 100:.0f}% | "
+              f"diferença média: {distancia:.2f} estrela(s)")
+
+
+# --- Benchmark: tempo de import e de inicialização ---
+
+def _tempo_de_import(modulo, env_extra, cwd=None):
+    """
+    Mede, em um processo novo, quanto tempo o 'import modulo' leva.
+    :param cwd: Diretório de trabalho do processo (padrão: o deste script).
+    """
+    return _tempo_em_processo_novo(f"import {modulo}", env_extra, cwd)
+
+
+def _tempo_em_processo_novo(comandos, env_extra, cwd=None):
+    """
+    Mede, em um processo novo, quanto tempo os comandos (código Python em uma
+    linha, separado por ';') levam.
+    :param cwd: Diretório de trabalho do processo (padrão: o deste script).
+    """
+    import subprocess
+    codigo = (
+        "import time; inicio = time.perf_counter(); "
+        f"{comandos}; print(time.perf_counter() - inicio)"
+    )
+    env = dict(os.environ, **env_extra)
+    # Com outro diretório de trabalho, os módulos da Nyx continuam importáveis
+    diretorio = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, (diretorio, env.get('PYTHONPATH'))))
+    saida = subprocess.run(
+        [sys.executable, "-c", codigo],
+        cwd=cwd or diretorio,
+        env=env, capture_output=True, text=True, check=True
+    )
+    return float(saida.stdout.strip().splitlines()[-1])
+
+
+def benchmark_import(repeticoes=3):
+    """
+    Compara o modelo BERT carregado no import (comportamento antigo,
+    NYX_SENTIMENT_PRELOAD=1) com o carregamento tardio. Desde o registro de
+    ferramentas, o Gerenciador_de_Ferramentas não importa mais o
+    Analise_de_Sentimentos, então o import medido é o do próprio módulo; o
+    segundo tempo vai do 'import Nyx_Core' até a primeira análise concluída.
+    """
+    print("\n=== Benchmark: import e inicialização das ferramentas ===")
+    primeira_analise = (
+        "import Nyx_Core; import Analise_de_Sentimentos; "
+        "Analise_de_Sentimentos.analisar_emocoes_local_bert('Primeira análise do processo.')"
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        for rotulo, env_extra in (("carregamento no import", {'NYX_SENTIMENT_PRELOAD': '1'}),
+                                  ("carregamento tardio", {'NYX_SENTIMENT_PRELOAD': '0'})):
+            tempos = [_tempo_de_import("Analise_de_Sentimentos", env_extra, cwd=tmp) for _ in range(repeticoes)]
+            print(f"[{rotulo}] import Analise_de_Sentimentos: mediana={statistics.median(tempos):.2f}s")
+            # O banco global do Nyx_Core é criado no diretório temporário
+            tempos = [_tempo_em_processo_novo(primeira_analise, env_extra, cwd=tmp) for _ in range(repeticoes)]
+            print(f"[{rotulo}] import Nyx_Core + primeira análise: mediana={statistics.median(tempos):.2f}s")
+
+
+BENCHMARKS = {
+    'conexoes': benchmark_conexoes,
+    'historico_binario': benchmark_historico_binario,
+    'imagem': benchmark_imagem,
+    'miniaturas': benchmark_miniaturas,
+    'busca': benchmark_busca,
+    'memoria': benchmark_memoria,
+    'ttft': benchmark_ttft,
+    'turnos': benchmark_turnos,
+    'inicializacao': benchmark_inicializacao,
+    'servidor': benchmark_servidor,
+    'http': benchmark_http,
+    'cliente_http': verificar_cliente_http,
+    'browse': benchmark_browse,
+    'bert': benchmark_bert,
+    'import': benchmark_import,
+    'sentimento_backends': benchmark_backends_sentimento,
+}
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--backend-sentimento']:
+        # Modo interno usado por benchmark_backends_sentimento
+        _medir_backend_sentimento(sys.argv[2])
+        sys.exit(0)
+
+    selecionados = sys.argv[1:] or list(BENCHMARKS)
+    for nome in selecionados:
+        if nome not in BENCHMARKS:
+            print(f"ERRO: Benchmark desconhecido: {nome}. Disponíveis: {', '.join(BENCHMARKS)}")
+            continue
+        BENCHMARKS[nome]()
@@ -1,43 +1,363 @@
-import requests
+import os
 import re
-from bs4 import BeautifulSoup
+import codecs
+import threading
+import requests
+from html.parser import HTMLParser
+import Cliente_HTTP
+from Cache_de_Paginas import CacheDePaginas
+
+# Limite razoável de caracteres para o contexto do LLM
+MAX_CHARS = 8000
+# Máximo de bytes lidos do corpo da resposta no modo streaming
+MAX_BYTES = 2 * 1024 * 1024
+# Texto lido em busca do conteúdo principal (o artigo pode vir depois do orçamento)
+MAX_CANDIDATE_CHARS = 5 * MAX_CHARS
+# Tamanho de cada pedaço lido da rede
+CHUNK_SIZE = 16 * 1024
+# Tipos de conteúdo aceitos; qualquer outro é recusado antes de baixar o corpo
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+TEXT_CONTENT_TYPES = ('text/plain',)
+# NYX_BROWSE_STREAMING=0 volta ao modo antigo (baixa tudo e usa o BeautifulSoup)
+STREAMING_ENABLED = os.getenv('NYX_BROWSE_STREAMING', '1').lower() not in ('0', 'false', 'nao', 'não')
+# NYX_BROWSE_MAIN_CONTENT=0 devolve o texto na ordem da página, sem escolher o corpo principal
+MAIN_CONTENT_ENABLED = os.getenv('NYX_BROWSE_MAIN_CONTENT', '1').lower() not in ('0', 'false', 'nao', 'não')
+# Arquivo do cache de páginas extraídas (NYX_PAGE_CACHE_DB vazio desativa o cache).
+# Padrão: a pasta de cache do usuário ($XDG_CACHE_HOME ou ~/.cache), não o diretório atual
+PAGE_CACHE_DB = os.getenv('NYX_PAGE_CACHE_DB', os.path.join(
+    os.getenv('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'nyx', 'cache_paginas.db'
+))
+
+HEADERS = {
+    # Adiciona um User-Agent para simular um navegador real e evitar bloqueios
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+TRUNCATED_NOTE = "\n... [Conteúdo truncado devido ao tamanho]"
+
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+
+def _clean_lines(text):
+    """Quebra em linhas, remove linhas vazias/apenas espaços e múltiplos espaços."""
+    lines = (line.strip() for line in text.splitlines())
+    chunks = (re.sub(r'\s+', ' ', phrase).strip() for line in lines for phrase in line.split("  "))
+    return [chunk for chunk in chunks if chunk]
+
 
-def browse_url(url: str) -> str:
+class _ExtratorDeTexto(HTMLParser):
     """
-    Navega até uma URL, extrai e retorna o texto visível da página.
-    Limita o texto retornado para evitar sobrecarga do modelo.
+    Extrai o texto visível de forma incremental (alimentado pedaço a pedaço),
+    registrando cada bloco de texto com o contêiner (div, article, section...)
+    em que aparece e quantos dos seus caracteres estão dentro de links. Para de
+    acumular quando 'max_chars' caracteres úteis foram coletados.
     """
-    print(f"DEBUG: Tentando navegar para a URL: {url}")
+    # Elementos cujo conteúdo é descartado (scripts, estilos, cabeçalhos, rodapés e navegação)
+    SKIP_TAGS = {'script', 'style', 'header', 'footer', 'nav', 'aside', 'noscript', 'template', 'svg'}
+    # Elementos que terminam uma linha de texto
+    BLOCK_TAGS = {'p', 'div', 'br', 'li', 'tr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'section',
+                  'article', 'main', 'table', 'ul', 'ol', 'pre', 'blockquote', 'title', 'dd', 'dt'}
+    # Elementos que podem conter o corpo principal da página
+    CONTAINER_TAGS = {'body', 'div', 'article', 'main', 'section', 'td', 'form'}
+
+    def __init__(self, max_chars):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.blocks = []                # (texto, caracteres em links, id do contêiner, tag do bloco)
+        self.containers = [(None, '')]  # id -> (id do pai, 'tag classe id'); 0 é a raiz
+        self.chars = 0
+        self.done = False
+        self._skip_depth = 0
+        self._link_depth = 0
+        self._stack = [('#root', 0)]    # pilha de contêineres abertos: (tag, id)
+        self._block_tag = None
+        self._current = []
+        self._current_chars = 0
+        self._current_link_chars = 0
+
+    def _flush(self):
+        if self._current:
+            text = "\n".join(_clean_lines("".join(self._current)))
+            if text:
+                link_chars = min(self._current_link_chars, len(text))
+                self.blocks.append((text, link_chars, self._stack[-1][1], self._block_tag))
+                self.chars += len(text) + 1
+            self._current = []
+            self._current_chars = 0
+            self._current_link_chars = 0
+            if self.chars >= self.max_chars:
+                self.done = True
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth += 1
+            return
+        if tag == 'a':
+            self._link_depth += 1
+        if tag in self.BLOCK_TAGS:
+            self._flush()
+            self._block_tag = tag
+        if tag in self.CONTAINER_TAGS:
+            attributes = dict(attrs)
+            hint = f"{tag} {attributes.get('class') or ''} {attributes.get('id') or ''}".lower()
+            self.containers.append((self._stack[-1][1], hint))
+            self._stack.append((tag, len(self.containers) - 1))
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in self.BLOCK_TAGS:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+            return
+        if tag == 'a':
+            self._link_depth = max(0, self._link_depth - 1)
+        if tag in self.BLOCK_TAGS:
+            self._flush()
+        if tag in self.CONTAINER_TAGS:
+            # Fecha até o contêiner correspondente (tolera HTML malformado)
+            for position in range(len(self._stack) - 1, 0, -1):
+                if self._stack[position][0] == tag:
+                    del self._stack[position:]
+                    break
+
+    def handle_data(self, data):
+        if not self._skip_depth and not self.done:
+            self._current.append(data)
+            self._current_chars += len(data)
+            if self._link_depth:
+                self._current_link_chars += len(data.strip())
+            # Páginas sem blocos não podem acumular texto indefinidamente
+            if self._current_chars >= self.max_chars:
+                self._flush()
+
+    def text(self):
+        self._flush()
+        return "\n".join(block[0] for block in self.blocks)
+
+
+# Pistas em class/id que indicam conteúdo principal ou acessório
+POSITIVE_HINTS = ('article', 'content', 'main', 'post', 'entry', 'story', 'texto', 'materia', 'noticia', 'body')
+NEGATIVE_HINTS = ('comment', 'sidebar', 'menu', 'footer', 'nav', 'share', 'social', 'related',
+                  'promo', 'banner', 'ad-', 'cookie', 'widget', 'rodape', 'breadcrumb')
+# Blocos com mais links do que isso são tratados como navegação
+MAX_LINK_DENSITY = 0.5
+# Abaixo disso o "conteúdo principal" encontrado não é confiável
+MIN_MAIN_CHARS = 250
+OTHER_CONTENT_NOTE = "\n\n[Outros trechos da página]\n"
+
+
+def _hint_factor(hint):
+    factor = 1.0
+    if any(word in hint for word in POSITIVE_HINTS) or hint.startswith(('article', 'main')):
+        factor *= 1.5
+    if any(word in hint for word in NEGATIVE_HINTS):
+        factor *= 0.3
+    return factor
+
+
+def _select_main_content(extractor, max_chars=MAX_CHARS):
+    """
+    Escolhe o contêiner com o corpo principal, no estilo do Readability: cada
+    bloco pontua pelo tamanho e pelas vírgulas, descontada a densidade de links,
+    e a pontuação sobe para o contêiner (inteira) e para o avô (metade). O texto
+    desse contêiner vem primeiro; o restante da página, sem blocos de links, só
+    completa o orçamento de caracteres.
+    """
+    blocks = extractor.blocks
+    containers = extractor.containers
+    if not blocks:
+        return ""
+
+    scores = [0.0] * len(containers)
+    total_chars = [0] * len(containers)
+    link_chars = [0] * len(containers)
+    for text, links, container, tag in blocks:
+        # Totais acumulados em todos os ancestrais, para a densidade de links do contêiner
+        node = container
+        while node is not None:
+            total_chars[node] += len(text)
+            link_chars[node] += links
+            node = containers[node][0]
+
+        if len(text) < 25:
+            continue
+        density = links / len(text)
+        score = (1 + text.count(',') + min(len(text) // 100, 3)) * (1 - density)
+        if tag in ('p', 'pre', 'blockquote'):
+            score *= 1.5
+        scores[container] += score
+        parent = containers[container][0]
+        if parent is not None:
+            scores[parent] += score / 2
+
+    final = [
+        scores[node] * (1 - link_chars[node] / max(1, total_chars[node])) * _hint_factor(containers[node][1])
+        for node in range(len(containers))
+    ]
+    best = max(range(1, len(containers)), key=final.__getitem__, default=0)
+
+    def inside_best(node):
+        while node is not None:
+            if node == best:
+                return True
+            node = containers[node][0]
+        return False
+
+    readable = [(text, container) for text, links, container, tag in blocks
+                if links / len(text) <= MAX_LINK_DENSITY]
+    main = [text for text, container in readable if inside_best(container)]
+    main_text = "\n".join(main)
+    if len(main_text) < MIN_MAIN_CHARS:
+        # Nenhum contêiner se destacou: devolve a página inteira, sem os blocos de links
+        return "\n".join(text for text, _ in readable)
+
+    rest = "\n".join(text for text, container in readable if not inside_best(container))
+    if rest and len(main_text) < max_chars:
+        return main_text + OTHER_CONTENT_NOTE + rest
+    return main_text
+
+
+def _decoder_for(response, first_chunk):
+    """
+    Escolhe a codificação: o charset do cabeçalho, senão o <meta charset> do
+    início do documento, senão UTF-8.
+    """
+    encoding = None
+    if 'charset=' in response.headers.get('Content-Type', '').lower():
+        encoding = response.encoding
+    if not encoding:
+        match = _META_CHARSET.search(first_chunk)
+        encoding = match.group(1).decode('ascii') if match else 'utf-8'
     try:
-        # Adiciona um User-Agent para simular um navegador real e evitar bloqueios
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        response = requests.get(url, headers=headers, timeout=10) # Timeout para evitar travamentos
+        return codecs.getincrementaldecoder(encoding)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+
+
+def get_page_cache():
+    """
+    Retorna o cache de páginas, aberto na primeira chamada (thread-safe: o
+    browse_url roda em paralelo) ou None se desativado.
+    """
+    global _page_cache
+    if _page_cache is None and PAGE_CACHE_DB:
+        with _page_cache_lock:
+            if _page_cache is None:
+                os.makedirs(os.path.dirname(os.path.abspath(PAGE_CACHE_DB)), exist_ok=True)
+                _page_cache = CacheDePaginas(PAGE_CACHE_DB)
+    return _page_cache
+
+
+def _truncate(text, max_chars):
+    if len(text) > max_chars:
+        print(f"DEBUG: Conteúdo da URL truncado para {max_chars} caracteres.")
+        return text[:max_chars] + TRUNCATED_NOTE
+    return text
+
+
+def _browse_streaming(url, max_chars=MAX_CHARS, max_bytes=MAX_BYTES):
+    """
+    Lê o corpo em pedaços, alimentando o extrator incremental, e para assim que
+    o orçamento de caracteres ou de bytes é atingido (a conexão é fechada sem
+    baixar o resto da página). Páginas já extraídas são revalidadas com um GET
+    condicional e, se não mudaram (304), vêm do cache de páginas.
+    """
+    page_cache = get_page_cache()
+    cached = page_cache.get(url) if page_cache is not None else None
+    headers = dict(HEADERS, **CacheDePaginas.conditional_headers(cached))
+
+    with Cliente_HTTP.get(url, tool='browse_url', headers=headers, timeout=10, stream=True) as response:
+        if response.status_code == 304 and cached is not None:
+            print("DEBUG: Página não modificada (304). Usando o texto do cache de páginas.")
+            page_cache.touch(url)
+            return cached.text
         response.raise_for_status() # Levanta um erro para respostas HTTP ruins (4xx ou 5xx)
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        is_plain_text = content_type in TEXT_CONTENT_TYPES
+        if content_type and content_type not in HTML_CONTENT_TYPES and not is_plain_text:
+            return f"ERRO_FERRAMENTA: browse_url não lê conteúdo do tipo '{content_type}' (apenas páginas HTML ou texto)."
+
+        extractor = _ExtratorDeTexto(MAX_CANDIDATE_CHARS if MAIN_CONTENT_ENABLED else max_chars)
+        plain_parts = []
+        plain_chars = 0
+        decoder = None
+        bytes_read = 0
+        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+            if not chunk:
+                continue
+            if decoder is None:
+                decoder = _decoder_for(response, chunk)
+            bytes_read += len(chunk)
+            text = decoder.decode(chunk)
+
+            if is_plain_text:
+                plain_parts.append(text)
+                plain_chars += len(text)
+                if plain_chars > max_chars:
+                    break
+            else:
+                extractor.feed(text)
+                if extractor.done:
+                    break
+
+            if bytes_read >= max_bytes:
+                print(f"DEBUG: Leitura da URL interrompida após {bytes_read} bytes.")
+                break
+
+    if is_plain_text:
+        text = "\n".join(_clean_lines("".join(plain_parts)))
+    elif MAIN_CONTENT_ENABLED:
+        text = _select_main_content(extractor, max_chars)
+    else:
+        text = extractor.text()
+    text = _truncate(text, max_chars)
+
+    if page_cache is not None:
+        page_cache.set(url, text, etag, last_modified)
+    return text
+
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+def _browse_full(url, max_chars=MAX_CHARS):
+    """Modo antigo: baixa a página inteira e extrai o texto com o BeautifulSoup."""
+    from bs4 import BeautifulSoup
 
-        # Remove elementos de script, estilo, cabeçalhos, rodapés e navegação
-        for element in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
-            element.decompose()
+    response = Cliente_HTTP.get(url, tool='browse_url', headers=HEADERS, timeout=10) # Timeout para evitar travamentos
+    response.raise_for_status() # Levanta um erro para respostas HTTP ruins (4xx ou 5xx)
 
-        # Obtém o texto limpo
-        text = soup.get_text()
+    soup = BeautifulSoup(response.text, 'html.parser')
 
-        # Quebra em linhas, remove linhas vazias/apenas espaços e múltiplos espaços
-        lines = (line.strip() for line in text.splitlines())
-        chunks = (re.sub(r'\s+', ' ', phrase).strip() for line in lines for phrase in line.split("  "))
-        text = '\n'.join(chunk for chunk in chunks if chunk)
+    # Remove elementos de script, estilo, cabeçalhos, rodapés e navegação
+    for element in soup(['script', 'style', 'header', 'footer', 'nav', 'aside']):
+        element.decompose()
 
-        # Limita o tamanho do texto para não sobrecarregar o LLM
-        max_chars = 8000 # Limite razoável para o contexto do LLM
-        if len(text) > max_chars:
-            text = text[:max_chars] + "\n... [Conteúdo truncado devido ao tamanho]"
-            print(f"DEBUG: Conteúdo da URL truncado para {max_chars} caracteres.")
+    # Obtém o texto limpo
+    text = '\n'.join(_clean_lines(soup.get_text()))
 
-        return text
+    # Limita o tamanho do texto para não sobrecarregar o LLM
+    return _truncate(text, max_chars)
+
+
+def browse_url(url: str, streaming: bool = None) -> str:
+    """
+    Navega até uma URL, extrai e retorna o texto visível da página.
+    Limita o texto retornado para evitar sobrecarga do modelo.
+    :param streaming: Força o modo streaming (True) ou o modo completo (False);
+                      por padrão segue NYX_BROWSE_STREAMING.
+    """
+    print(f"DEBUG: Tentando navegar para a URL: {url}")
+    try:
+        if STREAMING_ENABLED if streaming is None else streaming:
+            return _browse_streaming(url)
+        return _browse_full(url)
     except requests.exceptions.RequestException as e:
         return f"ERRO_FERRAMENTA: browse_url falhou. Detalhes: {e}"
     except Exception as e:
-        return f"ERRO_FERRAMENTA: browse_url falhou inesperadamente. Detalhes: {e}"
\ No newline at end of file
+        return f"ERRO_FERRAMENTA: browse_url falhou inesperadamente. Detalhes: {e}"
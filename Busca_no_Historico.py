@@ -0,0 +1,42 @@
+import contextvars
+
+# Banco e conversa do turno em andamento. O ChatEngine define os dois no contexto de
+# cada chamada de ferramenta, para que a busca use o banco do próprio motor (e não o do
+# último motor criado) e nunca veja mensagens de outras conversas.
+current_database = contextvars.ContextVar('current_database', default=None)
+current_conversation = contextvars.ContextVar('current_conversation', default='default')
+
+# Número padrão e máximo de trechos devolvidos ao modelo
+DEFAULT_LIMIT = 5
+MAX_LIMIT = 20
+
+
+def buscar_historico(consulta: str, limite: int = DEFAULT_LIMIT) -> str:
+    """
+    Procura conversas anteriores no histórico (índice FTS5 do banco) e retorna os
+    trechos mais relevantes, com a data e quem escreveu cada mensagem.
+    A mensagem mais recente (a pergunta que originou a busca) é ignorada.
+    """
+    db_manager = current_database.get()
+    if db_manager is None:
+        return "ERRO_FERRAMENTA: O histórico de conversas não está disponível para busca."
+
+    try:
+        limite = max(1, min(int(limite or DEFAULT_LIMIT), MAX_LIMIT))
+    except (TypeError, ValueError):
+        limite = DEFAULT_LIMIT
+
+    conversation_id = current_conversation.get()
+    latest = db_manager.get_paginated_messages(limit=1, conversation_id=conversation_id)
+    before_id = latest[-1]['id'] if latest else None
+    resultados = db_manager.search_messages(consulta, limit=limite, before_id=before_id, conversation_id=conversation_id)
+    print(f"DEBUG: Busca no histórico por '{consulta}' retornou {len(resultados)} resultado(s).")
+
+    if not resultados:
+        return f"Nenhuma mensagem anterior encontrada para: {consulta}"
+
+    linhas = [f"Mensagens anteriores encontradas para '{consulta}' (termos entre colchetes):"]
+    for resultado in resultados:
+        autor = "Usuário" if resultado['role'] == 'user' else "Nyx"
+        linhas.append(f"- [{resultado['timestamp']}] {autor}: {resultado['snippet']}")
+    return "\n".join(linhas)
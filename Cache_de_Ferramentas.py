@@ -0,0 +1,217 @@
+import json
+import time
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Esta classe implementa o cache de resultados das ferramentas chamadas pelo modelo.
+class CacheDeFerramentas:
+    """
+    Cache com TTL por ferramenta para o 'execute_tool'.
+    Camada em memória limitada por LRU e, opcionalmente, uma camada persistente em
+    SQLite (sobrevive a reinícios). As chaves são normalizadas para que variações
+    triviais (maiúsculas, espaços, parâmetros de rastreamento em URLs) reaproveitem
+    o mesmo resultado.
+    """
+    # Número máximo de entradas na camada em memória
+    MAX_ENTRIES = 512
+    # Parâmetros de URL que não mudam o conteúdo da página
+    TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid', 'mc_cid', 'mc_eid')
+    # Resultados que indicam falha nunca são cacheados
+    ERROR_PREFIXES = ('ERRO', 'Erro', 'Não foi possível')
+
+    def __init__(self, ttls=None, max_entries=MAX_ENTRIES, db_path=None, clock=time.time):
+        """
+        :param ttls: Dicionário {ferramenta: ttl_em_segundos}; ferramentas fora dele não são
+                     cacheadas (o Gerenciador_de_Ferramentas usa os TTLs do registro).
+        :param max_entries: Limite de entradas da camada em memória (LRU).
+        :param db_path: Caminho do arquivo SQLite da camada persistente (opcional).
+        :param clock: Função de relógio, substituível para testes.
+        """
+        self.ttls = dict(ttls or {})
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # chave -> (expira_em, valor)
+        # '_lock' protege só a camada em memória; o SQLite tem o seu próprio lock, para
+        # que um acerto em memória nunca espere a leitura ou a escrita de outra thread no disco
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._stats = {}
+        self._db = None
+        if db_path:
+            self._init_db(db_path)
+
+    # --- Normalização de chaves ---
+
+    @staticmethod
+    def _normalize_text(value):
+        """Ignora maiúsculas/minúsculas e espaços repetidos."""
+        return " ".join(unicodedata.normalize('NFC', str(value)).casefold().split())
+
+    @classmethod
+    def _normalize_city(cls, value):
+        """Como '_normalize_text', mas também ignora acentos ('São Paulo' == 'sao paulo')."""
+        decomposed = unicodedata.normalize('NFKD', cls._normalize_text(value))
+        return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+    @classmethod
+    def _normalize_url(cls, value):
+        """
+        Forma canônica da URL: esquema e host em minúsculas, sem porta padrão,
+        sem fragmento, sem parâmetros de rastreamento e com a query ordenada.
+        """
+        parts = urlsplit(str(value).strip())
+        scheme = (parts.scheme or 'http').lower()
+        host = (parts.hostname or '').lower()
+        port = parts.port
+        if port and not ((scheme == 'http' and port == 80) or (scheme == 'https' and port == 443)):
+            host = f"{host}:{port}"
+        query = sorted(
+            (key, val) for key, val in parse_qsl(parts.query, keep_blank_values=True)
+            if not key.lower().startswith(cls.TRACKING_PARAMS)
+        )
+        return urlunsplit((scheme, host, parts.path or '/', urlencode(query), ''))
+
+    def make_key(self, tool_name, tool_args):
+        """
+        Retorna a chave normalizada da chamada ou None se a ferramenta não é
+        cacheável ou os argumentos não podem ser normalizados (o cache é ignorado).
+        """
+        if tool_name not in self.ttls:
+            return None
+
+        normalized = {}
+        for name, value in (tool_args or {}).items():
+            if name == 'url':
+                try:
+                    normalized[name] = self._normalize_url(value)
+                except ValueError:
+                    # URL malformada vinda do modelo (ex.: porta não numérica)
+                    return None
+            elif name == 'cidade':
+                normalized[name] = self._normalize_city(value)
+            elif isinstance(value, str):
+                normalized[name] = self._normalize_text(value)
+            else:
+                normalized[name] = value
+        return f"{tool_name}:{json.dumps(normalized, sort_keys=True, ensure_ascii=False)}"
+
+    # --- Camada persistente ---
+
+    def _init_db(self, db_path):
+        """Abre (ou cria) a camada persistente em SQLite."""
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS tool_cache (
+                    key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            # Remove entradas vencidas deixadas por execuções anteriores
+            self._db.execute("DELETE FROM tool_cache WHERE expires_at <= ?", (self._clock(),))
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível abrir o cache persistente de ferramentas. Usando apenas memória. Detalhes: {e}")
+            self._db = None
+
+    def _db_get(self, key):
+        try:
+            with self._db_lock:
+                return self._db.execute("SELECT value, expires_at FROM tool_cache WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"AVISO: Falha ao ler o cache persistente de ferramentas: {e}")
+            return None
+
+    def _db_set(self, key, tool_name, value, expires_at):
+        try:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO tool_cache (key, tool, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, tool_name, value, expires_at)
+                )
+        except sqlite3.Error as e:
+            print(f"AVISO: Falha ao gravar no cache persistente de ferramentas: {e}")
+
+    # --- Operações ---
+
+    def _count(self, tool_name, counter):
+        tool_stats = self._stats.setdefault(tool_name, {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0})
+        tool_stats[counter] += 1
+
+    def get(self, tool_name, tool_args):
+        """
+        Procura o resultado de uma chamada.
+        :return: Uma tupla (encontrado, valor).
+        """
+        key = self.make_key(tool_name, tool_args)
+        if key is None:
+            return False, None
+
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self._entries.move_to_end(key)
+                self._count(tool_name, 'hits')
+                return True, entry[1]
+            if entry:
+                del self._entries[key]
+            if self._db is None:
+                self._count(tool_name, 'misses')
+                return False, None
+
+        # Camada persistente, fora do lock da memória
+        row = self._db_get(key)
+        with self._lock:
+            if row and row[1] > now:
+                # Promove para a camada em memória
+                self._put_memory(tool_name, key, row[0], row[1])
+                self._count(tool_name, 'hits')
+                return True, row[0]
+            self._count(tool_name, 'misses')
+            return False, None
+
+    def _put_memory(self, tool_name, key, value, expires_at):
+        """Insere na camada em memória, removendo a entrada menos usada se necessário."""
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._count(tool_name, 'evictions')
+
+    def set(self, tool_name, tool_args, value):
+        """Guarda o resultado de uma chamada bem-sucedida."""
+        key = self.make_key(tool_name, tool_args)
+        if key is None or not isinstance(value, str) or not value or value == 'None':
+            return
+        if value.startswith(self.ERROR_PREFIXES):
+            return
+
+        expires_at = self._clock() + self.ttls[tool_name]
+        with self._lock:
+            self._put_memory(tool_name, key, value, expires_at)
+            self._count(tool_name, 'stores')
+        if self._db is not None:
+            self._db_set(key, tool_name, value, expires_at)
+
+    def stats(self):
+        """Retorna os contadores de acertos/falhas por ferramenta e o tamanho atual."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'tools': {name: dict(counters) for name, counters in self._stats.items()},
+            }
+
+    def clear(self):
+        """Esvazia as duas camadas do cache."""
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock, self._db:
+                self._db.execute("DELETE FROM tool_cache")
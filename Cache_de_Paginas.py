@@ -0,0 +1,141 @@
+import time
+import sqlite3
+import threading
+from typing import NamedTuple, Optional
+
+from Cache_de_Ferramentas import CacheDeFerramentas
+
+
+class PaginaEmCache(NamedTuple):
+    """Texto extraído de uma página e os validadores HTTP da resposta que o gerou."""
+    url: str
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+# Esta classe guarda em disco o texto já extraído das páginas do 'browse_url'.
+class CacheDePaginas:
+    """
+    Cache persistente (SQLite) de páginas extraídas, indexado pela URL normalizada.
+    Cada entrada guarda o ETag/Last-Modified da resposta, usados para revalidar a
+    página com um GET condicional: se o servidor responder 304, o texto em cache é
+    reaproveitado sem baixar nem extrair a página de novo.
+    """
+    # Número máximo de páginas mantidas; as menos usadas são removidas
+    MAX_ENTRIES = 500
+
+    def __init__(self, db_path, max_entries=MAX_ENTRIES, clock=time.time):
+        """
+        :param db_path: Caminho do arquivo SQLite.
+        :param max_entries: Limite de páginas guardadas.
+        :param clock: Função de relógio, substituível para testes.
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'revalidated': 0, 'stores': 0}
+        self._db = None
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS page_cache (
+                    key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    text TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            ''')
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_page_cache_last_used ON page_cache (last_used)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"ERRO: Não foi possível abrir o cache de páginas. O browse_url vai baixar todas as páginas. Detalhes: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(url):
+        """Chave da URL normalizada, ou None se a URL é malformada (não é cacheada)."""
+        try:
+            return CacheDeFerramentas._normalize_url(url)
+        except ValueError:
+            return None
+
+    def get(self, url):
+        """Retorna a PaginaEmCache da URL ou None."""
+        key = self.make_key(url)
+        if self._db is None or key is None:
+            return None
+        with self._lock:
+            try:
+                row = self._db.execute(
+                    "SELECT url, text, etag, last_modified FROM page_cache WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"AVISO: Falha ao ler o cache de páginas: {e}")
+                return None
+            self.stats['hits' if row else 'misses'] += 1
+            return PaginaEmCache(*row) if row else None
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Cabeçalhos If-None-Match / If-Modified-Since para revalidar uma entrada."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def touch(self, url):
+        """Marca a entrada como revalidada (resposta 304) e recém-usada."""
+        key = self.make_key(url)
+        if self._db is None or key is None:
+            return
+        now = self._clock()
+        with self._lock:
+            self.stats['revalidated'] += 1
+            try:
+                with self._db:
+                    self._db.execute(
+                        "UPDATE page_cache SET fetched_at = ?, last_used = ? WHERE key = ?", (now, now, key)
+                    )
+            except sqlite3.Error as e:
+                print(f"AVISO: Falha ao atualizar o cache de páginas: {e}")
+
+    def set(self, url, text, etag=None, last_modified=None):
+        """
+        Guarda o texto extraído. Páginas sem ETag nem Last-Modified não são
+        guardadas, já que não teriam como ser revalidadas.
+        """
+        key = self.make_key(url)
+        if self._db is None or key is None or not (etag or last_modified) or not text:
+            return
+        now = self._clock()
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO page_cache (key, url, etag, last_modified, text, fetched_at, last_used) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key, url, etag, last_modified, text, now, now)
+                    )
+                    # Mantém apenas as 'max_entries' páginas usadas mais recentemente
+                    self._db.execute(
+                        "DELETE FROM page_cache WHERE key NOT IN "
+                        "(SELECT key FROM page_cache ORDER BY last_used DESC LIMIT ?)", (self.max_entries,)
+                    )
+                self.stats['stores'] += 1
+            except sqlite3.Error as e:
+                print(f"AVISO: Falha ao gravar no cache de páginas: {e}")
+
+    def clear(self):
+        """Remove todas as páginas do cache."""
+        if self._db is None:
+            return
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM page_cache")
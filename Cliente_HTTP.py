@@ -0,0 +1,120 @@
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import Metricas
+from Metricas import HistogramaDeLatencia
+
+# -----------------------------------------------------------
+# Cliente HTTP compartilhado pelas ferramentas de rede (browse_url, ipinfo,
+# obter_clima e google_search). Uma única requests.Session mantém as conexões
+# abertas (keep-alive), então chamadas repetidas ao mesmo host evitam um novo
+# DNS + TCP + TLS a cada vez.
+# -----------------------------------------------------------
+
+# Timeout padrão (conexão, leitura) em segundos para qualquer requisição
+DEFAULT_TIMEOUT = (5, 15)
+# Conexões mantidas por host; deve cobrir as ferramentas executadas em paralelo
+POOL_MAXSIZE = 10
+# Novas tentativas para falhas de conexão e respostas transitórias
+RETRY_POLICY = Retry(
+    total=2,
+    connect=2,
+    read=1,
+    backoff_factor=0.3,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=frozenset(['GET', 'HEAD']),
+    respect_retry_after_header=True,
+)
+# Limites (segundos) dos buckets do histograma de latência
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_session = None
+_session_lock = threading.Lock()
+_thread_local = threading.local()
+_search_services = {}
+_search_services_lock = threading.Lock()
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def record_latency(tool, seconds):
+    """Registra a duração de uma chamada no histograma da ferramenta."""
+    with _histograms_lock:
+        histogram = _histograms.get(tool)
+        if histogram is None:
+            histogram = _histograms[tool] = HistogramaDeLatencia(LATENCY_BUCKETS)
+    histogram.observe(seconds)
+    Metricas.observe('nyx_http_request_duration_seconds', seconds, tool=tool)
+
+
+def latency_stats():
+    """Retorna {ferramenta: snapshot do histograma} de todas as ferramentas de rede."""
+    with _histograms_lock:
+        histograms = dict(_histograms)
+    return {tool: histogram.snapshot() for tool, histogram in histograms.items()}
+
+
+def get_session():
+    """Retorna a requests.Session compartilhada, criando-a na primeira chamada."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=POOL_MAXSIZE,
+                    pool_maxsize=POOL_MAXSIZE,
+                    max_retries=RETRY_POLICY
+                )
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                _session = session
+    return _session
+
+
+def get(url, tool='http', timeout=None, **kwargs):
+    """
+    Faz um GET pela sessão compartilhada, com timeout padrão e registro de latência.
+    :param url: A URL a ser buscada.
+    :param tool: Nome da ferramenta, usado no histograma de latência.
+    :param timeout: Timeout em segundos (padrão: DEFAULT_TIMEOUT).
+    :return: O requests.Response (exceções de rede são propagadas).
+    """
+    start = time.perf_counter()
+    try:
+        return get_session().get(url, timeout=timeout or DEFAULT_TIMEOUT, **kwargs)
+    finally:
+        record_latency(tool, time.perf_counter() - start)
+
+
+def get_search_service(api_key):
+    """
+    Retorna o serviço 'customsearch' do Google, construído uma única vez por
+    processo para cada chave (a construção lê o documento de discovery, que é a
+    parte cara). Execute as requisições com 'http=get_search_http()'.
+    """
+    service = _search_services.get(api_key)
+    if service is None:
+        with _search_services_lock:
+            service = _search_services.get(api_key)
+            if service is None:
+                from googleapiclient.discovery import build
+                service = _search_services[api_key] = build("customsearch", "v1", developerKey=api_key, cache_discovery=False)
+    return service
+
+
+def get_search_http():
+    """
+    Retorna o httplib2.Http da thread atual para executar as requisições do
+    serviço de pesquisa. O httplib2 não é thread-safe, mas é barato de criar: cada
+    worker do pool de ferramentas mantém o seu (e a sua conexão keep-alive).
+    """
+    http = getattr(_thread_local, 'search_http', None)
+    if http is None:
+        import httplib2
+        http = _thread_local.search_http = httplib2.Http(timeout=DEFAULT_TIMEOUT[1])
+    return http
@@ -1,124 +1,125 @@
-import google.generativeai as genai
+import os
+import Metricas
+from Cache_de_Ferramentas import CacheDeFerramentas
+from Registro_de_Ferramentas import RegistroDeFerramentas
 
-# --- Mocks e Imports de Ferramentas (Simulando o ambiente real) ---
-try:
+# --- Definição das Tools para o Modelo Gemini ---
+# Cada função abaixo é a declaração da ferramenta (assinatura + docstring) e
+# importa a implementação só na primeira chamada.
+
+tool_registry = RegistroDeFerramentas()
+ferramenta = tool_registry.ferramenta
+
+
+@ferramenta(timeout=15, cache_ttl=60 * 60)
+def google_search(query: str) -> str:
+    """
+    Executa uma pesquisa no Google e retorna os resultados. Use para encontrar informações gerais ou links relevantes. Caso precise de mais informações ou informações mais robustas use em conjunto ao browse_url para receber um contexto maior.
+    :param query: A consulta de pesquisa.
+    """
     from Google_Search import google_search
+    return google_search(query)
+
+
+@ferramenta(timeout=20, cache_ttl=15 * 60, max_concurrency=4)
+def browse_url(url: str) -> str:
+    """
+    Use para abrir links de páginas web para obter um contexto maior do conteúdo.
+    :param url: A URL da página a ser navegada.
+    """
     from Browser_Url import browse_url
+    return browse_url(url)
+
+
+@ferramenta(timeout=10, cache_ttl=24 * 60 * 60)
+def ipinfo() -> str:
+    """
+    Busca informações de IP, Cidade, Estado, País, Org e Provedor do usuário. Use se precisar de contexto geográfico, como para o clima, sem que a cidade seja especificada. Se não souber a cidade para o clima, use essa ferramenta.
+    """
     from IPInfo import ipinfo
+    return str(ipinfo())
+
+
+@ferramenta(timeout=10, cache_ttl=10 * 60)
+def obter_clima(cidade: str) -> str:
+    """
+    Busca informações de clima para uma cidade específica. Use quando o usuário perguntar sobre a previsão do tempo ou temperatura. Se não souber a cidade use o IP info para descobrir.
+    :param cidade: O nome da cidade.
+    """
     from Weather import obter_clima
+    return obter_clima(cidade)
+
+
+@ferramenta(timeout=60)
+def analisar_emocoes_local_bert(text: str) -> str:
+    """
+    Analisa o sentimento de um texto e identifica emoções. Use SEMPRE QUE VC JULGAR MINIMAMENTE NESCESSÁRIO, é uma ferramenta nativa, ou seja, de uso ilimitado e claro NUNCA revele o resultado da análise na resposta, apenas use o resultado para responder o usuário.
+    :param text: O texto a ser analisado.
+    """
     from Analise_de_Sentimentos import analisar_emocoes_local_bert
-except ImportError:
-    print("AVISO: Módulos de ferramentas (Google_Search, etc.) não encontrados. Usando Mocks.")
-    def google_search(query): return f"Placeholder Search Result for: {query}"
-    def browse_url(url): return f"Placeholder Browse Result for: {url}"
-    def ipinfo(): return "Placeholder IP Info: Formosa"
-    def obter_clima(cidade): return f"Placeholder Weather for: {cidade}"
-    def analisar_emocoes_local_bert(text): return f"Placeholder Sentiment: Neutral for '{text}'"
+    return analisar_emocoes_local_bert(text)
+
+
+# Sem cache: o resultado muda a cada mensagem salva e depende da conversa atual
+@ferramenta(timeout=10)
+def buscar_historico(consulta: str, limite: int = 5) -> str:
+    """
+    Busca em todas as conversas anteriores com o usuário, inclusive as que já saíram do contexto. Use quando o usuário mencionar algo que conversaram antes ("lembra quando...", "aquilo que te falei") ou quando informações passadas ajudarem na resposta.
+    :param consulta: Palavras-chave a procurar no histórico.
+    :param limite: Número máximo de trechos (padrão 5, máximo 20).
+    """
+    from Busca_no_Historico import buscar_historico
+    return buscar_historico(consulta, limite)
 
-# --- Definição das Tools para o Modelo Gemini ---
 
-GEMINI_TOOLS = [
-    genai.protos.FunctionDeclaration(
-        name='google_search',
-        description='Executa uma pesquisa no Google e retorna os resultados. Use para encontrar informações gerais ou links relevantes. Caso precise de mais informações ou informações mais robustas use em conjunto ao browse_url para receber um contexto maior.',
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'query': genai.protos.Schema(type=genai.protos.Type.STRING,
-                                             description='A consulta de pesquisa.')
-            },
-            required=['query']
-        )
-    ),
-    genai.protos.FunctionDeclaration(
-        name='browse_url',
-        description='Use para abrir links de páginas web para obter um contexto maior do conteúdo.',
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'url': genai.protos.Schema(type=genai.protos.Type.STRING,
-                                             description='A URL da página a ser navegada.')
-            },
-            required=['url']
-        )
-    ),
-    genai.protos.FunctionDeclaration(
-        name='ipinfo',
-        description='Busca informações de IP, Cidade, Estado, País, Org e Provedor do usuário. Use se precisar de contexto geográfico, como para o clima, sem que a cidade seja especificada. Se não souber a cidade para o clima, use essa ferramenta.',
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={},
-        )
-    ),
-    genai.protos.FunctionDeclaration(
-        name='obter_clima',
-        description='Busca informações de clima para uma cidade específica. Use quando o usuário perguntar sobre a previsão do tempo ou temperatura. Se não souber a cidade use o IP info para descobrir.',
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'cidade': genai.protos.Schema(type=genai.protos.Type.STRING,
-                                             description='O nome da cidade.')
-            },
-            required=['cidade']
-        )
-    ),
-    genai.protos.FunctionDeclaration(
-        name='analisar_emocoes_local_bert',
-        description='Analisa o sentimento de um texto e identifica emoções. Use SEMPRE QUE VC JULGAR MINIMAMENTE NESCESSÁRIO, é uma ferramenta nativa, ou seja, de uso ilimitado e claro NUNCA revele o resultado da análise na resposta, apenas use o resultado para responder o usuário.',
-        parameters=genai.protos.Schema(
-            type=genai.protos.Type.OBJECT,
-            properties={
-                'text': genai.protos.Schema(type=genai.protos.Type.STRING,
-                                             description='O texto a ser analisado.')
-            },
-            required=['text']
-        )
-    )
-]
+GEMINI_TOOLS = tool_registry.declarations()
+
+def warm_up_tools():
+    """
+    Pré-carrega, em segundo plano, as ferramentas locais pesadas (modelo BERT).
+    Desative com NYX_SENTIMENT_WARMUP=0 para carregar só no primeiro uso.
+    """
+    if os.getenv('NYX_SENTIMENT_WARMUP', '1').lower() not in ('0', 'false', 'nao', 'não'):
+        try:
+            from Analise_de_Sentimentos import warm_up_async
+        except ImportError as e:
+            print(f"AVISO: Análise de sentimentos indisponível; pré-carregamento ignorado. Detalhes: {e}")
+            return
+        warm_up_async()
+
+# --- Cache de Resultados das Ferramentas ---
+
+# Camada persistente opcional: NYX_TOOL_CACHE_DB=caminho/do/arquivo.db
+tool_cache = CacheDeFerramentas(ttls=tool_registry.cache_ttls(), db_path=os.getenv('NYX_TOOL_CACHE_DB') or None)
 
 # --- Lógica de Execução das Ferramentas ---
 
 def execute_tool(tool_name: str, tool_args: dict) -> str:
-    """Executa a função da ferramenta com base no nome e argumentos fornecidos pela IA."""
-    tool_output = ""
-
-    try:
-        if tool_name == "google_search":
-            search_query = tool_args.get('query')
-            if not search_query:
-                tool_output = "ERRO_FERRAMENTA: Consulta de pesquisa vazia ou inválida fornecida pela IA."
-            else:
-                tool_output = google_search(search_query)
-
-        elif tool_name == "browse_url":
-            url_to_browse = tool_args.get('url')
-            if not url_to_browse:
-                tool_output = "ERRO_FERRAMENTA: URL vazia ou inválida fornecida pela IA para navegação."
-            else:
-                tool_output = browse_url(url_to_browse)
-
-        elif tool_name == "ipinfo":
-            tool_output = ipinfo()
-            tool_output = str(tool_output)
-
-        elif tool_name == "obter_clima":
-            cidade_do_clima = tool_args.get('cidade')
-            if not cidade_do_clima:
-                tool_output = "ERRO_FERRAMENTA: Nome da cidade vazio ou inválido fornecido pela IA para buscar o clima."
-            else:
-                tool_output = obter_clima(cidade_do_clima)
-
-        elif tool_name == "analisar_emocoes_local_bert":
-            text_to_analyze = tool_args.get('text')
-            if not text_to_analyze:
-                tool_output = "ERRO_FERRAMENTA: Texto vazio ou inválido fornecido pela IA para análise de sentimento."
-            else:
-                tool_output = analisar_emocoes_local_bert(text_to_analyze)
-                
-        else:
-            tool_output = f"ERRO_FERRAMENTA: Ferramenta desconhecida solicitada: {tool_name}"
-
-    except Exception as e:
-        tool_output = f"ERRO_FERRAMENTA: Falha na execução da ferramenta {tool_name}: {str(e)}"
-    
-    return tool_output
\ No newline at end of file
+    """
+    Executa a função da ferramenta com base no nome e argumentos fornecidos pela IA,
+    reaproveitando resultados recentes do cache quando a ferramenta permite.
+    """
+    with Metricas.span(f"tool.{tool_name}") as span:
+        # Uma falha do cache nunca derruba a chamada: a ferramenta roda sem ele
+        try:
+            hit, cached_output = tool_cache.get(tool_name, tool_args)
+        except Exception as e:
+            print(f"AVISO: Falha ao consultar o cache de '{tool_name}'. Executando sem cache. Detalhes: {e}")
+            hit, cached_output = False, None
+        if hit:
+            print(f"DEBUG: Resultado de '{tool_name}' servido pelo cache.")
+            span.set(cached=True)
+            Metricas.count('nyx_tool_calls_total', tool=tool_name, cached='true')
+            return cached_output
+
+        tool_output = tool_registry.call(tool_name, tool_args)
+        try:
+            tool_cache.set(tool_name, tool_args, tool_output)
+        except Exception as e:
+            print(f"AVISO: Falha ao guardar o resultado de '{tool_name}' no cache. Detalhes: {e}")
+        failed = isinstance(tool_output, str) and tool_output.startswith("ERRO_FERRAMENTA")
+        span.set(cached=False, failed=failed)
+        Metricas.count('nyx_tool_calls_total', tool=tool_name, cached='false')
+        if failed:
+            Metricas.count('nyx_tool_errors_total', tool=tool_name)
+        return tool_output
@@ -0,0 +1,169 @@
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from Nyx_Core import ChatEngine, db_manager as default_db_manager
+
+
+# Esta classe mantém um ChatEngine (e o seu ChatSession) por conversa ativa.
+class GerenciadorDeSessoes:
+    """
+    Atende várias conversas no mesmo processo. Cada conversa tem o seu próprio
+    ChatEngine, criado sob demanda e reidratado do banco na primeira mensagem;
+    as conversas usadas há mais tempo são descartadas da memória quando o limite
+    é atingido (o histórico continua no banco e é recarregado na próxima vez).
+    O modelo, o banco e o pool de ferramentas são compartilhados entre todas.
+    """
+    # Conversas mantidas em memória ao mesmo tempo
+    MAX_SESSIONS = 64
+    # Ferramentas executadas em paralelo somando todas as conversas
+    MAX_TOOL_WORKERS = 16
+
+    def __init__(self, model=None, db=None, max_sessions=MAX_SESSIONS, max_tool_workers=MAX_TOOL_WORKERS):
+        """
+        :param model: Backend compatível com genai.GenerativeModel (opcional). Sem ele,
+                      o modelo criado pelo primeiro ChatEngine é reaproveitado pelos demais.
+        :param db: Instância de banco_de_dados (padrão: o 'db_manager' global do Nyx_Core).
+        :param max_sessions: Limite de conversas em memória (LRU).
+        :param max_tool_workers: Tamanho do pool de ferramentas compartilhado.
+        """
+        self.model = model
+        self.db_manager = db or default_db_manager
+        self.max_sessions = max_sessions
+        self.tool_executor = ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="nyx-tool")
+        self.stats = {'hits': 0, 'rehydrations': 0, 'evictions': 0}
+
+        self._sessions = OrderedDict()  # conversation_id -> ChatEngine, do menos ao mais recente
+        self._locks = {}                # conversation_id -> [Lock dos turnos, threads usando o Lock]
+        self._lock = threading.Lock()
+
+    def _acquire_conversation_lock(self, conversation_id):
+        """
+        Retorna o Lock da conversa, registrando a thread como usuária dele: um Lock
+        em uso (mesmo que ainda não adquirido) nunca é descartado, senão duas
+        threads poderiam acabar com Locks diferentes para a mesma conversa.
+        """
+        with self._lock:
+            entry = self._locks.get(conversation_id)
+            if entry is None:
+                entry = self._locks[conversation_id] = [threading.Lock(), 0]
+            entry[1] += 1
+            return entry[0]
+
+    def _release_conversation_lock(self, conversation_id):
+        with self._lock:
+            entry = self._locks.get(conversation_id)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] == 0 and conversation_id not in self._sessions:
+                    del self._locks[conversation_id]
+
+    def _create_engine(self, conversation_id):
+        """Reidrata a conversa: cria o ChatEngine, que carrega o histórico do banco."""
+        start = time.perf_counter()
+        engine = ChatEngine(
+            model=self.model, db=self.db_manager,
+            conversation_id=conversation_id, tool_executor=self.tool_executor
+        )
+        if self.model is None:
+            self.model = engine.model
+        print(f"DEBUG: Conversa '{conversation_id}' carregada do banco em {(time.perf_counter() - start) * 1000:.0f} ms.")
+        return engine
+
+    def _evict(self):
+        """Descarta as conversas menos usadas acima do limite, pulando as que estão em um turno."""
+        evicted = []
+        with self._lock:
+            for conversation_id in list(self._sessions):
+                if len(self._sessions) <= self.max_sessions:
+                    break
+                entry = self._locks.get(conversation_id)
+                if entry is not None and entry[1] > 0:
+                    continue
+                evicted.append(self._sessions.pop(conversation_id))
+                self._locks.pop(conversation_id, None)
+                self.stats['evictions'] += 1
+        for engine in evicted:
+            engine.close()
+            print(f"DEBUG: Conversa '{engine.conversation_id}' removida da memória (LRU).")
+
+    def get(self, conversation_id):
+        """
+        Retorna o ChatEngine da conversa, reidratando-o do banco se necessário.
+        Não serializa turnos: para enviar mensagens use 'session' ou 'send_message'.
+        """
+        with self._lock:
+            engine = self._sessions.get(conversation_id)
+            if engine is not None:
+                self._sessions.move_to_end(conversation_id)
+                self.stats['hits'] += 1
+                return engine
+
+        # Criado fora do lock global: carregar uma conversa não bloqueia as outras
+        engine = self._create_engine(conversation_id)
+        with self._lock:
+            existing = self._sessions.get(conversation_id)
+            if existing is not None:
+                # Outra thread reidratou a mesma conversa ao mesmo tempo
+                self._sessions.move_to_end(conversation_id)
+                duplicate, engine = engine, existing
+            else:
+                duplicate = None
+                self._sessions[conversation_id] = engine
+                self.stats['rehydrations'] += 1
+        if duplicate is not None:
+            duplicate.close()
+        self._evict()
+        return engine
+
+    @contextmanager
+    def session(self, conversation_id, blocking=True, timeout=None):
+        """
+        Reserva a conversa para um turno: enquanto o bloco 'with' durar, nenhuma
+        outra mensagem da mesma conversa é processada (conversas diferentes seguem
+        em paralelo).
+        :param blocking: Se False e a conversa estiver ocupada, levanta BlockingIOError.
+        :param timeout: Espera máxima (segundos) pela conversa; esgotada, levanta BlockingIOError.
+        :return: O ChatEngine da conversa.
+        """
+        lock = self._acquire_conversation_lock(conversation_id)
+        try:
+            acquired = lock.acquire(timeout=timeout) if blocking and timeout is not None else lock.acquire(blocking=blocking)
+            if not acquired:
+                raise BlockingIOError(f"A conversa '{conversation_id}' já está processando uma mensagem.")
+            try:
+                yield self.get(conversation_id)
+            finally:
+                lock.release()
+        finally:
+            self._release_conversation_lock(conversation_id)
+        # Conversas que estavam ocupadas na última limpeza podem ser descartadas agora
+        if len(self._sessions) > self.max_sessions:
+            self._evict()
+
+    def send_message(self, conversation_id, text, image_pil=None):
+        """Envia uma mensagem para a conversa e bloqueia até a resposta final."""
+        with self.session(conversation_id) as engine:
+            return engine.send_message(text, image_pil)
+
+    def iter_message_events(self, conversation_id, text, image_pil=None, stream=True):
+        """Como ChatEngine.iter_message_events, com a conversa reservada durante o turno."""
+        with self.session(conversation_id) as engine:
+            yield from engine.iter_message_events(text, image_pil, stream=stream)
+
+    def active_conversations(self):
+        """Lista as conversas em memória, da menos para a mais recentemente usada."""
+        with self._lock:
+            return list(self._sessions)
+
+    def close(self):
+        """Descarta todas as conversas em memória e encerra o pool de ferramentas."""
+        with self._lock:
+            engines = list(self._sessions.values())
+            self._sessions.clear()
+            self._locks.clear()
+        for engine in engines:
+            engine.close()
+        self.tool_executor.shutdown(wait=False)
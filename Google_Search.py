@@ -1,5 +1,6 @@
 import os
-from googleapiclient.discovery import build
+import time
+import Cliente_HTTP
 
 def google_search(query: str) -> str:
     """
@@ -12,8 +13,13 @@ def google_search(query: str) -> str:
         return "ERRO_FERRAMENTA: As variáveis de ambiente 'GOOGLE_SEARCH_API_KEY' ou 'GOOGLE_SEARCH_CX_ID' não estão definidas."
 
     try:
-        service = build("customsearch", "v1", developerKey=GOOGLE_SEARCH_API_KEY)
-        res = service.cse().list(q=query, cx=GOOGLE_SEARCH_CX_ID).execute()
+        # O serviço é construído uma vez e reaproveitado nas próximas pesquisas
+        service = Cliente_HTTP.get_search_service(GOOGLE_SEARCH_API_KEY)
+        start = time.perf_counter()
+        try:
+            res = service.cse().list(q=query, cx=GOOGLE_SEARCH_CX_ID).execute(http=Cliente_HTTP.get_search_http())
+        finally:
+            Cliente_HTTP.record_latency('google_search', time.perf_counter() - start)
         
         results = []
         if 'items' in res:
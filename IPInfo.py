@@ -1,5 +1,6 @@
 import requests
 import os
+import Cliente_HTTP
 
 IPINFO_API_KEY = os.getenv('IPINFO_API_KEY')
 
@@ -14,7 +15,7 @@ def ipinfo() -> dict | None:
         return None 
 
     try:
-        response = requests.get(f"https://ipinfo.io/json?token={IPINFO_API_KEY}")
+        response = Cliente_HTTP.get("https://ipinfo.io/json", tool='ipinfo', params={'token': IPINFO_API_KEY})
         response.raise_for_status() # Lança um erro para status de resposta HTTP ruins (4xx ou 5xx)
         data = response.json()
 
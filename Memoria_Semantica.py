@@ -0,0 +1,310 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+
+import numpy as np
+
+
+# -----------------------------------------------------------
+# Modelos de embedding. Ambos expõem 'name', 'dim' e 'encode(textos)', que
+# devolve uma matriz float32 (n, dim) com linhas de norma 1.
+# -----------------------------------------------------------
+
+class EmbeddingLocal:
+    """
+    Embeddings de frases com um modelo pequeno do Hugging Face rodando na CPU
+    (média dos tokens, normalizada). O modelo só é carregado no primeiro uso.
+    """
+    MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    BATCH_SIZE = 32
+    MAX_TOKENS = 256
+
+    def __init__(self, model_name=MODEL_NAME):
+        self.name = model_name
+        self._tokenizer = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    from transformers import AutoModel, AutoTokenizer
+                    self._tokenizer = AutoTokenizer.from_pretrained(self.name)
+                    model = AutoModel.from_pretrained(self.name)
+                    model.eval()
+                    self._model = model
+                    print(f"DEBUG: Modelo de embeddings '{self.name}' carregado.")
+        return self._tokenizer, self._model
+
+    @property
+    def dim(self):
+        return self._load()[1].config.hidden_size
+
+    def encode(self, texts):
+        import torch
+        tokenizer, model = self._load()
+        vectors = []
+        with torch.no_grad():
+            for start in range(0, len(texts), self.BATCH_SIZE):
+                batch = tokenizer(
+                    texts[start:start + self.BATCH_SIZE], padding=True, truncation=True,
+                    max_length=self.MAX_TOKENS, return_tensors='pt'
+                )
+                hidden = model(**batch).last_hidden_state
+                mask = batch['attention_mask'].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                vectors.append(torch.nn.functional.normalize(pooled, dim=1).numpy())
+        return np.vstack(vectors).astype(np.float32) if vectors else np.zeros((0, self.dim), np.float32)
+
+
+class EmbeddingPorHash:
+    """
+    Embedding local e determinístico (hashing de palavras e bigramas, sem acentos),
+    usado offline (NYX_MEMORY_MODEL=local) e nos benchmarks. Não entende sinônimos,
+    mas recupera bem mensagens que compartilham termos com a pergunta.
+    """
+    DIM = 512
+
+    def __init__(self, dim=DIM):
+        self.name = f"hash-{dim}"
+        self.dim = dim
+
+    @staticmethod
+    def _tokens(text):
+        decomposed = unicodedata.normalize('NFKD', text.casefold())
+        plain = "".join(char for char in decomposed if not unicodedata.combining(char))
+        words = [word for word in re.findall(r"\w+", plain) if len(word) > 2]
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def encode(self, texts):
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in self._tokens(text):
+                digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+                value = int.from_bytes(digest, 'little')
+                matrix[row, value % self.dim] += 1.0 if (value >> 63) else -1.0
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.maximum(norms, 1e-9)
+
+
+# Esta classe mantém o índice vetorial das mensagens para a memória de longo prazo.
+class MemoriaSemantica:
+    """
+    Índice de embeddings das mensagens, guardado ao lado do banco em três arquivos:
+    '<base>.vec' (vetores quantizados em int8, lidos via memmap), '<base>.ids'
+    (id da mensagem e escala de cada vetor) e '<base>.json' (modelo e dimensão).
+    Os arquivos só crescem por acréscimo, então a indexação de cada nova mensagem
+    é O(1) e um arquivo cortado por uma queda é reparado ao abrir.
+    """
+    # Registro de '<base>.ids': id da mensagem e escala que desfaz a quantização
+    RECORD_DTYPE = np.dtype([('id', '<i8'), ('scale', '<f4')])
+    # Quantas memórias são recuperadas por pergunta
+    TOP_K = 3
+    # Similaridade (cosseno) mínima para uma memória ser usada
+    MIN_SCORE = 0.35
+    # Mensagens muito curtas ("ok", "valeu") não são indexadas
+    MIN_CHARS = 12
+    # Mensagens lidas do banco por lote durante a sincronização
+    INDEX_BATCH = 128
+    # Linhas do memmap convertidas e multiplicadas por vez na busca (cabe no cache da CPU)
+    SEARCH_CHUNK = 2048
+
+    def __init__(self, db_manager, embedder, index_path, min_score=MIN_SCORE, conversation_id='default'):
+        """
+        :param db_manager: Instância de banco_de_dados (de onde vêm os textos).
+        :param embedder: EmbeddingLocal, EmbeddingPorHash ou compatível.
+        :param index_path: Caminho base dos arquivos do índice (sem extensão).
+        :param min_score: Similaridade mínima das memórias retornadas por 'recall'.
+        :param conversation_id: A conversa indexada (cada conversa tem o seu índice).
+        """
+        self.db_manager = db_manager
+        self.conversation_id = conversation_id
+        self.embedder = embedder
+        self.min_score = min_score
+        self._vec_path = index_path + '.vec'
+        self._ids_path = index_path + '.ids'
+        self._meta_path = index_path + '.json'
+        self._lock = threading.Lock()
+        self._dim = None
+        self._count = 0
+        self._last_id = 0
+        self._view = None  # (memmap dos vetores, registros) das primeiras '_count' linhas
+
+    # --- Arquivos do índice ---
+
+    def _open(self):
+        """Abre o índice (uma vez), recriando-o se o modelo mudou ou reparando um final truncado."""
+        if self._dim is not None:
+            return
+        dim = self.embedder.dim
+        meta = {}
+        if os.path.exists(self._meta_path):
+            try:
+                with open(self._meta_path, 'r', encoding='utf-8') as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                meta = {}
+
+        if meta.get('model') != self.embedder.name or meta.get('dim') != dim:
+            if meta:
+                print("AVISO: O modelo de embeddings mudou. O índice da memória será reconstruído.")
+            for path in (self._vec_path, self._ids_path):
+                open(path, 'wb').close()
+            with open(self._meta_path, 'w', encoding='utf-8') as f:
+                json.dump({'model': self.embedder.name, 'dim': dim}, f)
+
+        for path in (self._vec_path, self._ids_path):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+
+        record_size = self.RECORD_DTYPE.itemsize
+        count = min(os.path.getsize(self._vec_path) // dim, os.path.getsize(self._ids_path) // record_size)
+        # Descarta um registro parcial deixado por uma gravação interrompida
+        with open(self._vec_path, 'r+b') as f:
+            f.truncate(count * dim)
+        with open(self._ids_path, 'r+b') as f:
+            f.truncate(count * record_size)
+
+        self._dim = dim
+        self._count = count
+        if count:
+            last = np.fromfile(self._ids_path, dtype=self.RECORD_DTYPE, offset=(count - 1) * record_size, count=1)
+            self._last_id = int(last['id'][0])
+
+    def _get_view(self):
+        if self._view is None and self._count:
+            vectors = np.memmap(self._vec_path, dtype=np.int8, mode='r', shape=(self._count, self._dim))
+            records = np.fromfile(self._ids_path, dtype=self.RECORD_DTYPE, count=self._count)
+            self._view = (vectors, records)
+        return self._view
+
+    def _append_vectors(self, vectors, ids):
+        """
+        Quantiza os vetores (int8 com uma escala por vetor) e os acrescenta aos arquivos.
+        Deve ser chamado com o '_lock' adquirido e ids maiores que os já indexados.
+        """
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-9) / 127.0
+        quantized = np.round(vectors / scales[:, None]).astype(np.int8)
+        records = np.empty(len(ids), dtype=self.RECORD_DTYPE)
+        records['id'] = ids
+        records['scale'] = scales
+        with open(self._vec_path, 'ab') as f:
+            f.write(quantized.tobytes())
+        with open(self._ids_path, 'ab') as f:
+            f.write(records.tobytes())
+
+        self._count += len(ids)
+        self._last_id = max(self._last_id, int(ids[-1]))
+        self._view = None
+
+    def __len__(self):
+        return self._count
+
+    # --- Indexação ---
+
+    def add_many(self, messages):
+        """
+        Indexa mensagens novas.
+        :param messages: Lista de (id, texto) em ordem crescente de id; ids já
+                         indexados e textos curtos demais são ignorados.
+        :return: Quantas mensagens foram indexadas.
+        """
+        with self._lock:
+            self._open()
+            pending = [(message_id, " ".join(text.split())) for message_id, text in messages
+                       if message_id > self._last_id and text and len(text.strip()) >= self.MIN_CHARS]
+            if not pending:
+                if messages:
+                    self._last_id = max(self._last_id, messages[-1][0])
+                return 0
+
+            vectors = self.embedder.encode([text for _, text in pending])
+            self._append_vectors(vectors, np.array([message_id for message_id, _ in pending], dtype=np.int64))
+            self._last_id = max(self._last_id, messages[-1][0])
+            return len(pending)
+
+    def add(self, message_id, text):
+        """Indexa uma única mensagem recém-salva."""
+        return self.add_many([(message_id, text)])
+
+    def sync(self):
+        """Indexa, em lotes, as mensagens do banco que ainda não estão no índice."""
+        with self._lock:
+            self._open()
+        total = 0
+        while True:
+            batch = self.db_manager.get_paginated_messages(
+                after_id=self._last_id, limit=self.INDEX_BATCH, conversation_id=self.conversation_id
+            )
+            if not batch:
+                break
+            total += self.add_many([(msg['id'], msg['text'] or "") for msg in batch])
+            if len(batch) < self.INDEX_BATCH:
+                break
+        if total:
+            print(f"DEBUG: Memória semântica: {total} mensagem(ns) indexada(s). Total no índice: {self._count}.")
+        return total
+
+    def clear(self):
+        """Esvazia o índice (por exemplo, depois de limpar o histórico)."""
+        with self._lock:
+            self._open()
+            self._view = None
+            for path in (self._vec_path, self._ids_path):
+                open(path, 'wb').close()
+            self._count = 0
+            self._last_id = 0
+
+    # --- Busca ---
+
+    def search(self, text, k=TOP_K, before_id=None):
+        """
+        Retorna as k mensagens mais parecidas com o texto.
+        :param before_id: Considera apenas mensagens com id menor (as que já saíram do contexto).
+        :return: Lista de (id, similaridade) em ordem decrescente de similaridade.
+        """
+        with self._lock:
+            self._open()
+            view = self._get_view()
+        if view is None or not text or not text.strip():
+            return []
+        vectors, records = view
+        ids = records['id']
+
+        limit = len(ids) if before_id is None else int(np.searchsorted(ids, before_id))
+        if limit == 0:
+            return []
+
+        query = self.embedder.encode([text])[0].astype(np.float32)
+        scores = np.empty(limit, dtype=np.float32)
+        for start in range(0, limit, self.SEARCH_CHUNK):
+            end = min(start + self.SEARCH_CHUNK, limit)
+            scores[start:end] = vectors[start:end].astype(np.float32) @ query
+        scores *= records['scale'][:limit]
+
+        k = min(k, limit)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def recall(self, text, k=TOP_K, before_id=None):
+        """
+        Busca as memórias relevantes e carrega os textos do banco.
+        :return: Lista de dicionários {'id', 'role', 'text', 'timestamp', 'score'}.
+        """
+        hits = [(message_id, score) for message_id, score in self.search(text, k, before_id) if score >= self.min_score]
+        if not hits:
+            return []
+        messages = {msg['id']: msg for msg in self.db_manager.get_messages_by_ids(
+            [message_id for message_id, _ in hits], conversation_id=self.conversation_id
+        )}
+        memories = []
+        for message_id, score in hits:
+            msg = messages.get(message_id)
+            if msg:  # mensagens apagadas do banco são ignoradas
+                memories.append(dict(msg, score=score))
+        return memories
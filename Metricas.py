@@ -0,0 +1,269 @@
+"""
+Instrumentação da Nyx: spans (trechos cronometrados de um turno), contadores e
+histogramas, exportados para um arquivo de trace JSONL e em texto no formato do
+Prometheus (rota /metrics do Servidor_HTTP).
+
+Desativada por padrão. Ative com NYX_METRICS=1, ou com NYX_TRACE_FILE=caminho.jsonl
+para também gravar um span por linha. Desativada, cada chamada só consulta uma
+variável global e retorna.
+
+Uso:
+    with Metricas.span('tool.browse_url', url=url) as span:
+        ...
+        span.set(bytes=len(texto))
+    Metricas.count('nyx_tool_calls_total', tool='browse_url')
+"""
+import os
+import json
+import time
+import bisect
+import secrets
+import threading
+import functools
+import contextvars
+
+# Limites (segundos) dos buckets dos histogramas de latência
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Histograma alimentado automaticamente pela duração de cada span
+SPAN_HISTOGRAM = 'nyx_span_duration_seconds'
+
+_enabled = False
+_trace_file = None
+_trace_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_counters = {}    # nome -> {labels: valor}
+_histograms = {}  # nome -> {labels: HistogramaDeLatencia}
+_current_span = contextvars.ContextVar('nyx_current_span', default=None)
+
+
+class HistogramaDeLatencia:
+    """Histograma cumulativo de latências (no estilo Prometheus)."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # o último bucket é o +Inf
+        self.total = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+            self.count += 1
+
+    def snapshot(self):
+        """Retorna contagem, soma e os buckets cumulativos {limite: contagem}."""
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+                running += bucket_count
+                cumulative[bound] = running
+            return {'count': self.count, 'sum': self.total, 'buckets': cumulative}
+
+
+# --- Ativação ---
+
+def enable(trace_file=None):
+    """
+    Ativa a coleta de métricas e spans.
+    :param trace_file: Arquivo JSONL que recebe um span por linha (opcional).
+    """
+    global _enabled, _trace_file
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+        if trace_file:
+            _trace_file = open(trace_file, 'a', encoding='utf-8')
+    _enabled = True
+
+
+def disable():
+    """Desativa a coleta e fecha o arquivo de trace (as métricas já coletadas são mantidas)."""
+    global _enabled, _trace_file
+    _enabled = False
+    with _trace_lock:
+        if _trace_file is not None:
+            _trace_file.close()
+            _trace_file = None
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Zera contadores e histogramas."""
+    with _metrics_lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# --- Contadores e histogramas ---
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def count(name, value=1, **labels):
+    """Soma 'value' ao contador 'name' com os rótulos informados."""
+    if not _enabled:
+        return
+    key = _labels_key(labels)
+    with _metrics_lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def observe(name, seconds, **labels):
+    """Registra uma duração (segundos) no histograma 'name'."""
+    if not _enabled:
+        return
+    key = _labels_key(labels)
+    with _metrics_lock:
+        series = _histograms.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = HistogramaDeLatencia()
+    histogram.observe(seconds)
+
+
+# --- Spans ---
+
+class Span:
+    """Trecho cronometrado de um turno; spans abertos dentro dele viram filhos."""
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attributes', 'status', '_start', '_wall_start', '_token')
+
+    def __init__(self, name, attributes):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = attributes
+        self.status = 'ok'
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self._wall_start = time.time()
+        self._start = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._start
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Gerador fechado em outro contexto: o span anterior já não é o atual
+            pass
+        if exc_type is GeneratorExit:
+            self.status = 'cancelled'
+        elif exc_type is not None:
+            self.status = 'error'
+            self.attributes['error'] = f"{exc_type.__name__}: {exc}"
+        observe(SPAN_HISTOGRAM, duration, span=self.name)
+        if _trace_file is not None:
+            _write_trace({
+                'trace_id': self.trace_id,
+                'span_id': self.span_id,
+                'parent_id': self.parent_id,
+                'name': self.name,
+                'start': round(self._wall_start, 6),
+                'duration_ms': round(duration * 1000, 3),
+                'status': self.status,
+                'attributes': self.attributes,
+            })
+        return False
+
+
+class _SpanInativo:
+    """Span usado com a instrumentação desativada: não mede nem grava nada."""
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _SpanInativo()
+
+
+def span(name, **attributes):
+    """Context manager que mede um trecho; aninhado, vira filho do span atual."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def medido(name):
+    """Decorador que envolve cada chamada da função em um span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _write_trace(record):
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _trace_lock:
+        if _trace_file is not None:
+            try:
+                _trace_file.write(line)
+                _trace_file.flush()
+            except (OSError, ValueError) as e:
+                print(f"AVISO: Falha ao gravar o trace: {e}")
+
+
+# --- Exportação ---
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def prometheus_text():
+    """Contadores e histogramas no formato de texto do Prometheus (versão 0.0.4)."""
+    with _metrics_lock:
+        counters = {name: dict(series) for name, series in _counters.items()}
+        histograms = {name: dict(series) for name, series in _histograms.items()}
+
+    lines = []
+    for name in sorted(counters):
+        lines.append(f"# TYPE {name} counter")
+        for key, value in sorted(counters[name].items()):
+            lines.append(f"{name}{_format_labels(key)} {value}")
+    for name in sorted(histograms):
+        lines.append(f"# TYPE {name} histogram")
+        for key, histogram in sorted(histograms[name].items()):
+            snapshot = histogram.snapshot()
+            for bound, bucket_count in snapshot['buckets'].items():
+                le = "+Inf" if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {bucket_count}")
+            lines.append(f"{name}_sum{_format_labels(key)} {snapshot['sum']:.6f}")
+            lines.append(f"{name}_count{_format_labels(key)} {snapshot['count']}")
+    return "\n".join(lines) + "\n"
+
+
+if os.getenv('NYX_METRICS', '').lower() in ('1', 'true', 'sim') or os.getenv('NYX_TRACE_FILE'):
+    enable(os.getenv('NYX_TRACE_FILE') or None)
@@ -3,11 +3,14 @@ from tkinter import scrolledtext, messagebox, filedialog
 from PIL import Image, ImageTk, ImageEnhance
 import threading
 import io
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 # Importa a classe do motor de chat que contém toda a lógica de API e ferramentas.
 try:
     # Renomeando o import para evitar conflito de nomenclatura, embora nyx_teste seja o nome
     from Nyx_Core import ChatEngine 
+    from Processamento_de_Imagem import preparar_imagem
 except ImportError:
     messagebox.showerror("Erro de Importação", "O arquivo 'nyx_core.py' (Motor de Chat) não foi encontrado. Certifique-se de que está no mesmo diretório.")
     exit()
@@ -17,6 +20,13 @@ class ChatApplication(tk.Tk):
     Interface gráfica (GUI) para interagir com o ChatEngine.
     Usa Tkinter para a interface e threading para chamadas assíncronas ao motor.
     """
+    # Quantidade de mensagens buscadas por página do histórico
+    HISTORY_PAGE_SIZE = 30
+    # Largura máxima das imagens exibidas no histórico
+    MAX_IMAGE_WIDTH = 250
+    # Máximo de imagens mantidas vivas no histórico; as mais antigas viram um marcador de texto
+    MAX_IMAGE_REFS = 200
+
     def __init__(self):
         super().__init__()
         self.title("Assistente Gemini (Chat Engine)")
@@ -27,6 +37,14 @@ class ChatApplication(tk.Tk):
         self.engine = None
         self.selected_image = None
         self.history_area = None
+
+        # Estado do histórico virtualizado: apenas as páginas já vistas são renderizadas
+        self._oldest_loaded_id = None
+        self._history_exhausted = False
+        self._loading_history = False
+        self._image_mark_counter = 0
+        # Decodificação e redimensionamento de imagens fora da thread principal
+        self._image_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="nyx-img")
         
         # --- Elementos da Interface ---
         self._setup_ui()
@@ -50,10 +68,14 @@ class ChatApplication(tk.Tk):
         )
         self.history_area.pack(padx=15, pady=(15, 5), fill="both", expand=True)
 
-        # CORREÇÃO CRÍTICA: Inicializa a lista de referências de imagem. 
+        # CORREÇÃO CRÍTICA: Inicializa as referências de imagem (nome no widget -> PhotoImage).
         # Isso previne que o garbage collector do Tkinter apague as imagens do histórico.
+        # O total é limitado por MAX_IMAGE_REFS e zerado quando o histórico é recarregado.
         if not hasattr(self.history_area, 'image_refs'):
-            self.history_area.image_refs = []
+            self.history_area.image_refs = OrderedDict()
+
+        # Intercepta a rolagem para buscar páginas antigas ao chegar no topo
+        self.history_area.configure(yscrollcommand=self._on_history_scroll)
 
         # Configura as tags de estilo
         self.history_area.tag_config('user', foreground='#007BFF', font=('Inter', 10, 'bold'), lmargin1=20, lmargin2=20)
@@ -130,31 +152,106 @@ class ChatApplication(tk.Tk):
         self.send_button.config(state=tk.NORMAL)
         self._display_system_message("Motor de IA pronto. Digite sua mensagem!")
         self._load_history()
+        # Com a GUI já utilizável, carrega os modelos locais em segundo plano
+        self.engine.warm_up()
 
     def _load_history(self):
-        """Carrega e exibe o histórico de mensagens do banco de dados."""
+        """
+        Carrega apenas a página mais recente do histórico. As páginas anteriores
+        são buscadas sob demanda quando o usuário rola até o topo.
+        """
         if not self.engine:
             return
 
-        try:
-            history = self.engine.get_history()
-            
-            if history:
-                self._display_system_message(f"Carregando {len(history)} mensagens anteriores.")
-                
-                for msg in history:
-                    role = msg.get('role', 'system')
-                    text = msg.get('text', '')
-                    # O banco de dados retorna a imagem como bytes (image_data).
-                    image_bytes = msg.get('image_data') 
-
-                    if text or image_bytes:
-                        self._display_message(role, text, image_bytes)
-                
-                self._display_system_message("Histórico carregado.")
+        self._reset_history_view()
+        # Marca onde as páginas antigas serão inseridas (acima do histórico já exibido)
+        self.history_area.mark_set('history_top', tk.END)
+        self.history_area.mark_gravity('history_top', tk.LEFT)
+        self._fetch_history_page(before_id=None)
+
+    def _reset_history_view(self):
+        """
+        Remove o histórico já exibido e solta as referências das suas imagens (na thread
+        principal). As mensagens de sistema exibidas antes do histórico são mantidas.
+        """
+        marks = self.history_area.mark_names()
+        self.history_area.config(state='normal')
+        if 'history_top' in marks:
+            self.history_area.delete('history_top', tk.END)
+        # Imagens ainda em decodificação perdem a posição e são descartadas ao chegar
+        for mark in marks:
+            if mark.startswith('image_'):
+                self.history_area.mark_unset(mark)
+        self.history_area.config(state='disabled')
+        self.history_area.image_refs.clear()
 
-        except Exception as e:
-            self._display_system_message(f"ERRO: Não foi possível carregar o histórico: {e}")
+        self._oldest_loaded_id = None
+        self._history_exhausted = False
+
+    def _fetch_history_page(self, before_id):
+        """Busca uma página do histórico em uma thread secundária."""
+        self._loading_history = True
+
+        def worker():
+            try:
+                page = self.engine.get_paginated_history(before_id=before_id, limit=self.HISTORY_PAGE_SIZE)
+                self.after(0, lambda: self._render_history_page(page, prepend=before_id is not None))
+            except Exception as e:
+                self.after(0, lambda error=e: self._on_history_error(error))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _on_history_error(self, error):
+        """Exibe a falha de carregamento do histórico (na thread principal)."""
+        self._loading_history = False
+        self._display_system_message(f"ERRO: Não foi possível carregar o histórico: {error}")
+
+    def _render_history_page(self, page, prepend):
+        """Insere uma página do histórico acima das mensagens já exibidas (na thread principal)."""
+        if len(page) < self.HISTORY_PAGE_SIZE:
+            self._history_exhausted = True
+
+        if not page:
+            self._loading_history = False
+            return
+
+        self._oldest_loaded_id = page[0]['id']
+
+        # Guarda a posição visível para que a página inserida acima não "pule" a rolagem
+        top_line = int(self.history_area.index('@0,0').split('.')[0])
+        lines_before = int(self.history_area.index('end-1c').split('.')[0])
+
+        # Marca temporária com gravidade à direita: as mensagens ficam em ordem cronológica
+        self.history_area.mark_set('page_insert', 'history_top')
+        self.history_area.mark_gravity('page_insert', tk.RIGHT)
+
+        for msg in page:
+            text = msg.get('text', '')
+            if text or msg.get('has_image'):
+                self._display_message(
+                    msg.get('role', 'system'),
+                    text,
+                    index='page_insert',
+                    message_id=msg['id'] if msg.get('has_image') else None,
+                    scroll=False
+                )
+
+        self.history_area.mark_unset('page_insert')
+
+        if prepend:
+            lines_added = int(self.history_area.index('end-1c').split('.')[0]) - lines_before
+            self.history_area.yview(f"{top_line + lines_added}.0")
+        else:
+            self.history_area.see(tk.END)
+
+        self._loading_history = False
+
+    def _on_history_scroll(self, first, last):
+        """Atualiza a barra de rolagem e busca a página anterior ao atingir o topo."""
+        self.history_area.vbar.set(first, last)
+        if (float(first) <= 0.0 and self.engine and not self._loading_history
+                and not self._history_exhausted and self._oldest_loaded_id is not None):
+            self._fetch_history_page(before_id=self._oldest_loaded_id)
 
     def _select_image(self):
         """Abre a caixa de diálogo para selecionar uma imagem."""
@@ -164,7 +261,8 @@ class ChatApplication(tk.Tk):
         )
         if file_path:
             try:
-                self.selected_image = Image.open(file_path).convert("RGB")
+                # Aberta sem decodificar: a redução acontece uma vez, ao enviar
+                self.selected_image = Image.open(file_path)
                 
                 file_name = file_path.split('/')[-1]
                 self.image_label.config(text=f"Imagem: {file_name} (Anexada)")
@@ -176,50 +274,111 @@ class ChatApplication(tk.Tk):
                 self.image_label.config(text="")
                 messagebox.showerror("Erro de Imagem", f"Não foi possível carregar a imagem: {e}")
 
-    def _display_message(self, role, text, image_bytes=None):
-        """Adiciona uma mensagem ao histórico na thread principal."""
+    def _display_message(self, role, text, image_bytes=None, index=tk.END, message_id=None, scroll=True):
+        """
+        Adiciona uma mensagem ao histórico na thread principal.
+        A imagem (bytes ou, se 'message_id' for informado, carregada do banco) é
+        decodificada em uma thread secundária e inserida quando estiver pronta.
+        """
         self.history_area.config(state='normal')
         
         sender = "Você" if role == 'user' else "Gemini"
         tag = role
 
         # Insere um separador e o remetente
-        self.history_area.insert(tk.END, f"\n{sender}:\n", tag)
+        self.history_area.insert(index, f"\n{sender}:\n", tag)
         
-        # 2. Imagem (se houver)
-        if image_bytes:
-            try:
-                # Converte os bytes de volta para Image
-                image_stream = io.BytesIO(image_bytes)
-                img = Image.open(image_stream)
-                
-                # Redimensiona para exibição (max 250px de largura)
-                width, height = img.size
-                MAX_WIDTH = 250
-                if width > MAX_WIDTH:
-                    ratio = MAX_WIDTH / width
-                    img = img.resize((MAX_WIDTH, int(height * ratio)), Image.LANCZOS)
-                
-                # Converte para formato Tkinter
-                tk_img = ImageTk.PhotoImage(img)
-
-                # Mantém a referência na lista inicializada no _setup_ui
-                self.history_area.image_refs.append(tk_img)
-
-                # Insere a imagem
-                self.history_area.insert(tk.END, " ")
-                self.history_area.image_create(tk.END, image=tk_img)
-                self.history_area.insert(tk.END, "\n")
-            except Exception as e:
-                # Mostra o erro de imagem no histórico, mas não quebra a aplicação
-                self.history_area.insert(tk.END, f"[ERRO: Falha ao carregar imagem: {e}]\n")
-                print(f"ERRO DE EXIBIÇÃO DE IMAGEM: {e}")
+        # 2. Imagem (se houver): reserva a posição e decodifica fora da thread da GUI
+        if image_bytes or message_id is not None:
+            self._image_mark_counter += 1
+            mark = f"image_{self._image_mark_counter}"
+            # Gravidade à esquerda: a marca fica antes do texto inserido a seguir
+            self.history_area.mark_set(mark, index)
+            self.history_area.mark_gravity(mark, tk.LEFT)
+            self.history_area.insert(index, " \n")
+            self._image_executor.submit(self._decode_image, mark, image_bytes, message_id)
                 
         # 3. Texto
-        self.history_area.insert(tk.END, f"{text}\n\n", tag)
+        self.history_area.insert(index, f"{text}\n\n", tag)
         
         self.history_area.config(state='disabled')
-        self.history_area.see(tk.END) # Rola para o final
+        if scroll:
+            self.history_area.see(tk.END) # Rola para o final
+
+    def _decode_image(self, mark, image_bytes, message_id):
+        """Decodifica e redimensiona a imagem (executado no pool de threads de imagem)."""
+        try:
+            if image_bytes is None:
+                # Miniatura guardada no banco (gerada e guardada no primeiro uso)
+                image_bytes = self.engine.get_message_thumbnail(message_id, self.MAX_IMAGE_WIDTH)
+            if not image_bytes:
+                return
+
+            img = Image.open(io.BytesIO(image_bytes))
+            
+            # Redimensiona para exibição (max 250px de largura)
+            width, height = img.size
+            if width > self.MAX_IMAGE_WIDTH:
+                ratio = self.MAX_IMAGE_WIDTH / width
+                img = img.resize((self.MAX_IMAGE_WIDTH, int(height * ratio)), Image.LANCZOS)
+            else:
+                img.load()
+
+            self.after(0, lambda: self._insert_image(mark, img))
+        except Exception as e:
+            # Mostra o erro de imagem no histórico, mas não quebra a aplicação
+            print(f"ERRO DE EXIBIÇÃO DE IMAGEM: {e}")
+            self.after(0, lambda error=e: self._insert_image_error(mark, error))
+
+    def _insert_image(self, mark, img):
+        """Cria o PhotoImage e o insere na posição reservada (na thread principal)."""
+        if mark not in self.history_area.mark_names():
+            # O histórico foi recarregado enquanto a imagem era decodificada
+            return
+
+        # O PhotoImage precisa ser criado na thread do Tkinter
+        tk_img = ImageTk.PhotoImage(img)
+
+        self.history_area.config(state='normal')
+        name = self.history_area.image_create(mark, image=tk_img)
+        self.history_area.mark_unset(mark)
+
+        # Mantém a referência no dicionário inicializado no _setup_ui; acima do limite,
+        # a imagem inserida há mais tempo sai do widget e a sua referência é solta
+        refs = self.history_area.image_refs
+        refs[name] = tk_img
+        while len(refs) > self.MAX_IMAGE_REFS:
+            old_name, _ = refs.popitem(last=False)
+            self.history_area.insert(old_name, "[imagem]")
+            self.history_area.delete(old_name)
+        self.history_area.config(state='disabled')
+
+    def _insert_image_error(self, mark, error):
+        """Substitui a imagem reservada por uma mensagem de erro (na thread principal)."""
+        if mark not in self.history_area.mark_names():
+            return
+        self.history_area.config(state='normal')
+        self.history_area.insert(mark, f"[ERRO: Falha ao carregar imagem: {error}]")
+        self.history_area.mark_unset(mark)
+        self.history_area.config(state='disabled')
+
+    def _begin_streamed_message(self):
+        """Abre uma nova resposta do modelo que receberá o texto em pedaços (na thread principal)."""
+        self.history_area.config(state='normal')
+        self.history_area.insert(tk.END, "\nGemini:\n", 'model')
+        # Gravidade à direita: a marca acompanha o texto inserido, e mensagens do
+        # sistema exibidas durante o streaming ficam depois da resposta
+        self.history_area.mark_set('stream_insert', 'end-1c')
+        self.history_area.mark_gravity('stream_insert', tk.RIGHT)
+        self.history_area.config(state='disabled')
+        self.history_area.see(tk.END)
+
+    def _append_streamed_text(self, chunk):
+        """Acrescenta um pedaço de texto à resposta em andamento (na thread principal)."""
+        self.history_area.config(state='normal')
+        self.history_area.insert('stream_insert', chunk, 'model')
+        self.history_area.config(state='disabled')
+        self.history_area.see(tk.END)
 
     def _display_system_message(self, text):
         """Exibe mensagens do sistema (logs, status) no histórico."""
@@ -253,16 +412,36 @@ class ChatApplication(tk.Tk):
     def _process_message(self, text, image_pil):
         """Chama a lógica principal do motor (executado em thread secundária)."""
         try:
+            # A imagem é reduzida e codificada uma única vez: a miniatura vai para a
+            # tela e os mesmos bytes são gravados no banco e enviados à API
+            image = preparar_imagem(image_pil) if image_pil else None
+
             # Exibir a mensagem do usuário (incluindo imagem) imediatamente no UI thread
             # O motor salva a mensagem no DB, mas precisamos exibir no UI
-            image_bytes_for_display = self._pil_to_bytes(image_pil)
-            self.after(0, lambda: self._display_message("user", text, image_bytes_for_display))
-            
-            # Chama o método central do motor de chat (onde a chamada API ocorre)
-            model_response = self.engine.send_message(text, image_pil)
+            thumbnail = image.thumbnail if image else None
+            self.after(0, lambda: self._display_message("user", text, thumbnail))
             
-            # Chama a exibição da resposta do modelo na thread principal (GUI)
-            self.after(0, lambda: self._display_message("model", model_response))
+            # Chama o método central do motor de chat (onde a chamada API ocorre).
+            # Os eventos chegam durante o turno: o texto é exibido à medida que é gerado.
+            streamed = False
+            for event in self.engine.iter_message_events(text, image, stream=True):
+                if event['type'] == 'text':
+                    if not streamed:
+                        streamed = True
+                        self.after(0, self._begin_streamed_message)
+                    self.after(0, lambda chunk=event['text']: self._append_streamed_text(chunk))
+
+                elif event['type'] == 'tool_call':
+                    self.after(0, lambda name=event['name']: self._display_system_message(f"Consultando a ferramenta '{name}'..."))
+
+                elif event['type'] == 'done':
+                    if not streamed:
+                        # Chama a exibição da resposta do modelo na thread principal (GUI)
+                        self.after(0, lambda final=event['text']: self._display_message("model", final))
+                    else:
+                        self.after(0, lambda: self._append_streamed_text("\n\n"))
+                        if event.get('error'):
+                            self.after(0, lambda final=event['text']: self._display_system_message(final))
 
         except Exception as e:
             error_msg = f"ERRO ao comunicar com o motor de chat: {e}"
@@ -284,15 +463,6 @@ class ChatApplication(tk.Tk):
         self.selected_image = None
         self.image_label.config(text="")
 
-    def _pil_to_bytes(self, image_pil):
-        """Converte um objeto PIL Image para bytes JPEG (para exibição de referência)."""
-        if not image_pil:
-            return None
-        img_byte_arr = io.BytesIO()
-        # Garante que a imagem é salva como JPEG para ser exibida e armazenada
-        image_pil.save(img_byte_arr, format='JPEG') 
-        return img_byte_arr.getvalue()
-
 
 if __name__ == '__main__':
     # Verifica a dependência da PIL antes de iniciar
@@ -301,4 +471,4 @@ if __name__ == '__main__':
          exit()
 
     app = ChatApplication()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
\ No newline at end of file
@@ -1,40 +1,126 @@
 import google.generativeai as genai
 import os
+import hashlib
 from dotenv import load_dotenv
 from PIL import Image
-import io
-import base64
+import time
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # --- Importa as Definições e a Lógica de Execução das Ferramentas ---
-from Gerenciador_de_Ferramentas import GEMINI_TOOLS, execute_tool
+from Gerenciador_de_Ferramentas import GEMINI_TOOLS, execute_tool, tool_registry, warm_up_tools
+import Busca_no_Historico
+import Metricas
 # -------------------------------------------------------------------
 
 # Assume-se que 'Banco_de_Dados' é um módulo local
 from Banco_de_Dados import banco_de_dados
+from Resumo_de_Conversa import ResumidorDeConversa, ModeloResumoLocal
+from Processamento_de_Imagem import preparar_imagem, thumbnail_from_bytes, THUMBNAIL_WIDTH
 
 # O Banco de Dados é inicializado globalmente e reusado pela classe
-db_manager = banco_de_dados()
+# (NYX_DB_PATH troca o arquivo; padrão: historico_chat.db no diretório atual)
+db_manager = banco_de_dados(os.getenv('NYX_DB_PATH') or 'historico_chat.db')
 
 # --- Motor Principal da Nyx ---
 
 class ChatEngine:
     MODEL_NAME = 'gemini-2.5-flash'
     MAX_TOOL_CALLS = 5
+    # Ferramentas executadas em paralelo quando o modelo pede várias no mesmo turno
+    MAX_PARALLEL_TOOLS = 4
     # Define o limite de mensagens para o contexto da IA
     AI_CONTEXT_LIMIT = 100
+    # Orçamento padrão do histórico enviado a cada requisição (sobrescrito por
+    # NYX_CONTEXT_TOKEN_BUDGET e NYX_CONTEXT_IMAGE_BYTES_BUDGET no .env)
+    CONTEXT_TOKEN_BUDGET = 32000
+    CONTEXT_IMAGE_BYTES_BUDGET = 4 * 1024 * 1024
+    # Mensagens mais recentes mantidas integralmente (com imagens), mesmo acima do orçamento
+    CONTEXT_RECENT_VERBATIM = 6
+    # Estimativas usadas pelo orçamento: ~4 caracteres por token e ~258 tokens por imagem
+    CHARS_PER_TOKEN = 4
+    IMAGE_TOKEN_ESTIMATE = 258
+    OMITTED_IMAGE_TEXT = "[imagem anterior omitida para economizar contexto]"
+    SUMMARY_CONTEXT_TEXT = "Resumo da nossa conversa anterior (gerado automaticamente):\n{summary}"
+    SUMMARY_ACK_TEXT = "Entendido, vou considerar esse resumo da conversa."
+    # Memórias de longo prazo recuperadas por pergunta (NYX_MEMORY_TOP_K)
+    MEMORY_TOP_K = 3
+    MEMORY_CONTEXT_TEXT = (
+        "[Trechos de conversas anteriores que podem ser relevantes, recuperados da memória. "
+        "Use apenas se ajudarem a responder.]\n{memories}"
+    )
 
-    def __init__(self):
+    def __init__(self, model=None, db=None, conversation_id=banco_de_dados.DEFAULT_CONVERSATION, tool_executor=None):
+        """
+        :param model: Backend opcional compatível com genai.GenerativeModel (por exemplo,
+                      o FakeGenerativeModel de Backend_Falso.py). Quando informado, a
+                      chave da API não é necessária.
+        :param db: Instância de banco_de_dados (padrão: o 'db_manager' global do módulo).
+        :param conversation_id: A conversa atendida por este motor (o histórico é
+                                carregado e salvo apenas nela).
+        :param tool_executor: Pool opcional para as ferramentas, compartilhado entre
+                              motores (ver Gerenciador_de_Sessoes); sem ele, o motor
+                              cria o seu próprio.
+        """
         load_dotenv()
-        self.db_manager = db_manager 
-        self._configure_api()
+        self.db_manager = db or db_manager 
+        self.conversation_id = conversation_id
+        self._requires_api_key = model is None
+        if self._requires_api_key:
+            self._configure_api()
         self.system_instruction = os.getenv('PROMPT_IA') or "Você é um assistente prestativo e amigável. Responda a todas as perguntas de forma clara e concisa."
+        self.context_token_budget = int(os.getenv('NYX_CONTEXT_TOKEN_BUDGET') or self.CONTEXT_TOKEN_BUDGET)
+        self.context_image_bytes_budget = int(os.getenv('NYX_CONTEXT_IMAGE_BYTES_BUDGET') or self.CONTEXT_IMAGE_BYTES_BUDGET)
         
         # O modelo é inicializado com as ferramentas importadas do tools_handler
-        self.model = genai.GenerativeModel(
+        self.model = model or genai.GenerativeModel(
             self.MODEL_NAME, 
             system_instruction=self.system_instruction,
             tools=GEMINI_TOOLS # Usa a lista importada
         )
+
+        # Resumo acumulado (opcional): NYX_SUMMARY_ENABLED=1 e, para rodar offline,
+        # NYX_SUMMARY_MODEL=local usa o modelo extrativo local no lugar do Gemini
+        self.summarizer = None
+        self._summary_prefix = []
+        self._summary_refresh_pending = False
+        if os.getenv('NYX_SUMMARY_ENABLED', '').lower() in ('1', 'true', 'sim'):
+            if os.getenv('NYX_SUMMARY_MODEL', '').lower() == 'local':
+                summary_model = ModeloResumoLocal()
+            elif model is not None:
+                summary_model = model
+            else:
+                summary_model = genai.GenerativeModel(self.MODEL_NAME)
+            self.summarizer = ResumidorDeConversa(self.db_manager, summary_model, conversation_id=conversation_id)
+
+        # Memória semântica (opcional): NYX_MEMORY_ENABLED=1. NYX_MEMORY_MODEL=local usa o
+        # embedding por hashing, sem baixar modelos; caso contrário, um modelo do Hugging Face
+        self.memory = None
+        self._memory_executor = None
+        self._context_start_id = None
+        self.memory_top_k = int(os.getenv('NYX_MEMORY_TOP_K') or self.MEMORY_TOP_K)
+        if os.getenv('NYX_MEMORY_ENABLED', '').lower() in ('1', 'true', 'sim'):
+            from Memoria_Semantica import MemoriaSemantica, EmbeddingLocal, EmbeddingPorHash
+            memory_model = os.getenv('NYX_MEMORY_MODEL', '')
+            if memory_model.lower() == 'local':
+                embedder = EmbeddingPorHash()
+            else:
+                embedder = EmbeddingLocal(memory_model or EmbeddingLocal.MODEL_NAME)
+            index_path = os.path.splitext(self.db_manager.db_name)[0] + '_memoria'
+            if conversation_id != banco_de_dados.DEFAULT_CONVERSATION:
+                # Hash do id, não o id "limpo": 'user.1' e 'user_1' precisam de índices distintos
+                index_path += '_' + hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()[:16]
+            self.memory = MemoriaSemantica(self.db_manager, embedder, index_path, conversation_id=conversation_id)
+            # Um único worker: indexa as mensagens em ordem, sem bloquear o turno
+            self._memory_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nyx-memory")
+            self._memory_executor.submit(self.memory.sync)
+
+        # Pool compartilhado para executar as chamadas de função de um turno em paralelo
+        self._owns_tool_executor = tool_executor is None
+        self._tool_executor = tool_executor or ThreadPoolExecutor(max_workers=self.MAX_PARALLEL_TOOLS, thread_name_prefix="nyx-tool")
+
         self.chat_session = self._initialize_chat_session()
         print(f"DEBUG: ChatEngine inicializado e pronto. Histórico carregado: {len(self.chat_session.history)} mensagens.")
 
@@ -51,32 +137,21 @@ class ChatEngine:
         except Exception as e:
             print(f"ERRO: Falha ao configurar a API. Erro: {e}")
 
-    def _pil_to_bytes_and_mime(self, image_pil: Image.Image):
+    def _prepare_image(self, image):
         """
-        Converte um objeto PIL Image para bytes e retorna o tipo MIME.
-        Prioriza JPEG para eficiência e compatibilidade.
+        Reduz e codifica a imagem uma única vez (Processamento_de_Imagem); os
+        mesmos bytes são gravados no banco e enviados à API.
+        :param image: PIL Image, ImagemPreparada (já processada pela GUI) ou None.
+        :return: A ImagemPreparada ou None.
         """
-        if not image_pil:
-            return None, None
-        
-        # Garante que a imagem está em RGB, se necessário, para salvar em JPEG
-        if image_pil.mode == 'RGBA':
-            image_pil = image_pil.convert('RGB')
-            
-        img_byte_arr = io.BytesIO()
+        if image is None:
+            return None
         try:
-            image_pil.save(img_byte_arr, format='JPEG')
-            return img_byte_arr.getvalue(), 'image/jpeg'
+            with Metricas.span('image.prepare'):
+                return preparar_imagem(image)
         except Exception as e:
-            print(f"AVISO: Falha ao salvar imagem como JPEG, tentando PNG. Erro: {e}")
-            img_byte_arr = io.BytesIO()
-            # Tenta salvar como PNG como fallback
-            try:
-                image_pil.save(img_byte_arr, format='PNG')
-                return img_byte_arr.getvalue(), 'image/png'
-            except Exception as inner_e:
-                print(f"ERRO: Falha ao salvar imagem como PNG. Erro: {inner_e}")
-                return None, None
+            print(f"ERRO: Falha ao processar a imagem enviada. Erro: {e}")
+            return None
 
     def _initialize_chat_session(self):
         """
@@ -85,120 +160,466 @@ class ChatEngine:
         """
         print("DEBUG: Carregando o histórico do banco de dados para a sessão de chat...")
         
-        # 1. Carregar histórico no formato de dicionários do DB
-        history_from_db = self.db_manager.get_last_messages(num_messages=self.AI_CONTEXT_LIMIT)
+        chat = self.model.start_chat(history=self._with_context_budget(self._load_history_contents()))
+        return chat
+
+    def _load_history_contents(self):
+        """
+        Monta o histórico para o modelo a partir do DB: o resumo acumulado (se houver)
+        seguido das mensagens que ainda não foram incorporadas a ele.
+        :return: Lista de genai.protos.Content em ordem cronológica.
+        """
+        last_summarized_id = 0
+        self._summary_prefix = []
+        if self.summarizer:
+            summary, last_summarized_id = self.summarizer.get_summary()
+            if summary:
+                self._summary_prefix = [
+                    genai.protos.Content(role='user', parts=[
+                        genai.protos.Part(text=self.SUMMARY_CONTEXT_TEXT.format(summary=summary))
+                    ]),
+                    genai.protos.Content(role='model', parts=[
+                        genai.protos.Part(text=self.SUMMARY_ACK_TEXT)
+                    ]),
+                ]
+
+        # 1. Carregar histórico em formato binário do DB (imagens já em bytes, sem base64)
+        history_from_db = self.db_manager.get_context_messages(
+            num_messages=self.AI_CONTEXT_LIMIT,
+            after_id=last_summarized_id,
+            conversation_id=self.conversation_id
+        )
+        # Mensagens anteriores a esta ficam fora do contexto: é delas que vêm as memórias
+        self._context_start_id = history_from_db[0].id if history_from_db else None
         
         # 2. Formatar histórico para o genai.ChatSession
         formatted_history = []
         for msg in history_from_db:
-            parts_data = msg.get('parts')
-            
             parts_for_model = []
-            for part_data in parts_data:
-                
-                # Caso seja uma parte de imagem (inline_data)
-                if 'inline_data' in part_data and 'data' in part_data['inline_data']:
-                    try:
-                        # O 'data' no BD está como string base64, precisamos decodificar para bytes.
-                        image_bytes = base64.b64decode(part_data['inline_data']['data'])
-                        
-                        # Usando a sintaxe direta de dicionário para inline_data, que o SDK aceita
-                        parts_for_model.append(genai.protos.Part(
-                            inline_data={
-                                'mime_type': part_data['inline_data']['mime_type'],
-                                'data': image_bytes
-                            }
-                        ))
-                    except Exception as e:
-                        print(f"AVISO: Falha ao decodificar imagem do histórico: {e}")
-                        # Se falhar, pula esta parte
-                        continue 
-                        
-                # Caso seja uma parte de texto
-                elif 'text' in part_data:
-                    parts_for_model.append(genai.protos.Part(text=part_data['text']))
-                
-                # Trata FunctionCall
-                elif 'function_call' in part_data:
-                    fc_data = part_data['function_call']
-                    parts_for_model.append(genai.protos.Part(
-                        function_call=genai.protos.FunctionCall(
-                            name=fc_data['name'], 
-                            args=fc_data['args']
-                        )
-                    ))
-                
-                # Trata FunctionResponse
-                elif 'function_response' in part_data:
-                    fr_data = part_data['function_response']
-                    parts_for_model.append(genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=fr_data['name'], 
-                            response=fr_data['response']
-                        )
-                    ))
 
+            # Caso tenha texto
+            if msg.content:
+                parts_for_model.append(genai.protos.Part(text=msg.content))
+
+            # Caso tenha imagem: os bytes do SQLite vão direto para o inline_data
+            if msg.image_data and msg.image_mime_type:
+                parts_for_model.append(genai.protos.Part(
+                    inline_data=genai.protos.Blob(
+                        mime_type=msg.image_mime_type,
+                        data=msg.image_data
+                    )
+                ))
 
             if parts_for_model:
                 # Cria o objeto Content para a mensagem, com as partes formatadas
-                formatted_history.append(genai.protos.Content(role=msg['role'], parts=parts_for_model))
+                formatted_history.append(genai.protos.Content(role=msg.role, parts=parts_for_model))
         
-        # 3. Criar a sessão de chat com o histórico carregado
-        chat = self.model.start_chat(history=formatted_history)
-        return chat
+        return self._summary_prefix + formatted_history
+
+    def _with_context_budget(self, contents):
+        """
+        Aplica o orçamento de contexto preservando o resumo fixo no início do histórico.
+        """
+        prefix = self._summary_prefix
+        if prefix and contents[:len(prefix)] == prefix:
+            prefix_tokens = sum(self._estimate_part_cost(part)[0] for content in prefix for part in content.parts)
+            body = self._apply_context_budget(contents[len(prefix):], self.context_token_budget - prefix_tokens)
+            return prefix + body
+        return self._apply_context_budget(contents)
+
+    def _schedule_summary_update(self):
+        """Atualiza o resumo em segundo plano, sem atrasar a resposta ao usuário."""
+        if not self.summarizer:
+            return
+
+        def worker():
+            if self.summarizer.update():
+                # A sessão é remontada a partir do DB antes da próxima mensagem
+                self._summary_refresh_pending = True
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _index_message(self, message_id, text):
+        """Envia uma mensagem recém-salva para o índice da memória semântica (em segundo plano)."""
+        if self.memory is None or message_id is None:
+            return
+
+        def worker():
+            try:
+                self.memory.add(message_id, text)
+            except Exception as e:
+                print(f"ERRO: Falha ao indexar a mensagem {message_id} na memória semântica. Detalhes: {e}")
+
+        self._memory_executor.submit(worker)
 
-    def get_paginated_history(self, offset: int, limit: int):
+    def _recall_memories(self, pergunta):
         """
-        Retorna um pedaço (página) do histórico para a GUI (texto + bytes).
+        Recupera as mensagens antigas (fora do contexto) mais parecidas com a pergunta.
+        :return: O texto a ser enviado junto com a pergunta ou None.
         """
-        print(f"DEBUG: Buscando histórico paginado: offset={offset}, limit={limit}")
+        if self.memory is None or not pergunta or self._context_start_id is None:
+            return None
         try:
-            # Chama o método no gerenciador de BD 
-            return self.db_manager.get_paginated_messages(offset=offset, limit=limit)
-        except AttributeError:
-            print("ERRO: 'get_paginated_messages' não está implementado. Retornando todo o histórico como fallback.")
-            return self.db_manager.get_all_messages() 
-            
+            start = time.perf_counter()
+            with Metricas.span('memory.recall') as span:
+                memories = self.memory.recall(pergunta, k=self.memory_top_k, before_id=self._context_start_id)
+                span.set(memories=len(memories))
+            print(f"DEBUG: Memória semântica: {len(memories)} lembrança(s) em {(time.perf_counter() - start) * 1000:.1f} ms.")
+        except Exception as e:
+            print(f"ERRO: Falha ao consultar a memória semântica. Detalhes: {e}")
+            return None
+        if not memories:
+            return None
+
+        lines = []
+        for memory in memories:
+            sender = "Usuário" if memory['role'] == 'user' else "Nyx"
+            lines.append(f"- [{memory['timestamp']}] {sender}: {' '.join(memory['text'].split())[:500]}")
+        return self.MEMORY_CONTEXT_TEXT.format(memories="\n".join(lines))
+
+    def _estimate_part_cost(self, part):
+        """
+        Estima o custo de uma parte do histórico.
+        :return: Uma tupla (tokens_estimados, bytes_de_imagem).
+        """
+        if part.inline_data.data:
+            return self.IMAGE_TOKEN_ESTIMATE, len(part.inline_data.data)
+        if part.text:
+            return len(part.text) // self.CHARS_PER_TOKEN + 1, 0
+        if part.function_call.name:
+            return (len(part.function_call.name) + len(str(dict(part.function_call.args)))) // self.CHARS_PER_TOKEN + 1, 0
+        if part.function_response.name:
+            return len(str(dict(part.function_response.response))) // self.CHARS_PER_TOKEN + 1, 0
+        return 0, 0
+
+    def _apply_context_budget(self, contents, token_budget=None):
+        """
+        Seleciona o histórico que cabe no orçamento de tokens e de bytes de imagem.
+        Percorre do mais recente para o mais antigo: as últimas CONTEXT_RECENT_VERBATIM
+        mensagens entram integralmente; nas anteriores, as imagens são as primeiras a
+        sair (trocadas por um aviso de texto) e, quando nem o texto cabe, o restante
+        do histórico mais antigo é descartado.
+        :param contents: Lista de genai.protos.Content em ordem cronológica.
+        :param token_budget: Orçamento de tokens (padrão: self.context_token_budget).
+        :return: A lista reduzida, em ordem cronológica.
+        """
+        if token_budget is None:
+            token_budget = self.context_token_budget
+        tokens_used = 0
+        image_bytes_used = 0
+        images_kept = 0
+        images_dropped = 0
+        selected = []
+
+        for position, content in enumerate(reversed(contents)):
+            costs = [self._estimate_part_cost(part) for part in content.parts]
+
+            if position < self.CONTEXT_RECENT_VERBATIM:
+                tokens_used += sum(tokens for tokens, _ in costs)
+                image_bytes_used += sum(size for _, size in costs)
+                images_kept += sum(1 for _, size in costs if size)
+                selected.append(content)
+                continue
+
+            text_tokens = sum(tokens for tokens, size in costs if not size)
+            if tokens_used + text_tokens > token_budget:
+                break
+
+            parts = []
+            dropped_here = False
+            for part, (tokens, size) in zip(content.parts, costs):
+                if not size:
+                    parts.append(part)
+                elif (tokens_used + text_tokens + tokens <= token_budget and
+                        image_bytes_used + size <= self.context_image_bytes_budget):
+                    parts.append(part)
+                    tokens_used += tokens
+                    image_bytes_used += size
+                    images_kept += 1
+                else:
+                    parts.append(genai.protos.Part(text=self.OMITTED_IMAGE_TEXT))
+                    images_dropped += 1
+                    dropped_here = True
+
+            tokens_used += text_tokens
+            if not dropped_here:
+                selected.append(content)
+            else:
+                selected.append(genai.protos.Content(role=content.role, parts=parts))
+
+        selected.reverse()
+
+        # O histórico precisa começar em um turno do usuário que não seja a resposta
+        # de uma ferramenta, senão a chamada de função correspondente ficaria órfã
+        while selected and (selected[0].role != 'user' or
+                            any(part.function_response.name for part in selected[0].parts)):
+            selected.pop(0)
+
+        print(f"DEBUG: Contexto: {len(selected)}/{len(contents)} mensagens, ~{tokens_used} tokens estimados "
+              f"(orçamento {token_budget}), {images_kept} imagens mantidas "
+              f"({image_bytes_used / 1024:.0f} KB), {images_dropped} omitidas.")
+        return selected
+
+    @staticmethod
+    def _extract_function_calls(response):
+        """Retorna todas as chamadas de função (function_call) do primeiro candidato."""
+        if not response.candidates or not response.candidates[0].content.parts:
+            return []
+        return [
+            part.function_call
+            for part in response.candidates[0].content.parts
+            if getattr(part, 'function_call', None) and part.function_call.name
+        ]
+
+    @staticmethod
+    def _extract_text(response):
+        """Concatena as partes de texto do primeiro candidato."""
+        if not response.candidates or not response.candidates[0].content.parts:
+            return ""
+        return "".join(part.text for part in response.candidates[0].content.parts if part.text)
+
+    @staticmethod
+    def _timed_execute_tool(tool_name, tool_args, started):
+        """
+        Executa a ferramenta no worker do pool. Ao começar, grava o instante de
+        início em 'started' (um dicionário com o Event 'event'), para que o tempo
+        esperando na fila do pool não conte contra o limite da ferramenta.
+        :return: Uma tupla (resultado, duração em segundos).
+        """
+        start = time.perf_counter()
+        started['at'] = start
+        started['event'].set()
+        tool_output = execute_tool(tool_name, tool_args)
+        return tool_output, time.perf_counter() - start
+
+    def _execute_tool_calls(self, tool_calls):
+        """
+        Executa em paralelo todas as chamadas de função de um turno do modelo,
+        respeitando o tempo limite de cada ferramenta (definido no registro).
+        O limite conta a partir do início da execução; uma chamada que nem sai da
+        fila do pool dentro do limite também é dada como estourada. Threads Python
+        não podem ser interrompidas: a ferramenta que estoura o tempo segue ocupando
+        o seu worker até terminar, mas o pool é limitado (MAX_PARALLEL_TOOLS), então
+        ferramentas travadas nunca criam threads além dele.
+        :return: Uma tupla (parts, results): 'parts' é a lista de genai.protos.Part com
+                 um function_response por chamada, na mesma ordem das chamadas, e
+                 'results' traz o nome, o resultado e a duração de cada ferramenta.
+        """
+        round_start = time.perf_counter()
+        pending = []
+        for tool_call in tool_calls:
+            # Converte os argumentos para um dicionário Python
+            tool_args = dict(tool_call.args.items()) if tool_call.args else {}
+            print(f"\n--- DEBUG: Modelo solicitou chamada de função: {tool_call.name} ---")
+            print(f"--- DEBUG: Argumentos: {tool_args} ---\n")
+
+            # Tempo limite definido no registro de cada ferramenta
+            timeout = tool_registry.timeout(tool_call.name)
+            # As ferramentas rodam em outras threads: o contexto leva junto o banco e a
+            # conversa deste motor ('buscar_historico' consulta o mesmo banco do motor)
+            context = contextvars.copy_context()
+            context.run(Busca_no_Historico.current_database.set, self.db_manager)
+            context.run(Busca_no_Historico.current_conversation.set, self.conversation_id)
+            started = {'event': threading.Event()}
+            future = self._tool_executor.submit(context.run, self._timed_execute_tool, tool_call.name, tool_args, started)
+            pending.append((tool_call.name, future, started, timeout))
+
+        response_parts = []
+        results = []
+        tools_time = 0.0
+        for tool_name, future, started, timeout in pending:
+            try:
+                if not started['event'].wait(timeout):
+                    future.cancel()
+                    raise FutureTimeoutError()
+                remaining = started['at'] + timeout - time.perf_counter()
+                tool_output, elapsed = future.result(timeout=max(0.0, remaining))
+                tools_time += elapsed
+                print(f"DEBUG: Ferramenta '{tool_name}' concluída em {elapsed * 1000:.0f} ms.")
+            except FutureTimeoutError:
+                elapsed = timeout
+                tool_output = f"ERRO_FERRAMENTA: A ferramenta {tool_name} excedeu o tempo limite de {timeout}s."
+                Metricas.count('nyx_tool_timeouts_total', tool=tool_name)
+                print(f"AVISO: {tool_output}")
+            except Exception as e:
+                # Uma chamada com erro não descarta os resultados das outras
+                elapsed = 0.0
+                tool_output = f"ERRO_FERRAMENTA: Falha na execução da ferramenta {tool_name}: {str(e)}"
+
+            results.append({'name': tool_name, 'result': tool_output, 'elapsed': elapsed})
+
+            response_parts.append(genai.protos.Part(
+                function_response=genai.protos.FunctionResponse(
+                    name=tool_name,
+                    response={'result': tool_output}
+                )
+            ))
+
+        print(f"DEBUG: {len(pending)} ferramenta(s) em {(time.perf_counter() - round_start) * 1000:.0f} ms "
+              f"de relógio (soma sequencial: {tools_time * 1000:.0f} ms).")
+        return response_parts, results
+
+    def warm_up(self):
+        """Inicia o pré-carregamento das ferramentas locais em segundo plano."""
+        warm_up_tools()
+
+    def close(self):
+        """
+        Libera os pools criados por este motor (o pool de ferramentas compartilhado
+        não é fechado). Tarefas já enviadas, como a indexação da memória, terminam.
+        """
+        if self._owns_tool_executor:
+            self._tool_executor.shutdown(wait=False)
+        if self._memory_executor is not None:
+            self._memory_executor.shutdown(wait=False)
+
+    def get_paginated_history(self, before_id: int = None, after_id: int = None, limit: int = 50, include_images: bool = False):
+        """
+        Retorna um pedaço (página) do histórico para a GUI, paginado por cursor (id).
+        Sem cursores, retorna a página mais recente. As imagens só são lidas se
+        'include_images' for True; caso contrário use 'get_message_image'.
+        """
+        print(f"DEBUG: Buscando histórico paginado: before_id={before_id}, after_id={after_id}, limit={limit}")
+        return self.db_manager.get_paginated_messages(
+            before_id=before_id,
+            after_id=after_id,
+            limit=limit,
+            include_images=include_images,
+            conversation_id=self.conversation_id
+        )
+
+    def get_message_image(self, message_id: int):
+        """
+        Retorna (bytes, mime_type) da imagem de uma mensagem, carregada sob demanda.
+        """
+        return self.db_manager.get_message_image(message_id)
+
+    def get_message_thumbnail(self, message_id: int, width: int = THUMBNAIL_WIDTH):
+        """
+        Retorna os bytes (JPEG) da miniatura da imagem de uma mensagem. Se ainda não
+        existir, é gerada a partir da imagem original e guardada no banco; chame fora
+        da thread da GUI.
+        """
+        data, image_hash = self.db_manager.get_message_thumbnail(message_id, width)
+        if data or image_hash is None:
+            return data
+        image_data, _ = self.db_manager.get_image(image_hash)
+        if not image_data:
+            return None
+        data = thumbnail_from_bytes(image_data, width)
+        self.db_manager.save_thumbnail(image_hash, data, width)
+        return data
+
 
     def get_history(self):
         """
         Retorna todo o histórico de mensagens no formato amigável para a GUI (texto + bytes).
         """
-        return self.db_manager.get_all_messages() 
+        return self.db_manager.get_all_messages(conversation_id=self.conversation_id)
 
-    def send_message(self, text: str, image_pil: Image.Image = None) -> str:
+    def _send_to_session(self, content, stream, **kwargs):
         """
-        Envia a mensagem (e imagem opcional) para a IA usando a sessão de chat,
-        gerenciando chamadas de função e persistência, delegando a execução das
-        ferramentas para tools_handler.py.
+        Envia o conteúdo para a sessão de chat. Com 'stream', produz os pedaços de
+        texto à medida que chegam e, ao final, retorna a resposta completa (o
+        genai agrega os pedaços, incluindo as chamadas de função).
+        Uso: response = yield from self._send_to_session(...)
         """
-        if not os.getenv('GOOGLE_API_KEY'):
-            return "ERRO: Chave GOOGLE_API_KEY não configurada no ambiente."
+        with Metricas.span('model.send_message', stream=stream) as span:
+            start = time.perf_counter()
+            response = self.chat_session.send_message(content=content, stream=stream, **kwargs)
+            if stream:
+                first_chunk = True
+                for chunk in response:
+                    if first_chunk:
+                        first_chunk = False
+                        span.set(first_chunk_ms=round((time.perf_counter() - start) * 1000, 3))
+                    if not chunk.candidates or not chunk.candidates[0].content.parts:
+                        continue
+                    for part in chunk.candidates[0].content.parts:
+                        if part.text:
+                            yield {'type': 'text', 'text': part.text}
+        return response
+
+    def iter_message_events(self, text: str, image_pil: Image.Image = None, stream: bool = True):
+        """
+        Processa uma mensagem do usuário e produz eventos conforme o turno avança:
+          {'type': 'text', 'text': ...}                      pedaço de texto do modelo
+          {'type': 'tool_call', 'name': ..., 'args': ...}    ferramenta solicitada
+          {'type': 'tool_result', 'name': ..., 'elapsed': ...} ferramenta concluída
+          {'type': 'done', 'text': ..., 'error': bool}       sempre o último evento
+        O texto do evento 'done' é exatamente o que 'send_message' retorna.
+        Com Metricas ativado, o turno é medido no span 'chat.turn', pai dos spans
+        do banco, do modelo e das ferramentas.
+        """
+        completed = False
+        with Metricas.span('chat.turn', conversation_id=self.conversation_id, stream=stream) as span:
+            try:
+                for event in self._iter_turn_events(text, image_pil, stream):
+                    if event['type'] == 'done':
+                        completed = True
+                        span.set(error=event['error'])
+                        Metricas.count('nyx_turns_total', status='error' if event['error'] else 'ok')
+                    yield event
+            finally:
+                if not completed:
+                    # Turno interrompido pelo consumidor (gerador fechado): a sessão pode ter
+                    # ficado com uma resposta incompleta, então o próximo turno a remonta do DB
+                    self._summary_refresh_pending = True
+
+    def _iter_turn_events(self, text, image_pil, stream):
+        """Corpo de 'iter_message_events' (sem a instrumentação)."""
+        if self._requires_api_key and not os.getenv('GOOGLE_API_KEY'):
+            yield {'type': 'done', 'text': "ERRO: Chave GOOGLE_API_KEY não configurada no ambiente.", 'error': True}
+            return
 
         pergunta = text.strip()
         if not pergunta and image_pil is None:
-            return "Mensagem vazia ou sem imagem."
+            yield {'type': 'done', 'text': "Mensagem vazia ou sem imagem.", 'error': True}
+            return
 
-        # 1. Prepara dados para o banco de dados e para a API
-        image_bytes, mime_type = self._pil_to_bytes_and_mime(image_pil)
+        # 1. Prepara dados para o banco de dados e para a API (a imagem é codificada uma vez)
+        image = self._prepare_image(image_pil)
         
-        # Conteúdo a ser enviado pelo usuário para a API (lista de objetos PIL e/ou string):
+        # Conteúdo a ser enviado pelo usuário para a API (blob da imagem e/ou string):
         content_parts_initial = []
-        if image_pil:
-            content_parts_initial.append(image_pil)
+        if image:
+            content_parts_initial.append(image.as_api_part())
         if pergunta:
             content_parts_initial.append(pergunta)
 
         if not content_parts_initial:
-            return "ERRO: Conteúdo para envio vazio."
+            yield {'type': 'done', 'text': "ERRO: Conteúdo para envio vazio.", 'error': True}
+            return
+
+        # Lembranças de conversas que já saíram do contexto vão antes da pergunta
+        memory_text = self._recall_memories(pergunta)
+        if memory_text:
+            content_parts_initial.insert(0, memory_text)
 
         try:
+            # Se o resumo avançou, remonta a sessão como "resumo + mensagens recentes"
+            # (antes de salvar a nova mensagem, para que ela não entre duplicada)
+            if self._summary_refresh_pending:
+                self._summary_refresh_pending = False
+                self.chat_session.history = self._load_history_contents()
+
             # 2. Salva a mensagem do usuário no DB ANTES de enviar.
-            self.db_manager.save_message("user", pergunta, image_bytes, mime_type) 
+            user_message_id = self.db_manager.save_message(
+                "user", pergunta, image.data if image else None, image.mime_type if image else None,
+                conversation_id=self.conversation_id, image_hash=image.sha256 if image else None
+            )
+            self._index_message(user_message_id, pergunta)
+            if image and user_message_id:
+                # A miniatura já foi gerada junto com a imagem: a GUI nunca precisa decodificá-la
+                self.db_manager.save_thumbnail(image.sha256, image.thumbnail, THUMBNAIL_WIDTH)
+
+            # Mantém o histórico da sessão dentro do orçamento de contexto
+            self.chat_session.history = self._with_context_budget(self.chat_session.history)
             
             # 3. Envia a requisição inicial para a sessão de chat
-            current_response = self.chat_session.send_message(
-                content=content_parts_initial, 
+            current_response = yield from self._send_to_session(
+                content_parts_initial,
+                stream,
                 tools=GEMINI_TOOLS # Usa a lista importada
             )
 
@@ -208,67 +629,120 @@ class ChatEngine:
 
             while tool_call_count < self.MAX_TOOL_CALLS:
                 
-                tool_call = None
-                
-                # Extrai a chamada de função, se existir
-                if (current_response.candidates and 
-                    current_response.candidates[0].content.parts and
-                    # Verifica se o primeiro 'part' tem o atributo 'function_call'
-                    hasattr(current_response.candidates[0].content.parts[0], 'function_call') and 
-                    current_response.candidates[0].content.parts[0].function_call):
-                    
-                    tool_call = current_response.candidates[0].content.parts[0].function_call
-                    
-                if tool_call:
-                    tool_name = tool_call.name
-                    # Converte os argumentos para um dicionário Python
-                    tool_args = dict(tool_call.args.items()) if tool_call.args else {} 
-                    
-                    print(f"\n--- DEBUG: Modelo solicitou chamada de função: {tool_name} ---")
-                    print(f"--- DEBUG: Argumentos: {tool_args} ---\n")
+                # Extrai todas as chamadas de função do turno, se existirem
+                tool_calls = self._extract_function_calls(current_response)
                     
+                if tool_calls:
+                    for tool_call in tool_calls:
+                        tool_args = dict(tool_call.args.items()) if tool_call.args else {}
+                        yield {'type': 'tool_call', 'name': tool_call.name, 'args': tool_args}
+
                     # --------------------------------------------------------
-                    # --- EXECUÇÃO DELEGADA PARA O tools_handler.py ---
-                    tool_output = execute_tool(tool_name, tool_args)
+                    # --- EXECUÇÃO DELEGADA PARA O tools_handler.py (em paralelo) ---
+                    function_response_parts, tool_results = self._execute_tool_calls(tool_calls)
                     # --------------------------------------------------------
 
-                    # 4. Envia o resultado da ferramenta de volta para o modelo
-                    function_response_part = genai.protos.Part(
-                        function_response=genai.protos.FunctionResponse(
-                            name=tool_name,
-                            response={'result': tool_output}
-                        )
-                    )
-                    
-                    # Envia a resposta da ferramenta para o modelo para que ele gere a resposta de texto
-                    current_response = self.chat_session.send_message(
-                        content=[function_response_part] 
-                    )
+                    for tool_result in tool_results:
+                        yield {'type': 'tool_result', 'name': tool_result['name'], 'elapsed': tool_result['elapsed']}
+
+                    # 4. Envia todos os resultados de volta ao modelo em uma única mensagem
+                    current_response = yield from self._send_to_session(function_response_parts, stream)
                     
                     tool_call_count += 1
                 else:
                     # O modelo não solicitou mais chamadas de função, resposta final
-                    
-                    if (current_response.candidates and 
-                        current_response.candidates[0].content.parts and 
-                        current_response.candidates[0].content.parts[0].text):
-                        
-                        final_response_text = current_response.candidates[0].content.parts[0].text
-                    else:
+                    final_response_text = self._extract_text(current_response)
+                    if not final_response_text:
                         final_response_text = "Desculpe, a IA não conseguiu gerar uma resposta de texto válida."
                     break
 
             if not final_response_text:
-                return "Desculpe, não foi possível gerar uma resposta clara após várias chamadas de ferramentas."
+                yield {'type': 'done', 'text': "Desculpe, não foi possível gerar uma resposta clara após várias chamadas de ferramentas.", 'error': True}
+                return
             
             # 5. Salva a resposta final do modelo (apenas texto) no DB
-            self.db_manager.save_message("model", final_response_text)
+            model_message_id = self.db_manager.save_message(
+                "model", final_response_text, conversation_id=self.conversation_id
+            )
+            self._index_message(model_message_id, final_response_text)
+
+            # 6. Incorpora ao resumo as mensagens que saíram da janela recente
+            self._schedule_summary_update()
             
-            return final_response_text
+            yield {'type': 'done', 'text': final_response_text, 'error': False}
 
         except Exception as e:
             print(f"ERRO: A requisição de geração falhou. Erro: {e}")
-            return f"Desculpe, ocorreu um erro ao gerar a resposta. Detalhes técnicos: {e}"
+            yield {'type': 'done', 'text': f"Desculpe, ocorreu um erro ao gerar a resposta. Detalhes técnicos: {e}", 'error': True}
+
+    def send_message(self, text: str, image_pil: Image.Image = None) -> str:
+        """
+        Envia a mensagem (e imagem opcional) para a IA usando a sessão de chat,
+        gerenciando chamadas de função e persistência, delegando a execução das
+        ferramentas para tools_handler.py. Bloqueia até a resposta final.
+        """
+        final_response_text = ""
+        for event in self.iter_message_events(text, image_pil, stream=False):
+            if event['type'] == 'done':
+                final_response_text = event['text']
+        return final_response_text
+
+    async def stream_message(self, text: str, image_pil: Image.Image = None):
+        """
+        Versão assíncrona de 'iter_message_events' com streaming do texto:
+            async for event in engine.stream_message("Olá"):
+                ...
+        É uma ponte de thread, não uma implementação nativa em asyncio: não usa o
+        'send_message_async' do SDK do genai. O turno inteiro (espera pelo modelo,
+        ferramentas e banco, que são síncronos) roda em 'iter_message_events' e ocupa
+        uma thread do executor padrão do loop do início ao fim; o loop só recebe os
+        eventos, assim que produzidos, sem ficar bloqueado. Cada turno simultâneo
+        ocupa uma thread, e turnos além do limite do executor padrão esperam na fila.
+        Se o consumidor parar antes do fim (break, cancelamento), a thread
+        interrompe o turno no próximo evento em vez de ir até o final; a resposta
+        incompleta não é salva.
+        """
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+        end_of_stream = object()
+        stopped = threading.Event()
+
+        def producer():
+            turn = self.iter_message_events(text, image_pil, stream=True)
+            try:
+                for event in turn:
+                    if stopped.is_set():
+                        break
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            finally:
+                turn.close()
+                try:
+                    loop.call_soon_threadsafe(events.put_nowait, end_of_stream)
+                except RuntimeError:
+                    pass  # o loop já foi fechado: não há mais quem consumir
+
+        producer_future = loop.run_in_executor(None, producer)
+        try:
+            while True:
+                event = await events.get()
+                if event is end_of_stream:
+                    break
+                yield event
+            await producer_future
+        finally:
+            stopped.set()
+
+    async def send_message_async(self, text: str, image_pil: Image.Image = None) -> str:
+        """
+        Versão assíncrona de 'send_message': retorna o texto final sem bloquear o
+        loop. Também é uma ponte de thread: o turno ocupa uma thread do executor
+        padrão até terminar (veja 'stream_message').
+        """
+        final_response_text = ""
+        async for event in self.stream_message(text, image_pil):
+            if event['type'] == 'done':
+                final_response_text = event['text']
+        return final_response_text
 
 if __name__ == '__main__':
     try:
@@ -0,0 +1,131 @@
+import io
+import os
+import hashlib
+from typing import NamedTuple
+
+from PIL import Image, ImageOps
+
+# Maior lado (px) da imagem guardada e enviada ao modelo (NYX_IMAGE_MAX_EDGE).
+# O Gemini reduz imagens grandes de qualquer forma; acima disso só se paga upload.
+MAX_EDGE = int(os.getenv('NYX_IMAGE_MAX_EDGE') or 1568)
+# Qualidade do JPEG gravado (NYX_IMAGE_QUALITY)
+JPEG_QUALITY = int(os.getenv('NYX_IMAGE_QUALITY') or 85)
+# Largura das miniaturas exibidas no histórico da GUI
+THUMBNAIL_WIDTH = 250
+THUMBNAIL_QUALITY = 80
+# Tag EXIF com a orientação da câmera
+EXIF_ORIENTATION = 0x0112
+
+
+class ImagemPreparada(NamedTuple):
+    """
+    Imagem já reduzida e codificada uma única vez. Os mesmos bytes vão para o
+    banco, para a API ('as_api_part') e, via 'thumbnail', para a GUI.
+    """
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    sha256: str
+    thumbnail: bytes
+
+    def as_api_part(self):
+        """Blob inline aceito pelo genai (sem codificar a imagem de novo)."""
+        return {'mime_type': self.mime_type, 'data': self.data}
+
+
+def _has_transparency(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _fit(image, max_edge):
+    """Reduz a imagem para caber em max_edge x max_edge, mantendo a proporção."""
+    if max(image.size) <= max_edge:
+        return image
+    scale = max_edge / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap: redução inteira rápida antes do LANCZOS, quase sem perda visível.
+    # 'resize' devolve uma nova imagem: a do chamador não é alterada.
+    return image.resize(size, Image.LANCZOS, reducing_gap=3.0)
+
+
+def _encode(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def make_thumbnail(image, width=THUMBNAIL_WIDTH):
+    """Miniatura JPEG com a largura indicada (imagens menores não são ampliadas)."""
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+    if image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        rgba = image.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        image = background
+    return _encode(image, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+
+
+def thumbnail_from_bytes(data, width=THUMBNAIL_WIDTH):
+    """
+    Gera a miniatura a partir dos bytes de uma imagem já gravada (JPEG é
+    decodificado direto em escala reduzida, sem expandir a imagem inteira).
+    """
+    image = Image.open(io.BytesIO(data))
+    if image.format == 'JPEG' and image.width > width:
+        image.draft('RGB', (width, max(1, round(image.height * width / image.width))))
+    return make_thumbnail(image, width)
+
+
+def preparar_imagem(image, max_edge=None, quality=None):
+    """
+    Prepara uma imagem enviada pelo usuário: corrige a orientação EXIF, reduz o
+    maior lado para 'max_edge', codifica uma única vez (JPEG, ou PNG quando há
+    transparência) e gera a miniatura da GUI a partir da imagem já reduzida.
+    :param image: PIL Image, bytes da imagem ou uma ImagemPreparada (devolvida como está).
+                  A PIL Image do chamador não é alterada.
+    :param max_edge: Maior lado em px (padrão: MAX_EDGE).
+    :param quality: Qualidade do JPEG (padrão: JPEG_QUALITY).
+    :return: Uma ImagemPreparada.
+    """
+    if isinstance(image, ImagemPreparada):
+        return image
+    owned = isinstance(image, (bytes, bytearray))
+    if owned:
+        image = Image.open(io.BytesIO(image))
+    max_edge = max_edge or MAX_EDGE
+    quality = quality or JPEG_QUALITY
+
+    # JPEG ainda não decodificado: decodifica direto em escala reduzida (1/2, 1/4, 1/8),
+    # o que evita expandir uma foto de 12 MP inteira na memória
+    if image.format == 'JPEG' and max(image.size) > max_edge:
+        # 'draft' altera a própria imagem: a do chamador (ex.: Image.open na GUI)
+        # é reaberta do arquivo, e a decodificação reduzida é feita na cópia
+        if not owned and getattr(image, 'filename', None):
+            image = Image.open(image.filename)
+            owned = True
+        if owned:
+            scale = max_edge / max(image.size)
+            image.draft('RGB', (round(image.width * scale), round(image.height * scale)))
+    # Só gira se a foto pedir (exif_transpose copia a imagem mesmo sem rotação)
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    image = _fit(image, max_edge)
+
+    if _has_transparency(image):
+        image = image.convert('RGBA')
+        data, mime_type = _encode(image, 'PNG', optimize=True), 'image/png'
+    else:
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        data, mime_type = _encode(image, 'JPEG', quality=quality, optimize=True), 'image/jpeg'
+
+    return ImagemPreparada(
+        data=data,
+        mime_type=mime_type,
+        width=image.width,
+        height=image.height,
+        sha256=hashlib.sha256(data).hexdigest(),
+        thumbnail=make_thumbnail(image),
+    )
@@ -0,0 +1,151 @@
+import re
+import inspect
+import threading
+
+import google.generativeai as genai
+
+
+class Ferramenta:
+    """
+    Uma ferramenta registrada: a função Python, a FunctionDeclaration gerada a
+    partir da assinatura e os metadados usados pelo motor e pelo cache.
+    """
+    def __init__(self, func, timeout, cache_ttl, max_concurrency):
+        self.name = func.__name__
+        self.func = func
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+        self.max_concurrency = max_concurrency
+        self.parameters = inspect.signature(func).parameters
+        self.required = [name for name, param in self.parameters.items() if param.default is inspect.Parameter.empty]
+        self.declaration = _build_declaration(func, self.parameters, self.required)
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def call(self, tool_args):
+        """
+        Valida os argumentos enviados pelo modelo e chama a função, respeitando o
+        limite de execuções simultâneas da ferramenta.
+        """
+        kwargs = {}
+        for name, param in self.parameters.items():
+            value = (tool_args or {}).get(name)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                if name in self.required:
+                    return f"ERRO_FERRAMENTA: Argumento '{name}' vazio ou inválido fornecido pela IA para a ferramenta {self.name}."
+                continue
+            # O modelo envia números inteiros como float (5 -> 5.0)
+            if param.annotation is int and isinstance(value, float):
+                value = int(value)
+            kwargs[name] = value
+
+        if self._slots is None:
+            return self.func(**kwargs)
+        with self._slots:
+            return self.func(**kwargs)
+
+
+# Tipos das anotações convertidos para os tipos do esquema do Gemini
+_SCHEMA_TYPES = {
+    str: genai.protos.Type.STRING,
+    int: genai.protos.Type.INTEGER,
+    float: genai.protos.Type.NUMBER,
+    bool: genai.protos.Type.BOOLEAN,
+}
+_PARAM_DOC = re.compile(r"^:param (\w+):\s*(.*)$")
+
+
+def _parse_docstring(func):
+    """
+    Separa a docstring em descrição da ferramenta e descrição de cada parâmetro
+    (linhas ':param nome: ...', que podem continuar nas linhas seguintes).
+    """
+    description, params, current = [], {}, None
+    for line in (inspect.getdoc(func) or "").splitlines():
+        line = line.strip()
+        match = _PARAM_DOC.match(line)
+        if match:
+            current = match.group(1)
+            params[current] = [match.group(2)]
+        elif line.startswith(':'):
+            current = None
+        elif current is not None:
+            params[current].append(line)
+        elif line:
+            description.append(line)
+    return " ".join(description), {name: " ".join(" ".join(parts).split()) for name, parts in params.items()}
+
+
+def _build_declaration(func, parameters, required):
+    description, param_docs = _parse_docstring(func)
+    properties = {}
+    for name, param in parameters.items():
+        if param.annotation not in _SCHEMA_TYPES:
+            raise TypeError(f"Parâmetro '{name}' de '{func.__name__}' sem anotação de tipo suportada.")
+        properties[name] = genai.protos.Schema(type=_SCHEMA_TYPES[param.annotation], description=param_docs.get(name, ""))
+    return genai.protos.FunctionDeclaration(
+        name=func.__name__,
+        description=description,
+        parameters=genai.protos.Schema(type=genai.protos.Type.OBJECT, properties=properties, required=required)
+    )
+
+
+# Esta classe substitui a lista de declarações e a cadeia de if/elif do 'execute_tool'.
+class RegistroDeFerramentas:
+    """
+    Registro das ferramentas disponíveis para o modelo. Cada ferramenta é uma
+    função anotada com o decorador 'ferramenta': a assinatura (tipos e valores
+    padrão) e a docstring (descrição e linhas ':param') geram a FunctionDeclaration,
+    e a chamada é despachada por nome em O(1). O corpo da função deve importar o
+    módulo da implementação, para que dependências pesadas só sejam carregadas
+    quando a ferramenta for usada pela primeira vez.
+    """
+    # Tempo máximo (s) de espera por uma ferramenta que não define o seu
+    DEFAULT_TIMEOUT = 30
+
+    def __init__(self):
+        self._tools = {}
+
+    def ferramenta(self, timeout=DEFAULT_TIMEOUT, cache_ttl=None, max_concurrency=None):
+        """
+        Decorador que registra a função como ferramenta.
+        :param timeout: Tempo máximo (s) que o motor espera pelo resultado.
+        :param cache_ttl: Validade (s) do resultado no cache; None para não cachear.
+        :param max_concurrency: Execuções simultâneas permitidas; None para sem limite.
+        """
+        def register(func):
+            if func.__name__ in self._tools:
+                raise ValueError(f"Ferramenta '{func.__name__}' registrada duas vezes.")
+            self._tools[func.__name__] = Ferramenta(func, timeout, cache_ttl, max_concurrency)
+            return func
+        return register
+
+    def __contains__(self, tool_name):
+        return tool_name in self._tools
+
+    def __iter__(self):
+        return iter(self._tools.values())
+
+    def get(self, tool_name):
+        return self._tools.get(tool_name)
+
+    def declarations(self):
+        """Lista de FunctionDeclaration de todas as ferramentas, na ordem de registro."""
+        return [tool.declaration for tool in self._tools.values()]
+
+    def timeout(self, tool_name):
+        tool = self._tools.get(tool_name)
+        return tool.timeout if tool else self.DEFAULT_TIMEOUT
+
+    def cache_ttls(self):
+        """Dicionário {ferramenta: ttl} das ferramentas cacheáveis (para o CacheDeFerramentas)."""
+        return {tool.name: tool.cache_ttl for tool in self._tools.values() if tool.cache_ttl}
+
+    def call(self, tool_name, tool_args):
+        """Executa a ferramenta; erros viram uma mensagem 'ERRO_FERRAMENTA' para o modelo."""
+        tool = self._tools.get(tool_name)
+        if tool is None:
+            return f"ERRO_FERRAMENTA: Ferramenta desconhecida solicitada: {tool_name}"
+        try:
+            return tool.call(tool_args)
+        except Exception as e:
+            return f"ERRO_FERRAMENTA: Falha na execução da ferramenta {tool_name}: {str(e)}"
@@ -0,0 +1,151 @@
+import re
+import threading
+
+# Esta classe mantém um resumo acumulado das mensagens antigas da conversa,
+# para que o motor envie "resumo + janela recente" em vez de todo o histórico.
+class ResumidorDeConversa:
+    """
+    Incorpora incrementalmente as mensagens antigas a um resumo persistido na
+    tabela 'conversation_summaries'. As RECENT_WINDOW mensagens mais novas nunca
+    entram no resumo: elas continuam sendo enviadas literalmente ao modelo.
+    """
+    # Mensagens mais recentes que sempre ficam fora do resumo
+    RECENT_WINDOW = 20
+    # Só resume quando houver pelo menos esta quantidade de mensagens pendentes
+    MIN_BATCH = 10
+    # Máximo de mensagens incorporadas por chamada ao modelo
+    MAX_BATCH = 100
+    # Tamanho máximo do resumo (caracteres) pedido ao modelo
+    SUMMARY_MAX_CHARS = 4000
+
+    SUMMARY_PROMPT = (
+        "Você mantém o resumo de uma conversa entre um usuário e a assistente Nyx.\n"
+        "Atualize o RESUMO ANTERIOR incorporando as NOVAS MENSAGENS. Preserve fatos, "
+        "preferências e pedidos do usuário, decisões tomadas e pendências. Escreva em "
+        "tópicos curtos, em português, com no máximo {max_chars} caracteres.\n\n"
+        "RESUMO ANTERIOR:\n{previous}\n\n"
+        "NOVAS MENSAGENS:\n{messages}\n"
+    )
+
+    def __init__(self, db_manager, model, conversation_id='default'):
+        """
+        :param db_manager: Instância de banco_de_dados.
+        :param model: Qualquer objeto com 'generate_content(prompt)' que retorne algo
+                      com o atributo 'text' (genai.GenerativeModel ou ModeloResumoLocal).
+        :param conversation_id: A conversa resumida.
+        """
+        self.db_manager = db_manager
+        self.model = model
+        self.conversation_id = conversation_id
+        self._lock = threading.Lock()
+
+    def get_summary(self):
+        """Retorna (summary, last_message_id) do resumo persistido mais recente."""
+        return self.db_manager.get_latest_summary(conversation_id=self.conversation_id)
+
+    def _pending_messages(self, last_message_id):
+        """Retorna as mensagens ainda não resumidas que já saíram da janela recente."""
+        recent = self.db_manager.get_paginated_messages(limit=self.RECENT_WINDOW, conversation_id=self.conversation_id)
+        if len(recent) < self.RECENT_WINDOW:
+            return []
+        window_start = recent[0]['id']
+
+        pending = self.db_manager.get_paginated_messages(
+            after_id=last_message_id, limit=self.MAX_BATCH, conversation_id=self.conversation_id
+        )
+        return [msg for msg in pending if msg['id'] < window_start]
+
+    @staticmethod
+    def _format_messages(messages):
+        """Formata as mensagens como linhas 'Usuário: ...' / 'Nyx: ...'."""
+        lines = []
+        for msg in messages:
+            sender = "Usuário" if msg['role'] == 'user' else "Nyx"
+            text = " ".join((msg.get('text') or "").split())
+            if msg.get('has_image'):
+                text = f"[enviou uma imagem] {text}".strip()
+            if text:
+                lines.append(f"{sender}: {text}")
+        return "\n".join(lines)
+
+    def update(self):
+        """
+        Incorpora ao resumo as mensagens pendentes, se houver um lote suficiente.
+        Seguro para ser chamado de várias threads: execuções simultâneas são ignoradas.
+        :return: True se um novo resumo foi salvo.
+        """
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        try:
+            summary, last_message_id = self.get_summary()
+            pending = self._pending_messages(last_message_id)
+            if len(pending) < self.MIN_BATCH:
+                return False
+
+            prompt = self.SUMMARY_PROMPT.format(
+                max_chars=self.SUMMARY_MAX_CHARS,
+                previous=summary or "(vazio)",
+                messages=self._format_messages(pending)
+            )
+            new_summary = (self.model.generate_content(prompt).text or "").strip()
+            if not new_summary:
+                print("AVISO: O modelo de resumo retornou um texto vazio. Resumo mantido.")
+                return False
+
+            self.db_manager.save_summary(new_summary, pending[-1]['id'], conversation_id=self.conversation_id)
+            print(f"DEBUG: Resumo atualizado com {len(pending)} mensagens (até id={pending[-1]['id']}).")
+            return True
+
+        except Exception as e:
+            print(f"ERRO: Falha ao atualizar o resumo da conversa. Detalhes: {e}")
+            return False
+        finally:
+            self._lock.release()
+
+
+class _RespostaLocal:
+    """Resposta mínima compatível com a do genai (apenas o atributo 'text')."""
+    def __init__(self, text):
+        self.text = text
+
+
+class ModeloResumoLocal:
+    """
+    Modelo de resumo local e determinístico, usado offline (NYX_SUMMARY_MODEL=local)
+    e para testar o resumidor sem a API do Gemini. Faz um resumo extrativo: mantém
+    o resumo anterior e a primeira frase de cada nova mensagem, descartando as
+    linhas mais antigas quando o limite de caracteres é atingido.
+    """
+    MAX_LINE_CHARS = 160
+
+    def __init__(self, max_chars=ResumidorDeConversa.SUMMARY_MAX_CHARS):
+        self.max_chars = max_chars
+
+    def generate_content(self, prompt):
+        previous = ""
+        messages = prompt
+        match = re.search(r"RESUMO ANTERIOR:\n(.*?)\n\nNOVAS MENSAGENS:\n(.*)", prompt, re.DOTALL)
+        if match:
+            previous, messages = match.group(1), match.group(2)
+
+        lines = [line for line in previous.splitlines() if line.strip() and line.strip() != "(vazio)"]
+        for line in messages.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            # Primeira frase da mensagem, truncada
+            first_sentence = re.split(r"(?<=[.!?])\s", line, maxsplit=1)[0]
+            lines.append("- " + first_sentence[:self.MAX_LINE_CHARS].lstrip("- "))
+
+        # Mantém as linhas mais novas dentro do limite
+        kept = []
+        total = 0
+        for line in reversed(lines):
+            if total + len(line) + 1 > self.max_chars:
+                break
+            kept.append(line)
+            total += len(line) + 1
+        kept.reverse()
+
+        return _RespostaLocal("\n".join(kept))
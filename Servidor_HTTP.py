@@ -0,0 +1,437 @@
+"""
+Servidor HTTP da Nyx (sem interface gráfica), sobre o GerenciadorDeSessoes.
+
+Uso:
+    python Servidor_HTTP.py                       # Gemini real (GOOGLE_API_KEY)
+    python Servidor_HTTP.py --fake --port 8080    # backend falso, sem chave nem rede
+
+Rotas:
+    GET  /health                                   estado e carga do servidor
+    GET  /conversations                            conversas existentes no banco
+    GET  /metrics                                  métricas no formato do Prometheus (Metricas)
+    GET  /conversations/<id>/messages?before_id=&limit=
+                                                   página do histórico (sem imagens)
+    POST /conversations/<id>/messages              {"text": ..., "image_base64": ..., "stream": bool}
+    GET  /conversations/<id>/ws                    WebSocket (RFC 6455): cada mensagem de texto
+                                                   do cliente é um JSON como o do POST
+
+Com "stream": true a resposta é enviada em partes (chunked), um evento do
+ChatEngine por linha em JSON (NDJSON) ou, com 'Accept: text/event-stream', no
+formato Server-Sent Events. No WebSocket, cada evento do turno é uma mensagem de
+texto em JSON, e vários turnos podem ser enviados pela mesma conexão.
+Mensagens da mesma conversa são processadas uma de cada vez; conversas
+diferentes, em paralelo. Quando o servidor está no limite de turnos
+simultâneos, ou a conversa está ocupada por tempo demais, a resposta é 429 com
+'Retry-After' (no WebSocket, um evento {"type": "error", "status": 429}).
+"""
+import os
+import re
+import json
+import base64
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import Metricas
+from Processamento_de_Imagem import preparar_imagem
+from Gerenciador_de_Sessoes import GerenciadorDeSessoes
+
+# Turnos processados ao mesmo tempo (somando todas as conversas)
+MAX_CONCURRENT_TURNS = int(os.getenv('NYX_SERVER_MAX_TURNS') or 8)
+# Espera máxima (segundos) por uma conversa ocupada antes de responder 429
+CONVERSATION_WAIT_TIMEOUT = float(os.getenv('NYX_SERVER_CONVERSATION_WAIT') or 30)
+# Tamanho máximo do corpo de uma requisição (imagens incluídas)
+MAX_BODY_BYTES = 10 * 1024 * 1024
+# Sugestão de espera enviada no cabeçalho Retry-After das respostas 429
+RETRY_AFTER_SECONDS = 1
+
+_CONVERSATION_ROUTE = re.compile(r"^/conversations/([A-Za-z0-9_.:@-]{1,128})/messages$")
+_WEBSOCKET_ROUTE = re.compile(r"^/conversations/([A-Za-z0-9_.:@-]{1,128})/ws$")
+# Constante do handshake do WebSocket (RFC 6455, seção 1.3)
+_WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC11B85"
+_WS_TEXT, _WS_CLOSE, _WS_PING, _WS_PONG, _WS_CONTINUATION = 0x1, 0x8, 0x9, 0xA, 0x0
+
+
+class ServidorNyx(ThreadingHTTPServer):
+    """ThreadingHTTPServer com o gerenciador de sessões e o controle de carga."""
+    daemon_threads = True
+
+    def __init__(self, address, sessions, max_concurrent_turns=MAX_CONCURRENT_TURNS,
+                 conversation_wait_timeout=CONVERSATION_WAIT_TIMEOUT):
+        super().__init__(address, _NyxRequestHandler)
+        self.sessions = sessions
+        self.conversation_wait_timeout = conversation_wait_timeout
+        self.max_concurrent_turns = max_concurrent_turns
+        self.turn_slots = threading.BoundedSemaphore(max_concurrent_turns)
+        self.stats = {'turns': 0, 'rejected': 0, 'errors': 0, 'in_flight': 0}
+        self._stats_lock = threading.Lock()
+
+    def count(self, counter, delta=1):
+        with self._stats_lock:
+            self.stats[counter] += delta
+        if counter != 'in_flight':
+            Metricas.count(f"nyx_server_{counter}_total", delta)
+
+
+class _NyxRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "NyxHTTP/1.0"
+
+    # --- Respostas ---
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error_json(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _send_busy(self, message):
+        self.server.count('rejected')
+        self._send_error_json(429, message, {'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        print(f"DEBUG: HTTP {self.address_string()} - {format % args}")
+
+    # --- Rotas ---
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            sessions = self.server.sessions
+            self._send_json(200, {
+                'status': 'ok',
+                'active_conversations': len(sessions.active_conversations()),
+                'max_concurrent_turns': self.server.max_concurrent_turns,
+                **self.server.stats,
+                'sessions': sessions.stats,
+            })
+            return
+
+        if url.path == '/metrics':
+            body = Metricas.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if url.path == '/conversations':
+            self._send_json(200, {'conversations': self.server.sessions.db_manager.list_conversations()})
+            return
+
+        match = _CONVERSATION_ROUTE.match(url.path)
+        if match:
+            query = parse_qs(url.query)
+            try:
+                before_id = int(query['before_id'][0]) if 'before_id' in query else None
+                limit = max(1, min(int(query.get('limit', ['50'])[0]), 200))
+            except ValueError:
+                self._send_error_json(400, "'before_id' e 'limit' devem ser números inteiros.")
+                return
+            page = self.server.sessions.db_manager.get_paginated_messages(
+                before_id=before_id, limit=limit, conversation_id=match.group(1)
+            )
+            for message in page:
+                message.pop('image_data', None)
+            self._send_json(200, {'messages': page})
+            return
+
+        match = _WEBSOCKET_ROUTE.match(url.path)
+        if match:
+            self._serve_websocket(match.group(1))
+            return
+
+        self._send_error_json(404, "Rota não encontrada.")
+
+    def do_POST(self):
+        match = _CONVERSATION_ROUTE.match(urlsplit(self.path).path)
+        if not match:
+            self._send_error_json(404, "Rota não encontrada.")
+            return
+        conversation_id = match.group(1)
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self._send_error_json(400, "Cabeçalho 'Content-Length' inválido.")
+            self.close_connection = True
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_error_json(413, f"Corpo da requisição maior que {MAX_BODY_BYTES} bytes.")
+            self.close_connection = True
+            return
+        try:
+            payload, text, image = self._parse_message(self.rfile.read(length))
+        except Exception as e:
+            self._send_error_json(400, f"Requisição inválida: {e}")
+            return
+
+        try:
+            with self._turn(conversation_id) as engine:
+                if payload.get('stream'):
+                    self._stream_turn(engine, text, image)
+                else:
+                    done = self._run_turn(engine.iter_message_events(text, image, stream=False))
+                    self._send_json(200, {'text': done['text'], 'error': done['error']})
+        except BlockingIOError as e:
+            self._send_busy(str(e))
+        except Exception as e:
+            self.server.count('errors')
+            print(f"ERRO: Falha ao processar a mensagem da conversa '{conversation_id}'. Detalhes: {e}")
+            self._send_error_json(500, f"Erro interno: {e}")
+
+    # --- Turnos ---
+
+    @staticmethod
+    def _parse_message(body):
+        """Lê o JSON de uma mensagem; retorna (payload, texto, ImagemPreparada ou None)."""
+        payload = json.loads(body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("o corpo deve ser um objeto JSON")
+        image = None
+        if payload.get('image_base64'):
+            # Reduzida e codificada aqui, antes de ocupar uma vaga de turno
+            image = preparar_imagem(base64.b64decode(payload['image_base64']))
+        return payload, payload.get('text') or "", image
+
+    @contextmanager
+    def _turn(self, conversation_id):
+        """
+        Garante a conversa e uma vaga de turno e retorna o ChatEngine. A vaga global
+        só é pedida com a conversa já garantida (quem espera por uma conversa ocupada
+        não segura vagas das outras) e, sem vaga, a mensagem é recusada na hora em vez
+        de enfileirada. Levanta BlockingIOError nos dois casos de recusa.
+        """
+        with self.server.sessions.session(conversation_id, timeout=self.server.conversation_wait_timeout) as engine:
+            if not self.server.turn_slots.acquire(blocking=False):
+                raise BlockingIOError("Servidor ocupado. Tente novamente em instantes.")
+            self.server.count('in_flight')
+            try:
+                self.server.count('turns')
+                yield engine
+            finally:
+                self.server.count('in_flight', -1)
+                self.server.turn_slots.release()
+
+    @staticmethod
+    def _run_turn(events, on_event=None):
+        """
+        Consome os eventos do turno até o fim e retorna o evento 'done'.
+        :param on_event: Chamado a cada evento; se levantar OSError (cliente
+                         desconectado), o turno continua até o fim sem ele, para
+                         que a resposta ainda seja salva no histórico.
+        """
+        done = {'type': 'done', 'text': "", 'error': True}
+        for event in events:
+            if on_event is not None:
+                try:
+                    on_event(event)
+                except OSError:
+                    print("AVISO: Cliente desconectado durante o streaming. O turno será concluído e salvo.")
+                    on_event = None
+            if event['type'] == 'done':
+                done = event
+        return done
+
+    def _stream_turn(self, engine, text, image):
+        """Envia os eventos do turno conforme são gerados (NDJSON ou Server-Sent Events)."""
+        use_sse = 'text/event-stream' in (self.headers.get('Accept') or "")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8" if use_sse else "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_event(event):
+            line = json.dumps(event, ensure_ascii=False)
+            data = f"event: {event['type']}\ndata: {line}\n\n" if use_sse else line + "\n"
+            self._write_chunk(data.encode('utf-8'))
+
+        done = self._run_turn(engine.iter_message_events(text, image, stream=True), send_event)
+        try:
+            self.wfile.write(b"0\r\n\r\n")
+        except OSError:
+            self.close_connection = True
+        return done
+
+    # --- WebSocket (RFC 6455, apenas o necessário: mensagens de texto, ping e close) ---
+
+    def _serve_websocket(self, conversation_id):
+        """Faz o handshake e processa as mensagens da conexão até o cliente fechá-la."""
+        key = self.headers.get('Sec-WebSocket-Key')
+        if (self.headers.get('Upgrade') or "").lower() != 'websocket' or not key \
+                or self.headers.get('Sec-WebSocket-Version') != '13':
+            self._send_error_json(400, "Handshake de WebSocket inválido.")
+            return
+        accept = base64.b64encode(hashlib.sha1((key.strip() + _WEBSOCKET_GUID).encode('ascii')).digest())
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept.decode('ascii'))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        while True:
+            try:
+                opcode, data = self._ws_read_message()
+            except (OSError, ConnectionError):
+                return
+            except ValueError as e:
+                # Quadro sem máscara, grande demais ou malformado: fecha com erro de protocolo
+                self._ws_close(*e.args)
+                return
+            if opcode == _WS_CLOSE:
+                self._ws_close(1000)
+                return
+            if opcode == _WS_PING:
+                self._ws_send_frame(_WS_PONG, data)
+                continue
+            if opcode != _WS_TEXT:
+                continue
+            try:
+                self._ws_turn(conversation_id, data)
+            except OSError:
+                print("AVISO: Cliente do WebSocket desconectado.")
+                return
+
+    def _ws_turn(self, conversation_id, data):
+        def send_event(event):
+            self._ws_send_frame(_WS_TEXT, json.dumps(event, ensure_ascii=False).encode('utf-8'))
+
+        try:
+            _, text, image = self._parse_message(data)
+        except Exception as e:
+            send_event({'type': 'error', 'status': 400, 'error': f"Mensagem inválida: {e}"})
+            return
+        try:
+            with self._turn(conversation_id) as engine:
+                self._run_turn(engine.iter_message_events(text, image, stream=True), send_event)
+        except BlockingIOError as e:
+            self.server.count('rejected')
+            send_event({'type': 'error', 'status': 429, 'error': str(e), 'retry_after': RETRY_AFTER_SECONDS})
+        except Exception as e:
+            self.server.count('errors')
+            print(f"ERRO: Falha ao processar a mensagem da conversa '{conversation_id}'. Detalhes: {e}")
+            send_event({'type': 'error', 'status': 500, 'error': f"Erro interno: {e}"})
+
+    def _ws_read_exact(self, size):
+        data = self.rfile.read(size)
+        if len(data) < size:
+            raise ConnectionError("conexão do WebSocket encerrada")
+        return data
+
+    def _ws_read_message(self):
+        """Lê uma mensagem completa (junta os fragmentos); retorna (opcode, dados)."""
+        message_opcode, parts, total = None, [], 0
+        while True:
+            first, second = self._ws_read_exact(2)
+            fin, opcode = first & 0x80, first & 0x0F
+            if not second & 0x80:
+                raise ValueError(1002, "quadro do cliente sem máscara")
+            length = second & 0x7F
+            if length == 126:
+                length = int.from_bytes(self._ws_read_exact(2), 'big')
+            elif length == 127:
+                length = int.from_bytes(self._ws_read_exact(8), 'big')
+            total += length
+            if total > MAX_BODY_BYTES:
+                raise ValueError(1009, "mensagem grande demais")
+            mask = self._ws_read_exact(4)
+            payload = self._ws_read_exact(length)
+            # XOR com a máscara repetida, de uma vez (inteiros grandes em vez de byte a byte)
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(length, 'big')
+
+            if opcode >= _WS_CLOSE:
+                # Quadros de controle podem chegar no meio de uma mensagem fragmentada
+                if opcode == _WS_PING and message_opcode is not None:
+                    self._ws_send_frame(_WS_PONG, payload)
+                    total -= length
+                    continue
+                return opcode, payload
+            if opcode != _WS_CONTINUATION:
+                message_opcode = opcode
+            elif message_opcode is None:
+                raise ValueError(1002, "fragmento de continuação inesperado")
+            parts.append(payload)
+            if fin:
+                return message_opcode, b"".join(parts)
+
+    def _ws_send_frame(self, opcode, payload=b""):
+        length = len(payload)
+        if length < 126:
+            header = bytes((0x80 | opcode, length))
+        elif length < 1 << 16:
+            header = bytes((0x80 | opcode, 126)) + length.to_bytes(2, 'big')
+        else:
+            header = bytes((0x80 | opcode, 127)) + length.to_bytes(8, 'big')
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+    def _ws_close(self, code, reason=""):
+        try:
+            self._ws_send_frame(_WS_CLOSE, code.to_bytes(2, 'big') + reason.encode('utf-8')[:120])
+        except OSError:
+            pass
+
+
+def criar_servidor(host="127.0.0.1", port=0, model=None, db=None, **kwargs):
+    """
+    Cria o servidor (sem iniciá-lo). Com port=0 o sistema escolhe uma porta livre,
+    disponível em 'servidor.server_address'. Use 'serve_forever' em uma thread e
+    'shutdown' + 'sessions.close()' para encerrar.
+    :param model: Backend do modelo (por exemplo, FakeGenerativeModel); padrão: Gemini.
+    :param db: Instância de banco_de_dados; padrão: o banco global do Nyx_Core.
+    :param kwargs: 'max_concurrent_turns' e 'conversation_wait_timeout' do ServidorNyx.
+    """
+    return ServidorNyx((host, port), GerenciadorDeSessoes(model=model, db=db), **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor HTTP da Nyx.")
+    parser.add_argument('--host', default=os.getenv('NYX_SERVER_HOST') or "127.0.0.1")
+    parser.add_argument('--port', type=int, default=int(os.getenv('NYX_SERVER_PORT') or 8080))
+    parser.add_argument('--fake', action='store_true', help="Usa o backend falso (sem chave da API nem rede).")
+    parser.add_argument('--metrics', action='store_true', help="Ativa a coleta exposta em /metrics (o mesmo que NYX_METRICS=1).")
+    args = parser.parse_args()
+
+    if args.metrics and not Metricas.is_enabled():
+        Metricas.enable(os.getenv('NYX_TRACE_FILE') or None)
+
+    model = None
+    if args.fake:
+        from Backend_Falso import FakeGenerativeModel
+        model = FakeGenerativeModel(first_token_latency=0.05, token_delay=0.01)
+
+    servidor = criar_servidor(args.host, args.port, model=model)
+    host, port = servidor.server_address[:2]
+    print(f"DEBUG: Servidor da Nyx ouvindo em http://{host}:{port}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servidor.sessions.close()
+
+
+if __name__ == '__main__':
+    main()
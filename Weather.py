@@ -1,5 +1,6 @@
 import requests
 import os
+import Cliente_HTTP
 
 API_KEY_CLIMA = os.getenv('API_KEY_CLIMA')
 
@@ -11,9 +12,10 @@ def obter_clima(cidade: str) -> str:
     if not API_KEY_CLIMA:
         return "Erro: Chave da API de clima (API_KEY_CLIMA) não definida."
 
-    url = f"https://api.openweathermap.org/data/2.5/weather?q={cidade}&appid={API_KEY_CLIMA}&lang=pt_br&units=metric"
+    url = "https://api.openweathermap.org/data/2.5/weather"
+    params = {'q': cidade, 'appid': API_KEY_CLIMA, 'lang': 'pt_br', 'units': 'metric'}
     try:
-        resposta = requests.get(url).json()
+        resposta = Cliente_HTTP.get(url, tool='obter_clima', params=params).json()
         
         if resposta.get('cod') == 200:
             temperatura = resposta['main']['temp']
@@ -0,0 +1,22 @@
+"""
+Configuração comum dos testes (pytest).
+
+Os módulos da Nyx ficam na raiz do repositório e alguns criam arquivos no
+diretório atual ao serem importados (o banco global do Nyx_Core, o cache de
+páginas): aqui eles são apontados para um diretório temporário antes de
+qualquer import.
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+_DIRETORIO_TEMPORARIO = tempfile.mkdtemp(prefix="nyx-testes-")
+os.environ['NYX_DB_PATH'] = os.path.join(_DIRETORIO_TEMPORARIO, 'historico_chat.db')
+os.environ['NYX_PAGE_CACHE_DB'] = os.path.join(_DIRETORIO_TEMPORARIO, 'cache_paginas.db')
+os.environ.pop('NYX_TOOL_CACHE_DB', None)
+os.environ.pop('NYX_METRICS', None)
+os.environ.pop('NYX_TRACE_FILE', None)
@@ -0,0 +1,77 @@
+import pytest
+
+from Banco_de_Dados import banco_de_dados
+
+
+@pytest.fixture
+def banco(tmp_path):
+    db = banco_de_dados(str(tmp_path / "historico.db"))
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def ids(banco):
+    """Sete mensagens na conversa padrão, intercaladas com mensagens de outra conversa."""
+    salvas = []
+    for numero in range(7):
+        salvas.append(banco.save_message('user', f"mensagem {numero}"))
+        banco.save_message('user', f"outra {numero}", conversation_id='outra')
+    return salvas
+
+
+def _ids(pagina):
+    return [mensagem['id'] for mensagem in pagina]
+
+
+def test_sem_cursor_retorna_a_pagina_mais_recente_em_ordem_cronologica(banco, ids):
+    assert _ids(banco.get_paginated_messages(limit=3)) == ids[-3:]
+
+
+def test_percorre_o_historico_para_tras_sem_repetir_nem_pular(banco, ids):
+    vistas = []
+    pagina = banco.get_paginated_messages(limit=3)
+    while pagina:
+        vistas = _ids(pagina) + vistas
+        pagina = banco.get_paginated_messages(before_id=pagina[0]['id'], limit=3)
+    assert vistas == ids
+
+
+def test_percorre_o_historico_para_frente(banco, ids):
+    assert _ids(banco.get_paginated_messages(after_id=ids[1], limit=3)) == ids[2:5]
+    assert _ids(banco.get_paginated_messages(after_id=ids[4], limit=10)) == ids[5:]
+
+
+@pytest.mark.parametrize('cursor', ['before_id', 'after_id'])
+def test_cursor_na_borda_retorna_pagina_vazia(banco, ids, cursor):
+    borda = ids[0] if cursor == 'before_id' else ids[-1]
+    assert banco.get_paginated_messages(**{cursor: borda}, limit=5) == []
+
+
+def test_cursor_inexistente_funciona_como_limite(banco, ids):
+    # Os ids intercalados da outra conversa também servem de cursor
+    assert _ids(banco.get_paginated_messages(before_id=ids[3] + 1, limit=2)) == ids[2:4]
+    assert _ids(banco.get_paginated_messages(after_id=0, limit=2)) == ids[:2]
+    assert _ids(banco.get_paginated_messages(before_id=10 ** 9, limit=2)) == ids[-2:]
+
+
+def test_cursores_juntos_usam_apenas_before_id(banco, ids):
+    assert _ids(banco.get_paginated_messages(before_id=ids[3], after_id=ids[0], limit=2)) == ids[1:3]
+
+
+@pytest.mark.parametrize('limite', [0, 1, 7, 100])
+def test_limite(banco, ids, limite):
+    assert _ids(banco.get_paginated_messages(limit=limite)) == ids[len(ids) - min(limite, len(ids)):]
+
+
+def test_conversa_vazia_ou_inexistente(banco, ids):
+    assert banco.get_paginated_messages(conversation_id='nenhuma') == []
+    assert banco.get_paginated_messages(before_id=ids[-1], conversation_id='nenhuma') == []
+
+
+def test_pagina_sem_imagens_nao_le_os_bytes(banco):
+    com_imagem = banco.save_message('user', "foto", image_data=b"\x89PNG bytes", image_mime_type='image/png')
+    [sem_bytes] = banco.get_paginated_messages(limit=1)
+    assert sem_bytes['id'] == com_imagem and sem_bytes['has_image'] and sem_bytes['image_data'] is None
+    [com_bytes] = banco.get_paginated_messages(limit=1, include_images=True)
+    assert com_bytes['image_data'] == b"\x89PNG bytes"
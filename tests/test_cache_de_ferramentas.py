@@ -0,0 +1,102 @@
+import threading
+
+import pytest
+
+from Cache_de_Ferramentas import CacheDeFerramentas
+
+
+class _Relogio:
+    """Relógio manual para controlar a expiração (TTL) nos testes."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio():
+    return _Relogio()
+
+
+@pytest.fixture
+def cache(relogio):
+    return CacheDeFerramentas(ttls={'obter_clima': 600, 'browse_url': 900}, clock=relogio)
+
+
+def test_ttl_expira_a_entrada(cache, relogio):
+    cache.set('obter_clima', {'cidade': 'Recife'}, "Ensolarado")
+    relogio.agora += 599
+    assert cache.get('obter_clima', {'cidade': 'Recife'}) == (True, "Ensolarado")
+    relogio.agora += 1
+    assert cache.get('obter_clima', {'cidade': 'Recife'}) == (False, None)
+    assert cache.stats()['entries'] == 0
+
+
+def test_ferramenta_sem_ttl_nao_e_cacheada(cache):
+    cache.set('buscar_historico', {'consulta': 'x'}, "resultado")
+    assert cache.get('buscar_historico', {'consulta': 'x'}) == (False, None)
+    assert cache.make_key('buscar_historico', {'consulta': 'x'}) is None
+
+
+@pytest.mark.parametrize('valor', ["ERRO_FERRAMENTA: falhou", "Erro ao conectar", "Não foi possível", "", "None", None])
+def test_erros_e_resultados_vazios_nao_sao_cacheados(cache, valor):
+    cache.set('obter_clima', {'cidade': 'Recife'}, valor)
+    assert cache.get('obter_clima', {'cidade': 'Recife'}) == (False, None)
+
+
+@pytest.mark.parametrize('a, b', [
+    ({'cidade': 'São Paulo'}, {'cidade': '  sao   PAULO '}),
+    ({'url': 'HTTP://Example.com:80/a?b=2&a=1#topo'}, {'url': 'http://example.com/a?a=1&b=2'}),
+    ({'url': 'https://example.com/?utm_source=x&id=3&fbclid=y'}, {'url': 'https://example.com?id=3'}),
+])
+def test_variacoes_triviais_usam_a_mesma_chave(cache, a, b):
+    ferramenta = 'obter_clima' if 'cidade' in a else 'browse_url'
+    assert cache.make_key(ferramenta, a) == cache.make_key(ferramenta, b)
+
+
+def test_porta_diferente_da_padrao_muda_a_chave(cache):
+    assert cache.make_key('browse_url', {'url': 'http://example.com:8080/'}) != \
+        cache.make_key('browse_url', {'url': 'http://example.com/'})
+
+
+def test_url_malformada_ignora_o_cache(cache):
+    argumentos = {'url': 'http://example.com:abc/'}
+    assert cache.make_key('browse_url', argumentos) is None
+    cache.set('browse_url', argumentos, "texto")
+    assert cache.get('browse_url', argumentos) == (False, None)
+
+
+def test_lru_remove_a_entrada_menos_usada(relogio):
+    cache = CacheDeFerramentas(ttls={'obter_clima': 600}, max_entries=2, clock=relogio)
+    for cidade in ('a', 'b'):
+        cache.set('obter_clima', {'cidade': cidade}, f"clima {cidade}")
+    cache.get('obter_clima', {'cidade': 'a'})
+    cache.set('obter_clima', {'cidade': 'c'}, "clima c")
+    assert cache.get('obter_clima', {'cidade': 'b'}) == (False, None)
+    assert cache.get('obter_clima', {'cidade': 'a'}) == (True, "clima a")
+    assert cache.stats()['tools']['obter_clima']['evictions'] == 1
+
+
+def test_camada_persistente_sobrevive_a_um_novo_cache(tmp_path, relogio):
+    caminho = str(tmp_path / "cache.db")
+    CacheDeFerramentas(ttls={'obter_clima': 600}, db_path=caminho, clock=relogio).set(
+        'obter_clima', {'cidade': 'Recife'}, "Ensolarado")
+
+    novo = CacheDeFerramentas(ttls={'obter_clima': 600}, db_path=caminho, clock=relogio)
+    assert novo.get('obter_clima', {'cidade': 'recife'}) == (True, "Ensolarado")
+    relogio.agora += 600
+    outro = CacheDeFerramentas(ttls={'obter_clima': 600}, db_path=caminho, clock=relogio)
+    assert outro.get('obter_clima', {'cidade': 'Recife'}) == (False, None)
+
+
+def test_acerto_em_memoria_nao_espera_o_disco(tmp_path, relogio):
+    cache = CacheDeFerramentas(ttls={'obter_clima': 600}, db_path=str(tmp_path / "cache.db"), clock=relogio)
+    cache.set('obter_clima', {'cidade': 'Recife'}, "Ensolarado")
+    resultado = []
+    with cache._db_lock:  # simula uma escrita lenta no SQLite feita por outra thread
+        leitura = threading.Thread(target=lambda: resultado.append(cache.get('obter_clima', {'cidade': 'Recife'})))
+        leitura.start()
+        leitura.join(timeout=2)
+        assert resultado == [(True, "Ensolarado")]
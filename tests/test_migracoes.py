@@ -0,0 +1,140 @@
+import hashlib
+import sqlite3
+
+import pytest
+
+from Banco_de_Dados import banco_de_dados
+
+
+def _criar_banco_original(caminho, mensagens):
+    """Cria um banco com o esquema original: a imagem fica em BLOB na própria mensagem."""
+    conn = sqlite3.connect(caminho)
+    conn.execute('''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            image_data BLOB NULL,
+            image_mime_type TEXT NULL
+        )
+    ''')
+    conn.executemany(
+        "INSERT INTO messages (role, content, image_data, image_mime_type) VALUES (?, ?, ?, ?)", mensagens
+    )
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "original.db")
+
+
+@pytest.fixture
+def abrir():
+    """Abre o banco com a versão atual (que migra o esquema) e fecha ao final."""
+    abertos = []
+
+    def abrir_banco(caminho):
+        db = banco_de_dados(caminho)
+        abertos.append(db)
+        return db
+
+    yield abrir_banco
+    for db in abertos:
+        db.close()
+
+
+def test_imagens_em_linha_migram_para_a_tabela_images(caminho, abrir, monkeypatch):
+    foto, outra = b"\x89PNG foto", b"\xff\xd8 outra"
+    _criar_banco_original(caminho, [
+        ('user', "olha a foto", foto, 'image/png'),
+        ('model', "bonita", None, None),
+        ('user', "de novo", foto, 'image/png'),
+        ('user', "", outra, None),
+    ])
+    # Lotes de uma mensagem: a migração precisa continuar de onde o lote anterior parou
+    monkeypatch.setattr(banco_de_dados, 'IMAGE_MIGRATION_BATCH', 1)
+    db = abrir(caminho)
+
+    conn = sqlite3.connect(caminho)
+    assert conn.execute("SELECT COUNT(*) FROM messages WHERE image_data IS NOT NULL").fetchone() == (0,)
+    # Imagens iguais são guardadas uma única vez
+    assert conn.execute("SELECT COUNT(*) FROM images").fetchone() == (2,)
+    conn.close()
+
+    pagina = db.get_paginated_messages(include_images=True)
+    assert [m['image_data'] for m in pagina] == [foto, None, foto, outra]
+    assert pagina[0]['image_hash'] == hashlib.sha256(foto).hexdigest()
+    assert db.get_image(pagina[3]['image_hash']) == (outra, 'image/jpeg')
+
+    # Reabrir o banco já migrado não muda nada
+    abrir(caminho)
+    assert [m['image_data'] for m in db.get_paginated_messages(include_images=True)] == [foto, None, foto, outra]
+
+
+def test_historico_existente_entra_no_indice_de_busca(caminho, abrir):
+    _criar_banco_original(caminho, [
+        ('user', "Qual é a capital da França?", None, None),
+        ('model', "A capital da França é Paris.", None, None),
+        ('user', "E a da Itália?", None, None),
+    ])
+    db = abrir(caminho)
+    assert db.fts_enabled
+
+    # O histórico anterior ao índice é encontrado, sem diferenciar acentos
+    assert {r['id'] for r in db.search_messages("franca")} == {1, 2}
+    assert [r['id'] for r in db.search_messages("paris")] == [2]
+    assert [r['id'] for r in db.search_messages("capital", before_id=2)] == [1]
+
+    # Os gatilhos mantêm o índice sincronizado depois da migração
+    novo = db.save_message('user', "Gosto de Roma")
+    assert [r['id'] for r in db.search_messages("roma")] == [novo]
+    conn = sqlite3.connect(caminho)
+    with conn:
+        conn.execute("UPDATE messages SET content = 'Gosto de Veneza' WHERE id = ?", (novo,))
+    assert db.search_messages("roma") == []
+    with conn:
+        conn.execute("DELETE FROM messages WHERE id = ?", (novo,))
+    conn.close()
+    assert db.search_messages("veneza") == []
+
+    # Reabrir não indexa o histórico de novo (nada duplicado)
+    assert len(abrir(caminho).search_messages("paris")) == 1
+
+
+def test_mensagens_e_resumos_antigos_ficam_na_conversa_padrao(caminho, abrir):
+    _criar_banco_original(caminho, [
+        ('user', "Meu nome é Ana", None, None),
+        ('model', "Prazer, Ana!", None, None),
+    ])
+    # Tabela de resumos anterior às várias conversas (sem 'conversation_id')
+    conn = sqlite3.connect(caminho)
+    with conn:
+        conn.execute('''
+            CREATE TABLE conversation_summaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                summary TEXT NOT NULL,
+                last_message_id INTEGER NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute("INSERT INTO conversation_summaries (summary, last_message_id) VALUES ('O usuário é Ana.', 2)")
+    conn.close()
+
+    db = abrir(caminho)
+    assert [m['text'] for m in db.get_paginated_messages()] == ["Meu nome é Ana", "Prazer, Ana!"]
+    assert db.get_latest_summary() == ("O usuário é Ana.", 2)
+
+    # Uma conversa nova não vê as mensagens, os resumos nem a busca da conversa padrão
+    db.save_message('user', "Oi, sou o Bruno", conversation_id='bruno')
+    assert [m['text'] for m in db.get_paginated_messages(conversation_id='bruno')] == ["Oi, sou o Bruno"]
+    assert db.get_latest_summary(conversation_id='bruno') == (None, 0)
+    assert db.search_messages("ana", conversation_id='bruno') == []
+    assert [c['conversation_id'] for c in db.list_conversations()] == ['bruno', 'default']
+
+    # Limpar uma conversa não apaga a outra
+    db.clear_history(conversation_id='default')
+    assert db.get_paginated_messages() == [] and db.get_latest_summary() == (None, 0)
+    assert len(db.get_paginated_messages(conversation_id='bruno')) == 1
@@ -0,0 +1,108 @@
+import time
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from Backend_Falso import FakeGenerativeModel
+from Banco_de_Dados import banco_de_dados
+import Nyx_Core
+from Nyx_Core import ChatEngine
+
+
+@pytest.fixture
+def criar_motor(tmp_path):
+    """Cria motores com o backend falso, cada um com o seu banco; fecha todos ao final."""
+    motores = []
+
+    def criar(nome, conversation_id='default'):
+        motor = ChatEngine(model=FakeGenerativeModel(), db=banco_de_dados(str(tmp_path / f"{nome}.db")),
+                           conversation_id=conversation_id)
+        motores.append(motor)
+        return motor
+
+    yield criar
+    for motor in motores:
+        motor.close()
+        motor.db_manager.close()
+
+
+def _chamada(nome, **argumentos):
+    return SimpleNamespace(name=nome, args=argumentos)
+
+
+def test_busca_no_historico_usa_o_banco_do_proprio_motor(criar_motor):
+    primeiro = criar_motor('primeiro')
+    primeiro.db_manager.save_message('user', "Minha pizza preferida é margherita")
+    primeiro.db_manager.save_message('user', "Qual era a minha pizza?")
+    # Um segundo motor, com outro banco, não pode mudar o banco consultado pelo primeiro
+    segundo = criar_motor('segundo')
+    segundo.db_manager.save_message('user', "Nada sobre comida aqui")
+
+    _, resultados = primeiro._execute_tool_calls([_chamada('buscar_historico', consulta="pizza")])
+    assert "margherita" in resultados[0]['result']
+    _, resultados = segundo._execute_tool_calls([_chamada('buscar_historico', consulta="pizza")])
+    assert resultados[0]['result'].startswith("Nenhuma mensagem anterior")
+
+
+@pytest.fixture
+def ferramentas_falsas(monkeypatch):
+    """
+    Substitui o despacho das ferramentas por funções controladas pelo teste, cada uma
+    com o seu tempo limite. As ferramentas 'travadas' são liberadas ao final.
+    """
+    liberar = threading.Event()
+    limites = {}
+    acoes = {
+        'rapida': lambda args: f"ok {args.get('n', '')}".strip(),
+        'lenta': lambda args: time.sleep(0.15) or "lenta ok",
+        'travada': lambda args: liberar.wait(5) and "tarde demais",
+        'quebrada': lambda args: 1 / 0,
+    }
+    monkeypatch.setattr(Nyx_Core, 'execute_tool', lambda nome, args: acoes[nome](args))
+    monkeypatch.setattr(Nyx_Core.tool_registry, 'timeout', lambda nome: limites.get(nome, 1.0))
+    yield limites
+    liberar.set()
+
+
+def test_estouro_e_erro_de_uma_ferramenta_nao_afetam_as_outras(criar_motor, ferramentas_falsas):
+    ferramentas_falsas['travada'] = 0.2
+    motor = criar_motor('isolamento')
+    inicio = time.perf_counter()
+    partes, resultados = motor._execute_tool_calls([
+        _chamada('travada'), _chamada('quebrada'), _chamada('rapida', n=1), _chamada('lenta'),
+    ])
+    assert time.perf_counter() - inicio < 1.0
+
+    # Uma resposta por chamada, na ordem das chamadas
+    assert [r['name'] for r in resultados] == ['travada', 'quebrada', 'rapida', 'lenta']
+    assert [p.function_response.name for p in partes] == ['travada', 'quebrada', 'rapida', 'lenta']
+    assert resultados[0]['result'] == "ERRO_FERRAMENTA: A ferramenta travada excedeu o tempo limite de 0.2s."
+    assert resultados[1]['result'].startswith("ERRO_FERRAMENTA: Falha na execução da ferramenta quebrada:")
+    assert resultados[2]['result'] == "ok 1"
+    assert resultados[3]['result'] == "lenta ok" and resultados[3]['elapsed'] >= 0.15
+
+
+def test_tempo_limite_conta_a_partir_do_inicio_da_execucao(tmp_path, ferramentas_falsas):
+    # Um único worker: a segunda chamada espera a primeira na fila, mas cada uma
+    # roda dentro do seu limite e nenhuma é dada como estourada
+    ferramentas_falsas['lenta'] = 0.25
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        motor = ChatEngine(model=FakeGenerativeModel(), db=banco_de_dados(str(tmp_path / "fila.db")), tool_executor=pool)
+        _, resultados = motor._execute_tool_calls([_chamada('lenta'), _chamada('lenta')])
+        motor.db_manager.close()
+    assert [r['result'] for r in resultados] == ["lenta ok", "lenta ok"]
+
+
+def test_chamada_presa_na_fila_alem_do_limite_estoura(tmp_path, ferramentas_falsas):
+    ferramentas_falsas.update(travada=0.2, rapida=0.1)
+    pool = ThreadPoolExecutor(max_workers=1)
+    motor = ChatEngine(model=FakeGenerativeModel(), db=banco_de_dados(str(tmp_path / "presa.db")), tool_executor=pool)
+    _, resultados = motor._execute_tool_calls([_chamada('travada'), _chamada('rapida')])
+    motor.db_manager.close()
+    pool.shutdown(wait=False)
+    assert [r['result'] for r in resultados] == [
+        "ERRO_FERRAMENTA: A ferramenta travada excedeu o tempo limite de 0.2s.",
+        "ERRO_FERRAMENTA: A ferramenta rapida excedeu o tempo limite de 0.1s.",
+    ]
@@ -0,0 +1,117 @@
+import time
+import threading
+
+import pytest
+import google.generativeai as genai
+
+from Registro_de_Ferramentas import RegistroDeFerramentas
+from Gerenciador_de_Ferramentas import GEMINI_TOOLS, tool_registry
+
+
+@pytest.fixture
+def registro():
+    registro = RegistroDeFerramentas()
+
+    @registro.ferramenta(timeout=7, cache_ttl=60)
+    def pesquisar(termo: str, quantidade: int = 3, exata: bool = False, peso: float = 1.0) -> str:
+        """
+        Pesquisa um termo.
+        Descrição em duas linhas.
+        :param termo: O termo
+            procurado.
+        :param quantidade: Quantos resultados.
+        :return: O texto encontrado.
+        """
+        return f"{termo}:{quantidade!r}:{exata}"
+
+    @registro.ferramenta()
+    def quebrar() -> str:
+        """Sempre falha."""
+        raise RuntimeError("falhou")
+
+    return registro
+
+
+def test_declaracao_gerada_da_assinatura_e_da_docstring(registro):
+    [declaracao, _] = registro.declarations()
+    assert declaracao.name == 'pesquisar'
+    assert declaracao.description == "Pesquisa um termo. Descrição em duas linhas."
+
+    parametros = declaracao.parameters
+    assert parametros.type == genai.protos.Type.OBJECT
+    assert list(parametros.required) == ['termo']
+    propriedades = parametros.properties
+    assert [propriedades[nome].type for nome in ('termo', 'quantidade', 'exata', 'peso')] == [
+        genai.protos.Type.STRING, genai.protos.Type.INTEGER, genai.protos.Type.BOOLEAN, genai.protos.Type.NUMBER,
+    ]
+    # Linhas de continuação entram na descrição; ':return:' não vira parâmetro
+    assert propriedades['termo'].description == "O termo procurado."
+    assert propriedades['quantidade'].description == "Quantos resultados."
+    assert propriedades['exata'].description == ""
+
+
+def test_metadados_do_registro(registro):
+    assert 'pesquisar' in registro and 'outra' not in registro
+    assert registro.timeout('pesquisar') == 7
+    assert registro.timeout('quebrar') == registro.timeout('outra') == RegistroDeFerramentas.DEFAULT_TIMEOUT
+    assert registro.cache_ttls() == {'pesquisar': 60}
+
+
+def test_registro_duplicado_e_anotacao_sem_suporte_falham(registro):
+    with pytest.raises(ValueError):
+        @registro.ferramenta()
+        def pesquisar(termo: str) -> str:
+            """Outra."""
+
+    with pytest.raises(TypeError):
+        @registro.ferramenta()
+        def sem_tipo(termo) -> str:
+            """Sem anotação."""
+    assert 'sem_tipo' not in registro
+
+
+def test_chamada_valida_e_converte_os_argumentos(registro):
+    # O modelo envia inteiros como float
+    assert registro.call('pesquisar', {'termo': "nyx", 'quantidade': 5.0}) == "nyx:5:False"
+    assert registro.call('pesquisar', {'termo': "nyx", 'quantidade': None}) == "nyx:3:False"
+    for argumentos in ({}, {'termo': "   "}, None):
+        assert registro.call('pesquisar', argumentos) == (
+            "ERRO_FERRAMENTA: Argumento 'termo' vazio ou inválido fornecido pela IA para a ferramenta pesquisar.")
+    assert registro.call('outra', {}) == "ERRO_FERRAMENTA: Ferramenta desconhecida solicitada: outra"
+    assert registro.call('quebrar', {}) == "ERRO_FERRAMENTA: Falha na execução da ferramenta quebrar: falhou"
+
+
+def test_limite_de_execucoes_simultaneas():
+    registro = RegistroDeFerramentas()
+    ativas, pico = [], []
+    trava = threading.Lock()
+
+    @registro.ferramenta(max_concurrency=2)
+    def limitada() -> str:
+        """Conta as execuções simultâneas."""
+        with trava:
+            ativas.append(1)
+            pico.append(len(ativas))
+        time.sleep(0.1)
+        with trava:
+            ativas.pop()
+        return "ok"
+
+    threads = [threading.Thread(target=registro.call, args=('limitada', {})) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(pico) == 2
+
+
+def test_ferramentas_do_nyx():
+    assert [declaracao.name for declaracao in GEMINI_TOOLS] == [
+        'google_search', 'browse_url', 'ipinfo', 'obter_clima', 'analisar_emocoes_local_bert', 'buscar_historico',
+    ]
+    [historico] = [declaracao for declaracao in GEMINI_TOOLS if declaracao.name == 'buscar_historico']
+    assert list(historico.parameters.required) == ['consulta']
+    assert historico.parameters.properties['limite'].type == genai.protos.Type.INTEGER
+    # Ferramentas com resultado que depende da conversa ou do texto nunca são cacheadas
+    assert 'buscar_historico' not in tool_registry.cache_ttls()
+    assert 'analisar_emocoes_local_bert' not in tool_registry.cache_ttls()
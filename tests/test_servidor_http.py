@@ -0,0 +1,162 @@
+import os
+import json
+import base64
+import hashlib
+import threading
+import http.client
+
+import pytest
+
+from Backend_Falso import FakeGenerativeModel
+from Banco_de_Dados import banco_de_dados
+import Servidor_HTTP
+
+
+@pytest.fixture
+def servidor(tmp_path):
+    """Servidor com o backend falso, uma única vaga de turno e espera curta pela conversa."""
+    modelo = FakeGenerativeModel(first_token_latency=0.4)
+    srv = Servidor_HTTP.criar_servidor(
+        model=modelo, db=banco_de_dados(str(tmp_path / "servidor.db")),
+        max_concurrent_turns=1, conversation_wait_timeout=0.1,
+    )
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+    srv.sessions.close()
+
+
+def _post(srv, conversa, corpo=None, headers=None):
+    conexao = http.client.HTTPConnection(*srv.server_address[:2], timeout=10)
+    dados = json.dumps(corpo if corpo is not None else {'text': "oi"}).encode('utf-8')
+    conexao.putrequest('POST', f"/conversations/{conversa}/messages")
+    for nome, valor in (headers or {'Content-Length': str(len(dados))}).items():
+        conexao.putheader(nome, valor)
+    conexao.endheaders()
+    conexao.send(dados)
+    resposta = conexao.getresponse()
+    return resposta.status, dict(resposta.getheaders()), json.loads(resposta.read() or b"{}")
+
+
+def _vaga_livre(srv):
+    if srv.turn_slots.acquire(blocking=False):
+        srv.turn_slots.release()
+        return True
+    return False
+
+
+def test_sobrecarga_responde_429_e_libera_a_vaga(servidor):
+    respostas = {}
+    primeiro = threading.Thread(target=lambda: respostas.setdefault('a', _post(servidor, 'a')))
+    primeiro.start()
+    # Espera o primeiro turno ocupar a conversa 'a' e a única vaga
+    for _ in range(100):
+        if servidor.stats['in_flight'] == 1:
+            break
+        threading.Event().wait(0.01)
+    assert servidor.stats['in_flight'] == 1
+
+    # Mesma conversa ocupada: desiste depois de conversation_wait_timeout
+    status, headers, _ = _post(servidor, 'a')
+    assert status == 429 and headers['Retry-After'] == str(Servidor_HTTP.RETRY_AFTER_SECONDS)
+    # Outra conversa, mas sem vaga de turno
+    status, _, corpo = _post(servidor, 'b')
+    assert status == 429 and "ocupado" in corpo['error']
+
+    primeiro.join()
+    assert respostas['a'][0] == 200
+    assert servidor.stats['in_flight'] == 0 and servidor.stats['rejected'] == 2
+    assert _vaga_livre(servidor)
+
+    # A vaga e a conversa foram liberadas: novos turnos passam
+    status, _, corpo = _post(servidor, 'b')
+    assert status == 200 and corpo == {'text': "Resposta simulada: oi", 'error': False}
+    assert _vaga_livre(servidor)
+
+
+@pytest.mark.parametrize('content_length', ['abc', '-1'])
+def test_content_length_invalido_responde_400(servidor, content_length):
+    status, _, corpo = _post(servidor, 'c', headers={'Content-Length': content_length})
+    assert status == 400 and 'Content-Length' in corpo['error']
+    assert _vaga_livre(servidor)
+
+
+class _ClienteWebSocket:
+    """Cliente WebSocket mínimo (quadros de texto mascarados) para os testes."""
+
+    def __init__(self, srv, conversa):
+        self.conexao = http.client.HTTPConnection(*srv.server_address[:2], timeout=10)
+        chave = base64.b64encode(os.urandom(16)).decode('ascii')
+        self.conexao.request('GET', f"/conversations/{conversa}/ws", headers={
+            'Upgrade': 'websocket', 'Connection': 'Upgrade',
+            'Sec-WebSocket-Key': chave, 'Sec-WebSocket-Version': '13',
+        })
+        self.resposta = self.conexao.getresponse()
+        self.chave = chave
+        self.sock = self.conexao.sock
+
+    def enviar(self, opcode, dados):
+        mascara = os.urandom(4)
+        cabecalho = bytes((0x80 | opcode,))
+        if len(dados) < 126:
+            cabecalho += bytes((0x80 | len(dados),))
+        else:
+            cabecalho += bytes((0x80 | 126,)) + len(dados).to_bytes(2, 'big')
+        self.sock.sendall(cabecalho + mascara + bytes(b ^ mascara[i % 4] for i, b in enumerate(dados)))
+
+    def _ler(self, tamanho):
+        dados = b""
+        while len(dados) < tamanho:
+            parte = self.sock.recv(tamanho - len(dados))
+            assert parte, "conexão fechada pelo servidor"
+            dados += parte
+        return dados
+
+    def receber(self):
+        primeiro, segundo = self._ler(2)
+        tamanho = segundo & 0x7F
+        if tamanho == 126:
+            tamanho = int.from_bytes(self._ler(2), 'big')
+        elif tamanho == 127:
+            tamanho = int.from_bytes(self._ler(8), 'big')
+        return primeiro & 0x0F, self._ler(tamanho)
+
+    def turno(self, mensagem):
+        self.enviar(0x1, json.dumps(mensagem).encode('utf-8'))
+        eventos = []
+        while not eventos or eventos[-1]['type'] not in ('done', 'error'):
+            opcode, dados = self.receber()
+            assert opcode == 0x1
+            eventos.append(json.loads(dados))
+        return eventos
+
+
+def test_websocket_transmite_os_eventos_do_turno(servidor):
+    cliente = _ClienteWebSocket(servidor, 'ws')
+    assert cliente.resposta.status == 101
+    esperado = base64.b64encode(
+        hashlib.sha1((cliente.chave + Servidor_HTTP._WEBSOCKET_GUID).encode()).digest()
+    ).decode()
+    assert cliente.resposta.getheader('Sec-WebSocket-Accept') == esperado
+
+    for texto in ("primeira", "segunda"):
+        eventos = cliente.turno({'text': texto})
+        assert eventos[-1] == {'type': 'done', 'text': f"Resposta simulada: {texto}", 'error': False}
+        assert "".join(e['text'] for e in eventos if e['type'] == 'text') == f"Resposta simulada: {texto}"
+
+    cliente.enviar(0x9, b"ping")
+    assert cliente.receber() == (0xA, b"ping")
+    eventos = cliente.turno("não é um objeto")
+    assert eventos[-1]['type'] == 'error' and eventos[-1]['status'] == 400
+
+    cliente.enviar(0x8, (1000).to_bytes(2, 'big'))
+    opcode, dados = cliente.receber()
+    assert opcode == 0x8 and dados[:2] == (1000).to_bytes(2, 'big')
+    assert servidor.stats['turns'] == 2 and _vaga_livre(servidor)
+
+
+def test_websocket_sem_handshake_valido_responde_400(servidor):
+    conexao = http.client.HTTPConnection(*servidor.server_address[:2], timeout=10)
+    conexao.request('GET', "/conversations/ws/ws")
+    assert conexao.getresponse().status == 400